@@ -1,7 +1,7 @@
 # Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\app.py
-# Último recode: 2026-02-09 20:12 (America/Bahia)
-# Motivo: Criar entrypoint do Flask para webhook do Twilio (POST /bot) e healthcheck,
-#         delegando toda a lógica de conversa para modules/whatsapp.py e retornando TwiML.
+# Último recode: 2026-10-18 06:30 (America/Bahia)
+# Motivo: /metrics desligada sem METRICS_TOKEN (fingerprints de SQL e internos do pool não
+#         ficam públicos por padrão).
 
 from __future__ import annotations
 
@@ -9,13 +9,32 @@ import html
 from flask import Flask, Response, request
 
 import config
+import database
+from modules.dispatcher import SENDER_REJECTIONS, DispatchRejected, run_ordered
+from modules.exports import export_response
+from modules.idempotency import NEW, get_idempotency_store
+from modules.metrics import install_metrics, metrics_response
+from modules.outbound import split_message
 
 app = Flask(__name__)
 
+if config.METRICS_ENABLED:
+    install_metrics(app)
+
+database.init_db()
+
 
 def _twiml_message(text: str) -> str:
-    safe = html.escape(text or "")
-    return f'<?xml version="1.0" encoding="UTF-8"?><Response><Message>{safe}</Message></Response>'
+    # Acima de MAX_MESSAGE_LENGTH o texto vira várias <Message> (entregues em ordem).
+    messages = "".join(f"<Message>{html.escape(part)}</Message>" for part in split_message(text or ""))
+    return f'<?xml version="1.0" encoding="UTF-8"?><Response>{messages}</Response>'
+
+
+_TWIML_EMPTY = '<?xml version="1.0" encoding="UTF-8"?><Response/>'
+
+_BUSY_REPLY = "Estamos com muitas mensagens no momento. Envie novamente em alguns instantes."
+
+_RATE_LIMIT_REPLY = "Muitas mensagens em sequência. Aguarde alguns segundos e tente novamente."
 
 
 @app.get("/")
@@ -28,10 +47,25 @@ def health() -> Response:
     return Response("ok", status=200, mimetype="text/plain")
 
 
+@app.get("/metrics")
+def metrics() -> Response:
+    if not config.METRICS_ENABLED or not config.METRICS_TOKEN:
+        return Response("metrics disabled", status=404, mimetype="text/plain")
+    return metrics_response()
+
+
+@app.get("/exports/<dataset>")
+def export_dataset(dataset: str) -> Response:
+    if not config.EXPORT_TOKEN:
+        return Response("exports disabled", status=404, mimetype="text/plain")
+    return export_response(dataset)
+
+
 @app.post(config.WEBHOOK_PATH)
 def twilio_webhook() -> Response:
     from_number = (request.form.get("From") or "").strip()
     body = (request.form.get("Body") or "").strip()
+    message_sid = (request.form.get("MessageSid") or "").strip()
 
     # Import lazy para evitar falha de import enquanto os módulos ainda não foram criados.
     try:
@@ -40,7 +74,42 @@ def twilio_webhook() -> Response:
         msg = "Modulo modules/whatsapp.py ainda nao foi criado. Proximo passo: criar modules/whatsapp.py."
         return Response(_twiml_message(msg), status=200, mimetype="application/xml")
 
-    reply_text = handle_message(from_number=from_number, body=body)
+    store = get_idempotency_store() if message_sid else None
+    if store is not None:
+        seen = store.claim(message_sid, from_number)
+        if seen is not NEW:
+            # Retry do Twilio: devolve a resposta já calculada (ou vazia, se ainda em andamento).
+            twiml = _twiml_message(seen) if seen is not None else _TWIML_EMPTY
+            return Response(twiml, status=200, mimetype="application/xml")
+
+    try:
+        if config.WEBHOOK_ASYNC:
+            from modules.webhook_async import get_worker_pool
+
+            if get_worker_pool(handle_message).submit(from_number, body):
+                return Response(_TWIML_EMPTY, status=200, mimetype="application/xml")
+            # Fila cheia (backpressure): nunca processa nesta thread (seguraria a thread do
+            # waitress e furaria a ordem do remetente). Avisa e libera o SID para o reenvio.
+            if store is not None:
+                store.forget(message_sid)
+            return Response(_twiml_message(_BUSY_REPLY), status=200, mimetype="application/xml")
+        else:
+            reply_text = run_ordered(from_number, handle_message, from_number=from_number, body=body)
+    except DispatchRejected as exc:
+        # Remetente acima do limite ou servidor sem espaço: não processa e avisa. O SID é
+        # liberado (não guarda a recusa), para que um retry do Twilio seja processado normalmente.
+        if store is not None:
+            store.forget(message_sid)
+        reply = _RATE_LIMIT_REPLY if exc.reason in SENDER_REJECTIONS else _BUSY_REPLY
+        return Response(_twiml_message(reply), status=200, mimetype="application/xml")
+    except Exception:
+        if store is not None:
+            # Libera o SID para que o retry do Twilio tente de novo.
+            store.forget(message_sid)
+        raise
+
+    if store is not None:
+        store.complete(message_sid, reply_text)
     return Response(_twiml_message(reply_text), status=200, mimetype="application/xml")
 
 
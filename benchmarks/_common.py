@@ -0,0 +1,76 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\benchmarks\_common.py
+# Último recode: 2026-10-17 20:40 (America/Bahia)
+# Motivo: Resumo estatístico (p50/p95/p99, vazão) comum à suíte de benchmarks com saída JSON.
+
+from __future__ import annotations
+
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import config  # noqa: E402
+import database  # noqa: E402
+
+
+@contextmanager
+def temp_database(pool_size: int = config.SQLITE_POOL_SIZE) -> Iterator[Path]:
+    """
+    Aponta config.SQLITE_DB_PATH para um banco temporário já inicializado.
+    """
+    original_path = config.SQLITE_DB_PATH
+    original_pool = config.SQLITE_POOL_SIZE
+    with tempfile.TemporaryDirectory(prefix="gestflow-bench-") as tmp:
+        database.close_pool()
+        config.SQLITE_DB_PATH = Path(tmp) / "bench.db"
+        config.SQLITE_POOL_SIZE = pool_size
+        try:
+            database.init_db()
+            yield config.SQLITE_DB_PATH
+        finally:
+            database.close_pool()
+            config.SQLITE_DB_PATH = original_path
+            config.SQLITE_POOL_SIZE = original_pool
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def summarize(samples_ms: List[float], wall_seconds: float) -> Dict[str, Any]:
+    """
+    Estatísticas de uma série de latências (ms), no formato gravado pela suíte.
+    """
+    count = len(samples_ms)
+    return {
+        "count": count,
+        "p50_ms": round(percentile(samples_ms, 50), 4),
+        "p95_ms": round(percentile(samples_ms, 95), 4),
+        "p99_ms": round(percentile(samples_ms, 99), 4),
+        "max_ms": round(max(samples_ms), 4) if samples_ms else 0.0,
+        "mean_ms": round(sum(samples_ms) / count, 4) if count else 0.0,
+        "ops_per_sec": round(count / wall_seconds, 1) if wall_seconds > 0 else 0.0,
+    }
+
+
+class Timer:
+    def __init__(self) -> None:
+        self.start = 0.0
+        self.elapsed = 0.0
+
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.elapsed = time.perf_counter() - self.start
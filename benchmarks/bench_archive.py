@@ -0,0 +1,298 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\benchmarks\bench_archive.py
+# Último recode: 2026-10-18 03:20 (America/Bahia)
+# Motivo: Arquivamento anual (modules/archive.py) numa base com vários anos de histórico:
+#         latência das consultas do dia a dia e tamanho do banco antes/depois (arquivamento +
+#         VACUUM INTO), e conferência de que nada se perdeu: contagens e somas pelas views de
+#         histórico, rollups, saldos de estoque, exportação de um ano arquivado e rebuilds.
+#
+# Uso: python benchmarks/bench_archive.py [--sales-per-year 20000] [--iterations 300]
+# Sai com código 1 se o histórico divergir, algo em aberto for arquivado ou o banco não encolher.
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+from typing import Any, Callable, Dict, List, Tuple
+
+from _common import Timer, summarize, temp_database
+
+import database
+from modules import aging, archive, exports, reports, stock
+
+COMPANIES = (1, 2)
+YEARS = range(2021, 2027)
+CUTOFF = "2025-01-01"
+TODAY = "2026-10-17"
+PRODUCTS = 300
+CUSTOMERS = 500
+
+
+def _seed(sales_per_year: int) -> None:
+    rng = random.Random(24)
+    now = database.utc_iso()
+    database.execute("INSERT OR IGNORE INTO companies (id, name, created_at) VALUES (2, 'Empresa 2', ?);", (now,))
+    for company_id in COMPANIES:
+        database.execute_many(
+            "INSERT INTO customers (company_id, name, phone, created_at) VALUES (?, ?, ?, ?);",
+            [(company_id, f"Cliente {company_id}-{i}", f"+557198{company_id:03d}{i:04d}", now) for i in range(CUSTOMERS)],
+        )
+        database.execute_many(
+            "INSERT INTO products (company_id, code, name, price_sale, created_at) VALUES (?, ?, ?, ?, ?);",
+            [(company_id, f"P{i:04d}", f"Produto {i}", float(rng.randint(5, 300)), now) for i in range(PRODUCTS)],
+        )
+        customer0 = database.fetch_one("SELECT MIN(id) AS id FROM customers WHERE company_id = ?;", (company_id,))["id"]
+        product0 = database.fetch_one("SELECT MIN(id) AS id FROM products WHERE company_id = ?;", (company_id,))["id"]
+
+        for year in YEARS:
+            # 2026 só até outubro (ano corrente).
+            days = 290 if year == 2026 else 365
+            with database.transaction() as tx:
+                for n in range(sales_per_year):
+                    day = n * days // sales_per_year
+                    stamp = f"{year}-{1 + day // 31 % 12:02d}-{1 + day % 28:02d}T{10 + n % 8:02d}:{n % 60:02d}:00Z"
+                    roll = rng.random()
+                    status = "open" if roll < 0.10 else ("cancelled" if roll < 0.15 else "paid")
+                    customer = customer0 + rng.randrange(CUSTOMERS)
+
+                    budget_id = None
+                    if n % 4 == 0:
+                        budget_status = ("approved", "cancelled", "confirmed")[n // 4 % 3]
+                        budget_id = tx.execute(
+                            "INSERT INTO budgets (company_id, code, customer_id, status, total, created_at, updated_at) "
+                            "VALUES (?, ?, ?, ?, 0, ?, ?);",
+                            (company_id, f"ORC-{year}-{n}", customer, budget_status, stamp, stamp),
+                        )
+                        tx.execute(
+                            "INSERT INTO budget_items (company_id, budget_id, item_type, item_id, description_snapshot, unit_price, qty, subtotal) "
+                            "VALUES (?, ?, 'product', ?, 'Produto', 10, 1, 10);",
+                            (company_id, budget_id, product0),
+                        )
+                        if budget_status != "approved" or n % 8:
+                            budget_id = None  # só parte dos aprovados vira venda
+
+                    items = [(product0 + rng.randrange(PRODUCTS), float(rng.randint(1, 5)), float(rng.randint(5, 300))) for _ in range(3)]
+                    total = sum(q * p for _, q, p in items)
+                    sale_id = tx.execute(
+                        "INSERT INTO sales (company_id, code, budget_id, customer_id, status, total, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?);",
+                        (company_id, f"VEN-{year}-{n}", budget_id, customer, status, total, stamp),
+                    )
+                    tx.execute_many(
+                        "INSERT INTO sale_items (company_id, sale_id, item_type, item_id, description_snapshot, unit_price, qty, subtotal) "
+                        "VALUES (?, ?, 'product', ?, 'Produto', ?, ?, ?);",
+                        [(company_id, sale_id, pid, price, qty, qty * price) for pid, qty, price in items],
+                    )
+                    tx.execute_many(
+                        "INSERT INTO stock_movements (company_id, product_id, movement_type, qty, ref_type, ref_id, created_at) "
+                        "VALUES (?, ?, 'sale', ?, 'sale', ?, ?);",
+                        [(company_id, pid, qty, sale_id, stamp) for pid, qty, _ in items],
+                    )
+                    if n % 20 == 0:
+                        tx.execute(
+                            "INSERT INTO stock_movements (company_id, product_id, movement_type, qty, ref_type, created_at) "
+                            "VALUES (?, ?, 'in', 100, 'manual', ?);",
+                            (company_id, product0 + rng.randrange(PRODUCTS), stamp),
+                        )
+
+                    if status == "paid" and n % 5 == 0:
+                        # Fiado quitado: conta a receber paga + pagamento ligado a ela.
+                        ar_id = tx.execute(
+                            "INSERT INTO accounts_receivable (company_id, sale_id, status, due_date, total, paid_total, created_at) "
+                            "VALUES (?, ?, 'paid', ?, ?, ?, ?);",
+                            (company_id, sale_id, stamp[:10], total, total, stamp),
+                        )
+                        origin = ("receivable", ar_id)
+                    elif status == "open" and n % 2 == 0:
+                        # Fiado em aberto: a venda e a conta ficam no banco quente.
+                        tx.execute(
+                            "INSERT INTO accounts_receivable (company_id, sale_id, status, due_date, total, paid_total, created_at) "
+                            "VALUES (?, ?, 'open', ?, ?, 0, ?);",
+                            (company_id, sale_id, stamp[:10], total, stamp),
+                        )
+                        origin = None
+                    else:
+                        origin = ("sale_direct", sale_id) if status == "paid" else None
+                    if origin is not None:
+                        tx.execute(
+                            "INSERT INTO payments (company_id, direction, origin_type, origin_id, method, amount, paid_at) "
+                            "VALUES (?, 'in', ?, ?, ?, ?, ?);",
+                            (company_id, origin[0], origin[1], ("pix", "cash", "card")[n % 3], total, stamp),
+                        )
+
+
+def _hot_queries(rng: random.Random) -> List[Tuple[str, Callable[[], Any]]]:
+    def company() -> int:
+        return rng.choice(COMPANIES)
+
+    return [
+        (
+            "vendas em aberto",
+            lambda: database.fetch_all(
+                "SELECT id, code, total, created_at FROM sales WHERE company_id = ? AND status = 'open' "
+                "ORDER BY created_at DESC LIMIT 50;",
+                (company(),),
+            ),
+        ),
+        (
+            "extrato do produto",
+            lambda: database.fetch_all(
+                "SELECT id, movement_type, qty, created_at FROM stock_movements WHERE product_id = ? "
+                "ORDER BY created_at DESC LIMIT 20;",
+                (1 + rng.randrange(PRODUCTS * len(COMPANIES)),),
+            ),
+        ),
+        (
+            "orçamentos confirmados",
+            lambda: database.fetch_all(
+                "SELECT id, code, total FROM budgets WHERE company_id = ? AND status = 'confirmed' "
+                "ORDER BY created_at DESC LIMIT 50;",
+                (company(),),
+            ),
+        ),
+        (
+            "vendas do mês",
+            lambda: database.fetch_all(
+                "SELECT id, total FROM sales WHERE company_id = ? AND created_at >= ? AND created_at < ?;",
+                (company(), "2026-09-01T03:00:00Z", "2026-10-01T03:00:00Z"),
+            ),
+        ),
+        ("a receber vencidos", lambda: database.fetch_all(aging.OVERDUE_SQL["receivable"], (company(), TODAY))),
+    ]
+
+
+def _latencies(iterations: int) -> Dict[str, Dict[str, Any]]:
+    # Pool novo: o cache de páginas de cada conexão começa vazio nas duas medições.
+    database.close_pool()
+    # Melhor de 3 rodadas por consulta, para o ruído da máquina não mascarar a comparação.
+    results: Dict[str, Dict[str, Any]] = {}
+    for label, fn in _hot_queries(random.Random(7)):
+        for _ in range(10):
+            fn()
+        for _ in range(3):
+            samples: List[float] = []
+            with Timer() as wall:
+                for _ in range(iterations):
+                    with Timer() as t:
+                        fn()
+                    samples.append(t.elapsed * 1000)
+            stats = summarize(samples, wall.elapsed)
+            if label not in results or stats["p50_ms"] < results[label]["p50_ms"]:
+                results[label] = stats
+    return results
+
+
+def _history_state() -> Dict[str, Any]:
+    """
+    Contagens e somas de tudo o que pode ser arquivado (lidas pelas views de histórico),
+    mais as tabelas derivadas que o arquivamento não pode mexer.
+    """
+    state: Dict[str, Any] = {}
+    with archive.history_reader() as conn:
+        for table in archive.ARCHIVED_TABLES:
+            state[table] = conn.execute(f"SELECT COUNT(*) AS n FROM {table};").fetchone()["n"]
+        state["sales_total"] = round(conn.execute("SELECT SUM(total) AS t FROM sales;").fetchone()["t"], 2)
+        state["payments_total"] = round(conn.execute("SELECT SUM(amount) AS t FROM payments;").fetchone()["t"], 2)
+        state["sales_daily"] = conn.execute("SELECT * FROM sales_daily ORDER BY 1, 2, 3;").fetchall()
+        state["payments_daily"] = conn.execute("SELECT * FROM payments_daily ORDER BY 1, 2, 3, 4;").fetchall()
+        state["stock_balances"] = conn.execute("SELECT company_id, product_id, qty FROM stock_balances ORDER BY 1, 2;").fetchall()
+    return state
+
+
+def _export_rows(dataset: str, start: str, end: str) -> int:
+    lines = sum(chunk.count(b"\n") for chunk in exports.stream_export(dataset, 1, start, end))
+    return lines - 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sales-per-year", type=int, default=20_000)
+    parser.add_argument("--iterations", type=int, default=300)
+    args = parser.parse_args()
+    ok = True
+
+    with temp_database() as db_path:
+        with Timer() as t:
+            _seed(args.sales_per_year)
+        before_state = _history_state()
+        open_sales = database.fetch_one("SELECT COUNT(*) AS n FROM sales WHERE status = 'open';")["n"]
+        open_ar = database.fetch_one("SELECT COUNT(*) AS n FROM accounts_receivable WHERE status = 'open';")["n"]
+        export_2023 = {d: _export_rows(d, "2023-01-01", "2023-12-31") for d in ("sales", "sale_items", "payments")}
+        print(
+            f"base: {len(YEARS)} anos x {len(COMPANIES)} empresas x {args.sales_per_year:,} vendas "
+            f"({before_state['sales']:,} vendas, {before_state['stock_movements']:,} movimentos) em {t.elapsed:.1f} s"
+        )
+
+        # Antes: banco inteiro quente (compactado também, para comparar tamanho com tamanho).
+        before_bytes = archive.compact(db_path)["bytes_after"]
+        before = _latencies(args.iterations)
+
+        with Timer() as t:
+            moved = archive.archive_database(db_path, CUTOFF)
+        total_moved = sum(sum(counts.values()) for counts in moved.values())
+        print(f"arquivamento até {CUTOFF}: {total_moved:,} linhas em {t.elapsed:.1f} s ({total_moved / t.elapsed:,.0f} linhas/s)")
+        for year, counts in moved.items():
+            print(f"  {year}: " + ", ".join(f"{table}={n:,}" for table, n in counts.items()))
+
+        with Timer() as t:
+            sizes = archive.compact(db_path)
+        archived_bytes = sum(path.stat().st_size for _, path in archive.archive_files(db_path))
+        print(
+            f"VACUUM INTO: {sizes['bytes_before'] / 1e6:.1f} MB -> {sizes['bytes_after'] / 1e6:.1f} MB em {t.elapsed:.1f} s  "
+            f"(banco quente antes do arquivamento: {before_bytes / 1e6:.1f} MB; anos arquivados: {archived_bytes / 1e6:.1f} MB)"
+        )
+        if sizes["bytes_after"] >= before_bytes:
+            ok = False
+
+        after = _latencies(args.iterations)
+        print(f"{'consulta':<24}{'p50 antes':>11}{'p50 depois':>12}{'p95 antes':>11}{'p95 depois':>12}")
+        for label in before:
+            b, a = before[label], after[label]
+            print(f"{label:<24}{b['p50_ms']:>9.3f}ms{a['p50_ms']:>10.3f}ms{b['p95_ms']:>9.3f}ms{a['p95_ms']:>10.3f}ms")
+
+        # Conferências: nada some, nada em aberto sai do banco quente.
+        after_state = _history_state()
+        for key, value in before_state.items():
+            if after_state[key] != value:
+                shown = value if isinstance(value, (int, float)) else f"{len(value)} linhas"
+                print(f"  histórico divergiu em {key}: antes={shown}")
+                ok = False
+        if database.fetch_one("SELECT COUNT(*) AS n FROM sales WHERE status = 'open';")["n"] != open_sales:
+            print("  venda em aberto foi arquivada")
+            ok = False
+        if database.fetch_one("SELECT COUNT(*) AS n FROM accounts_receivable WHERE status = 'open';")["n"] != open_ar:
+            print("  conta a receber em aberto foi arquivada")
+            ok = False
+        hot_sales = database.fetch_one("SELECT COUNT(*) AS n FROM sales;")["n"]
+        print(f"vendas no banco quente: {hot_sales:,} de {before_state['sales']:,}")
+
+        with Timer() as t:
+            exported = {d: _export_rows(d, "2023-01-01", "2023-12-31") for d in export_2023}
+        print(f"exportação de 2023 (arquivado, arquivo a arquivo): {exported} em {t.elapsed:.2f} s")
+        if exported != export_2023:
+            print(f"  esperado {export_2023}")
+            ok = False
+
+        drift = stock.verify_balances()
+        reports.rebuild()
+        stock.rebuild_balances()
+        rebuilt = _history_state()
+        for key in ("sales_daily", "payments_daily", "stock_balances"):
+            if rebuilt[key] != before_state[key]:
+                print(f"  rebuild com histórico divergiu em {key}")
+                ok = False
+        if drift:
+            print(f"  verify_balances acusou {len(drift)} divergência(s) após arquivar")
+            ok = False
+
+        again = archive.archive_database(db_path, CUTOFF)
+        if again:
+            print(f"  segunda execução ainda moveu linhas: {again}")
+            ok = False
+
+    print("OK" if ok else "FALHOU")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
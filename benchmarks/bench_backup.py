@@ -0,0 +1,103 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\benchmarks\bench_backup.py
+# Último recode: 2026-10-17 18:00 (America/Bahia)
+# Motivo: Latência de escrita enquanto um backup roda: sem backup, backup em passos pequenos
+#         (modules/backup.py) e backup em um único passo, sobre um banco grande.
+#
+# Uso: python benchmarks/bench_backup.py [--size-mb 256]   (use --size-mb 2048+ para multi-GB)
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from _common import percentile, temp_database
+
+import config
+import database
+from modules import backup
+
+
+def _fill(size_mb: int) -> None:
+    database.execute("CREATE TABLE IF NOT EXISTS bench_filler (id INTEGER PRIMARY KEY, data BLOB NOT NULL);")
+    chunk_rows = 256  # 256 x 64 KiB = 16 MiB por transação
+    for _ in range(max(1, size_mb // 16)):
+        with database.transaction() as tx:
+            tx.execute_many(
+                "INSERT INTO bench_filler (data) VALUES (randomblob(65536));",
+                [()] * chunk_rows,
+            )
+    with database.db_connection() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+
+
+def _measure_writes(during: Callable[[], None], min_seconds: float = 2.0) -> List[float]:
+    samples: List[float] = []
+    stop = threading.Event()
+
+    def writer() -> None:
+        i = 0
+        while not stop.is_set():
+            i += 1
+            t0 = time.perf_counter()
+            database.execute(
+                "INSERT INTO customers (company_id, name, created_at) VALUES (1, ?, ?);",
+                (f"Cliente {i}", database.utc_iso()),
+            )
+            samples.append((time.perf_counter() - t0) * 1000)
+            time.sleep(0.002)
+
+    t = threading.Thread(target=writer)
+    t.start()
+    started = time.perf_counter()
+    during()
+    remaining = min_seconds - (time.perf_counter() - started)
+    if remaining > 0:
+        time.sleep(remaining)
+    stop.set()
+    t.join()
+    return samples
+
+
+def _report(label: str, samples: List[float], seconds: float = 0.0) -> None:
+    extra = f"  duração do backup {seconds:6.1f}s" if seconds else ""
+    print(
+        f"{label:30s} escritas={len(samples):6d}  p50={percentile(samples, 50):7.2f} ms  "
+        f"p99={percentile(samples, 99):8.2f} ms  max={max(samples):8.2f} ms{extra}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=256)
+    args = parser.parse_args()
+
+    with temp_database() as db_path, tempfile.TemporaryDirectory(prefix="gestflow-bkp-") as bkp:
+        config.BACKUP_DIR = Path(bkp)
+        print(f"gerando banco de ~{args.size_mb} MiB em {db_path} ...")
+        _fill(args.size_mb)
+
+        _report("sem backup", _measure_writes(lambda: None))
+
+        timing = {}
+
+        def stepped() -> None:
+            timing["stepped"] = backup.create_backup()["copy_seconds"]
+
+        _report(
+            f"backup em passos ({config.BACKUP_PAGES_PER_STEP} pág.)",
+            _measure_writes(stepped),
+            timing.get("stepped", 0.0),
+        )
+
+        def single_step() -> None:
+            timing["single"] = backup.create_backup(pages_per_step=-1, step_sleep=0)["copy_seconds"]
+
+        _report("backup em um passo", _measure_writes(single_step), timing.get("single", 0.0))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\benchmarks\bench_catalog_search.py
+# Último recode: 2026-10-17 20:15 (America/Bahia)
+# Motivo: Latência da busca do catálogo com ~100k itens: LIKE '%termo%' vs. FTS5 (catalog_fts)
+#         vs. autocomplete em memória. Falha se a busca FTS perder algum item que o LIKE acha.
+#
+# Uso: python benchmarks/bench_catalog_search.py [--items 100000] [--repeat 30]
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+
+from _common import Timer, percentile, temp_database
+
+import database
+from modules import catalog_search
+
+WORDS = (
+    "cimento", "areia", "brita", "tijolo", "bloco", "argamassa", "cal", "telha", "tubo", "conexão",
+    "joelho", "registro", "torneira", "fio", "cabo", "disjuntor", "tomada", "lâmpada", "tinta",
+    "verniz", "massa", "lixa", "prego", "parafuso", "bucha", "chapa", "vergalhão", "arame", "cola",
+)
+SIZES = ("10mm", "20mm", "50kg", "25kg", "1/2", "3/4", "18l", "3,6l", "2,5mm", "6mm")
+BRANDS = ("votoran", "tigre", "suvinil", "coral", "quartzolit", "gerdau", "pial", "amanco")
+QUERIES = ("cimento 50kg", "tubo tigre", "conexao 3/4", "tinta suvinil 18l", "disj", "parafuso 6mm", "vergalhao")
+LIKE_SQL = (
+    "SELECT id, name, code FROM products WHERE company_id = ? AND active = 1 "
+    "AND name LIKE ? ORDER BY name LIMIT ?;"
+)
+
+
+def _seed(items: int) -> None:
+    rnd = random.Random(15)
+    database.execute_many(
+        "INSERT INTO companies (id, name, created_at) VALUES (?, ?, '2024-01-01');",
+        [(2, "Empresa 2"), (3, "Empresa 3")],
+    )
+    batch = []
+    for i in range(items):
+        name = f"{rnd.choice(WORDS).capitalize()} {rnd.choice(BRANDS)} {rnd.choice(SIZES)}"
+        batch.append((1 + i % 3, f"P{i:06d}", name, float(rnd.randint(1, 500))))
+        if len(batch) == 10000:
+            database.execute_many(
+                "INSERT INTO products (company_id, code, name, price_sale, created_at) VALUES (?, ?, ?, ?, '2024-01-01');",
+                batch,
+            )
+            batch = []
+    if batch:
+        database.execute_many(
+            "INSERT INTO products (company_id, code, name, price_sale, created_at) VALUES (?, ?, ?, ?, '2024-01-01');",
+            batch,
+        )
+
+
+def _like_search(company_id: int, text: str, limit: int) -> list:
+    # Melhor que dá para fazer sem FTS: um LIKE '%termo%' por palavra (sem acento nenhum casa).
+    tokens = text.split()
+    sql = LIKE_SQL.replace("AND name LIKE ?", " ".join("AND name LIKE ?" for _ in tokens))
+    return database.fetch_all(sql, (company_id, *[f"%{t}%" for t in tokens], limit))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    failures = 0
+    with temp_database():
+        with Timer() as t:
+            _seed(args.items)
+        print(f"{args.items} itens inseridos (com triggers FTS) em {t.elapsed:.1f} s")
+
+        autocomplete = catalog_search.CatalogAutocomplete()
+        with Timer() as t:
+            autocomplete.complete(1, "a")
+        print(f"carga do autocomplete da empresa 1: {t.elapsed * 1000:.0f} ms")
+
+        print(f"{'consulta':<20} {'LIKE p50':>10} {'FTS p50':>9} {'FTS p95':>9} {'autoc. p50':>11} {'achados':>8}")
+        for query in QUERIES:
+            like_ms, fts_ms, auto_ms = [], [], []
+            for _ in range(args.repeat):
+                with Timer() as t:
+                    like_rows = _like_search(1, query, 1000)
+                like_ms.append(t.elapsed * 1000)
+                with Timer() as t:
+                    fts_rows = catalog_search.search(1, query, limit=10)
+                fts_ms.append(t.elapsed * 1000)
+                with Timer() as t:
+                    autocomplete.complete(1, query)
+                auto_ms.append(t.elapsed * 1000)
+            # Tudo que o LIKE acha (com acento exato) o FTS também precisa achar.
+            full = {r["item_id"] for r in catalog_search.search(1, query, limit=100000)}
+            missing = {r["id"] for r in like_rows} - full
+            if missing:
+                failures += 1
+                print(f"FALHA: {query!r}: FTS não retornou {len(missing)} itens do LIKE")
+            if len(fts_rows) > 10:
+                failures += 1
+            print(
+                f"{query:<20} {percentile(like_ms, 50):>7.2f} ms {percentile(fts_ms, 50):>6.2f} ms "
+                f"{percentile(fts_ms, 95):>6.2f} ms {percentile(auto_ms, 50):>8.3f} ms {len(full):>8}"
+            )
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
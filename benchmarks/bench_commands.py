@@ -0,0 +1,175 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\benchmarks\bench_commands.py
+# Último recode: 2026-10-18 02:30 (America/Bahia)
+# Motivo: Custo do parser de comandos (modules/commands.py) contra a cadeia de if/regex
+#         testada em sequência, custo do roteamento por estado (flows.resolve) e latência
+#         de ponta a ponta de flows.handle_message num banco temporário.
+#
+# Uso: python benchmarks/bench_commands.py [--rounds 20000] [--messages 2000]
+# Sai com código 1 se o parser compilado não for mais rápido que a cadeia ingênua.
+
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from _common import Timer, summarize, temp_database
+
+import database
+from modules import flows
+from modules.commands import GRAMMAR, normalize, parse
+from modules.sessions import close_session_cache, get_session_cache
+
+PHONE = "whatsapp:+5571999990000"
+
+CORPUS = [
+    "menu",
+    "Oi!",
+    "1",
+    "Novo orçamento",
+    "cliente João da Silva",
+    "item 2 P001",
+    "+ 3,5 x cimento",
+    "2 areia",
+    "remover P001",
+    "itens",
+    "confirmar",
+    "não",
+    "entrada 10 P001",
+    "saída 2 un P002",
+    "estoque P001",
+    "recebi R$ 1.234,50 no pix VEN-2026-0001",
+    "relatório da semana",
+    "a receber",
+    "buscar cimento cp2",
+    "qual o horário de vocês?",
+]
+
+
+def _naive_parse(text: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Referência: uma regex por palavra-chave, montada e testada em sequência a cada mensagem
+    (como um bloco de if/elif com re.match), mais longa primeiro.
+    """
+    norm = normalize(text)
+    candidates: List[Tuple[str, str, Optional[str]]] = []
+    for name, keywords, pattern in GRAMMAR:
+        for keyword in keywords:
+            candidates.append((keyword, name, pattern))
+    candidates.sort(key=lambda c: -len(c[0]))
+    for keyword, name, pattern in candidates:
+        regex = r"^" + re.escape(keyword) + (r"(?:\s+" + pattern + r")?$" if pattern else r"$")
+        found = re.match(regex, norm)
+        if found is not None:
+            return name, found.groupdict()
+    if re.match(r"^\d{1,3}$", norm):
+        return "number", None
+    return "unknown", None
+
+
+def _per_message_us(fn, messages: List[str], rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in messages:
+            fn(text)
+    return (time.perf_counter() - start) / (rounds * len(messages)) * 1e6
+
+
+def _seed_conversation_data() -> None:
+    now = "2026-01-01T00:00:00Z"
+    with database.transaction() as cur:
+        cur.execute(
+            "INSERT INTO users (company_id, whatsapp, name, role, created_at) VALUES (1, ?, 'Bench', 'owner', ?);",
+            (PHONE, now),
+        )
+        cur.execute_many(
+            "INSERT INTO products (company_id, code, name, price_sale, created_at) VALUES (1, ?, ?, ?, ?);",
+            [(f"P{i:03d}", f"Produto {i} cimento areia", 10 + i, now) for i in range(1, 201)],
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20_000)
+    parser.add_argument("--messages", type=int, default=2000)
+    args = parser.parse_args()
+
+    ok = True
+    rounds = max(1, args.rounds // len(CORPUS))
+
+    # 1) Parser: trie + regex compilada vs. cadeia de regex em sequência.
+    compiled_us = _per_message_us(parse, CORPUS, rounds)
+    naive_us = _per_message_us(_naive_parse, CORPUS, max(1, rounds // 10))
+    print(
+        f"parse compilado: {compiled_us:6.2f} µs/msg   cadeia if/regex: {naive_us:7.2f} µs/msg   "
+        f"({naive_us / compiled_us:.1f}x)"
+    )
+    if compiled_us >= naive_us:
+        ok = False
+
+    # Os dois precisam concordar no nome do comando (exceto os atalhos que a cadeia não tem).
+    for text in CORPUS:
+        expected = _naive_parse(text)[0]
+        got = parse(text).name
+        if expected not in ("unknown", got) and got != "item_implicit":
+            print(f"  divergência em {text!r}: compilado={got} cadeia={expected}")
+            ok = False
+
+    # 2) Roteamento: parse já feito, só a tabela de transições.
+    commands = [parse(text) for text in CORPUS]
+    states = list(flows.STATES)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for state in states:
+            for cmd in commands:
+                flows.resolve(state, cmd)
+    resolve_us = (time.perf_counter() - start) / (rounds * len(states) * len(commands)) * 1e6
+    print(f"resolve (estado x comando): {resolve_us:6.2f} µs")
+
+    # 3) Ponta a ponta: sessão em cache, consultas reais, rascunho e confirmação.
+    script = [
+        "orcamento",
+        "cliente Maria",
+        "item 2 P001",
+        "3 P002",
+        "itens",
+        "confirmar",
+        "estoque P003",
+        "buscar cimento",
+        "1",
+        "cancelar",
+        "relatorio hoje",
+    ]
+    rng = random.Random(7)
+    close_session_cache()
+    try:
+        with temp_database():
+            _seed_conversation_data()
+            samples: List[float] = []
+            with Timer() as t:
+                for n in range(args.messages):
+                    text = script[n % len(script)] if rng.random() < 0.9 else rng.choice(CORPUS)
+                    begin = time.perf_counter()
+                    flows.handle_message(PHONE, text, company_id=1)
+                    samples.append((time.perf_counter() - begin) * 1000)
+            get_session_cache().flush()
+            stats = summarize(samples, t.elapsed)
+            budgets = database.fetch_one("SELECT COUNT(*) AS n FROM budgets WHERE company_id = 1;")["n"]
+            print(
+                f"handle_message: {stats['count']:,} msgs  p50={stats['p50_ms']:.3f} ms  p95={stats['p95_ms']:.3f} ms  "
+                f"p99={stats['p99_ms']:.3f} ms  ({budgets} orçamentos confirmados)"
+            )
+            if budgets == 0:
+                ok = False
+    finally:
+        close_session_cache()
+
+    print("OK" if ok else "FALHOU")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\benchmarks\bench_dispatcher.py
+# Último recode: 2026-10-17 15:30 (America/Bahia)
+# Motivo: Conferir a ordem por remetente do KeyedDispatcher (nenhuma mensagem fora de ordem nem
+#         duas do mesmo número ao mesmo tempo), o limite de taxa e medir vazão com muitos remetentes.
+#
+# Uso: python benchmarks/bench_dispatcher.py [--senders 200] [--messages 20] [--workers 8] [--turn-ms 2]
+# Sai com código 1 se encontrar violação de ordem/concorrência ou limite de taxa incorreto.
+
+from __future__ import annotations
+
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List
+
+from _common import Timer
+
+from modules.dispatcher import RATE_LIMITED, DispatchRejected, KeyedDispatcher
+
+
+def _ordering_run(senders: int, messages: int, workers: int, turn_ms: float) -> bool:
+    seen: Dict[str, List[int]] = {f"s{i}": [] for i in range(senders)}
+    in_flight: Dict[str, int] = {k: 0 for k in seen}
+    violations = []
+    lock = threading.Lock()
+
+    def handle(key: str, seq: int) -> None:
+        with lock:
+            in_flight[key] += 1
+            if in_flight[key] > 1:
+                violations.append(f"{key}: concorrência")
+        time.sleep(turn_ms / 1000.0)
+        with lock:
+            seen[key].append(seq)
+            in_flight[key] -= 1
+
+    dispatcher = KeyedDispatcher(
+        workers=workers,
+        max_pending=senders * messages,
+        max_pending_per_key=messages,
+        rate_per_second=0,
+    )
+    total = senders * messages
+    with Timer() as t:
+        # Várias threads submetendo (como as threads do waitress), cada remetente sempre pela mesma.
+        def producer(keys: List[str]) -> list:
+            futures = []
+            for seq in range(messages):
+                for key in keys:
+                    futures.append(dispatcher.submit(key, handle, key, seq))
+            return futures
+
+        keys = list(seen)
+        chunks = [keys[i::4] for i in range(4)]
+        with ThreadPoolExecutor(max_workers=4) as ex:
+            futures = [f for chunk in ex.map(producer, chunks) for f in chunk]
+        wait(futures)
+    dispatcher.shutdown()
+
+    for key, order in seen.items():
+        if order != list(range(messages)):
+            violations.append(f"{key}: ordem {order[:5]}...")
+
+    serial_estimate = total * turn_ms / 1000.0
+    print(f"  {senders} remetentes x {messages} msgs, {workers} workers: {total / t.elapsed:,.0f} msgs/s "
+          f"({t.elapsed:.2f}s; serial estimado {serial_estimate:.2f}s)")
+    print(f"  violações de ordem/concorrência: {len(violations)}")
+    for v in violations[:10]:
+        print(f"    {v}")
+    return not violations
+
+
+def _rate_limit_check() -> bool:
+    dispatcher = KeyedDispatcher(workers=2, rate_per_second=0.001, burst=5)
+    rejected = 0
+    for _ in range(10):
+        try:
+            dispatcher.submit("chatty", lambda: None)
+        except DispatchRejected as exc:
+            rejected += exc.reason == RATE_LIMITED
+    other_ok = True
+    try:
+        dispatcher.submit("quiet", lambda: None).result(timeout=5)
+    except DispatchRejected:
+        other_ok = False
+    dispatcher.shutdown()
+    print(f"  limite de taxa: {rejected} de 10 recusadas para o remetente insistente (esperado 5); "
+          f"outro remetente {'atendido' if other_ok else 'RECUSADO'}")
+    return rejected == 5 and other_ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--senders", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--turn-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    ok = _ordering_run(args.senders, args.messages, 1, args.turn_ms)
+    ok &= _ordering_run(args.senders, args.messages, args.workers, args.turn_ms)
+    ok &= _rate_limit_check()
+    print("OK" if ok else "FALHOU")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\benchmarks\bench_export.py
+# Último recode: 2026-10-18 00:50 (America/Bahia)
+# Motivo: Exportação em streaming (modules/exports.py) pela rota Flask com gzip: vazão,
+#         memória que não cresce com o volume exportado e snapshot consistente enquanto
+#         outra thread grava vendas novas dentro do mesmo período.
+#
+# Uso: python benchmarks/bench_export.py [--sales 200000] [--items-per-sale 3]
+# Sai com código 1 se a memória crescer com o volume ou se entrar linha gravada após o início.
+
+from __future__ import annotations
+
+import argparse
+import sys
+import threading
+import tracemalloc
+import zlib
+from typing import Dict, Tuple
+
+from _common import Timer, temp_database
+from suite import seed_dataset
+
+import config
+import database
+
+TOKEN = "bench-token"
+
+
+def _add_items(per_sale: int) -> int:
+    for n in range(per_sale):
+        database.execute(
+            "INSERT INTO sale_items (company_id, sale_id, item_type, item_id, description_snapshot, qty, unit_price, subtotal) "
+            "SELECT company_id, id, 'product', 1, 'Produto ação ' || ?, 1, total, total FROM sales;",
+            (n,),
+        )
+    return database.fetch_one("SELECT COUNT(*) AS n FROM sale_items;")["n"]
+
+
+def _download(client, dataset: str, start: str, end: str, on_first_chunk=None) -> Tuple[int, int, int]:
+    """
+    Consome a resposta em streaming, descompactando aos poucos. Retorna (linhas, bytes gzip, bytes csv).
+    """
+    resp = client.get(
+        f"/exports/{dataset}?company_id=1&start={start}&end={end}",
+        headers={"Authorization": f"Bearer {TOKEN}", "Accept-Encoding": "gzip"},
+        buffered=False,
+    )
+    assert resp.status_code == 200, resp.status_code
+    assert resp.headers.get("Content-Encoding") == "gzip"
+    inflate = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    lines = gz_bytes = raw_bytes = 0
+    first = True
+    for chunk in resp.response:
+        gz_bytes += len(chunk)
+        data = inflate.decompress(chunk)
+        raw_bytes += len(data)
+        lines += data.count(b"\n")
+        if first and on_first_chunk is not None:
+            on_first_chunk()
+        first = False
+    resp.close()
+    tail = inflate.flush()
+    lines += tail.count(b"\n")
+    return lines - 1, gz_bytes, raw_bytes + len(tail)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sales", type=int, default=200_000)
+    parser.add_argument("--items-per-sale", type=int, default=3)
+    args = parser.parse_args()
+
+    ok = True
+    original_token = config.EXPORT_TOKEN
+    config.EXPORT_TOKEN = TOKEN
+    try:
+        with temp_database():
+            with Timer() as t:
+                seed_dataset(companies=1, customers=1000, products=100, sales=args.sales)
+                items = _add_items(args.items_per_sale)
+            print(f"base: {args.sales:,} vendas, {items:,} itens em {t.elapsed:.1f} s")
+
+            from app import app
+
+            client = app.test_client()
+
+            # 1) Vazão e memória: um mês vs. o ano inteiro (~12x mais linhas, mesma memória).
+            peaks: Dict[str, float] = {}
+            for label, start, end in (("1 mês", "2025-03-01", "2025-03-31"), ("1 ano", "2025-01-01", "2025-12-31")):
+                tracemalloc.start()
+                with Timer() as t:
+                    rows, gz_bytes, raw_bytes = _download(client, "sale_items", start, end)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                peaks[label] = peak / 1e6
+                print(
+                    f"sale_items {label:<6} {rows:>9,} linhas em {t.elapsed:6.2f} s = {rows / t.elapsed:>9,.0f} linhas/s  "
+                    f"csv={raw_bytes / 1e6:7.1f} MB gzip={gz_bytes / 1e6:6.1f} MB  pico Python={peak / 1e6:5.2f} MB"
+                )
+            if peaks["1 ano"] > peaks["1 mês"] * 2 + 1.0:
+                print("  memória cresceu com o volume exportado")
+                ok = False
+
+            # 2) Snapshot: vendas gravadas no período depois do início não podem aparecer.
+            expected = database.fetch_one(
+                "SELECT COUNT(*) AS n FROM sales WHERE company_id = 1 AND created_at >= ? AND created_at < ?;",
+                ("2025-01-01T03:00:00Z", "2026-01-01T03:00:00Z"),
+            )["n"]
+            inserted = {"n": 0}
+            go = threading.Event()
+            stop = threading.Event()
+
+            def writer() -> None:
+                go.wait()
+                customer = database.fetch_one("SELECT MIN(id) AS id FROM customers;")["id"]
+                while not stop.is_set():
+                    database.execute(
+                        "INSERT INTO sales (company_id, code, customer_id, status, total, created_at) "
+                        "VALUES (1, ?, ?, 'paid', 10, '2025-06-15T12:00:00Z');",
+                        (f"NOVA-{inserted['n']}", customer),
+                    )
+                    inserted["n"] += 1
+
+            thread = threading.Thread(target=writer)
+            thread.start()
+            try:
+                with Timer() as t:
+                    rows, _, _ = _download(client, "sales", "2025-01-01", "2025-12-31", on_first_chunk=go.set)
+            finally:
+                stop.set()
+                go.set()
+                thread.join()
+            print(
+                f"sales com escrita concorrente: exportadas={rows:,} esperado={expected:,} "
+                f"(gravadas durante a exportação: {inserted['n']:,}) em {t.elapsed:.2f} s"
+            )
+            if rows != expected or inserted["n"] == 0:
+                ok = False
+    finally:
+        config.EXPORT_TOKEN = original_token
+
+    print("OK" if ok else "FALHOU")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\benchmarks\bench_import.py
+# Último recode: 2026-10-18 00:10 (America/Bahia)
+# Motivo: Importação em massa de 1M de produtos via modules/importer.py: vazão, memória
+#         estável (pico de RSS não cresce com o arquivo), retomada após interrupção no meio
+#         e reimportação sem alterações (upsert que não regrava linhas iguais).
+#
+# Uso: python benchmarks/bench_import.py [--rows 1000000] [--chunk-size 2000] [--max-rss-growth-mb 64]
+# Sai com código 1 se a contagem divergir, a retomada repetir/perder linhas ou a memória crescer demais.
+
+from __future__ import annotations
+
+import argparse
+import resource
+import sys
+from pathlib import Path
+
+from _common import Timer, temp_database
+
+import database
+from modules.importer import import_file
+
+
+class _Interrupted(Exception):
+    pass
+
+
+def _write_csv(path: Path, rows: int) -> None:
+    # Formato do Excel brasileiro: ";" e vírgula decimal; ~1% das linhas com erro.
+    with open(path, "w", encoding="cp1252", newline="") as fh:
+        fh.write("Código;Descrição;Preço de venda;Ativo\r\n")
+        for i in range(rows):
+            price = "abc" if i % 100 == 99 else f"{(i % 5000) + 0.9:.2f}".replace(".", ",")
+            fh.write(f"P{i:07d};Produto ação {i} {i % 97}kg;{price};{'sim' if i % 10 else 'não'}\r\n")
+
+
+def _rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--max-rss-growth-mb", type=float, default=64.0)
+    args = parser.parse_args()
+
+    ok = True
+    expected_errors = args.rows // 100
+    expected_rows = args.rows - expected_errors
+
+    with temp_database() as db_path:
+        csv_path = db_path.parent / "produtos.csv"
+        with Timer() as t:
+            _write_csv(csv_path, args.rows)
+        print(f"CSV: {args.rows:,} linhas, {csv_path.stat().st_size / 1e6:.1f} MB gerados em {t.elapsed:.1f} s")
+
+        # 1) Interrompe no meio (simula queda do processo) e retoma pelo checkpoint.
+        stop_after = max(1, (args.rows // args.chunk_size) // 2)
+        seen = {"chunks": 0}
+
+        def crash(_: dict) -> None:
+            seen["chunks"] += 1
+            if seen["chunks"] == stop_after:
+                raise _Interrupted()
+
+        rss_before = _rss_mb()
+        with Timer() as t_first:
+            try:
+                import_file("products", csv_path, 1, chunk_size=args.chunk_size, progress=crash)
+            except _Interrupted:
+                pass
+        partial = database.fetch_one("SELECT line_no, rows_read FROM import_jobs ORDER BY id DESC LIMIT 1;")
+        with Timer() as t_resume:
+            result = import_file("products", csv_path, 1, chunk_size=args.chunk_size)
+        rss_growth = _rss_mb() - rss_before
+        elapsed = t_first.elapsed + t_resume.elapsed
+
+        count = database.fetch_one(
+            "SELECT COUNT(*) AS n FROM products WHERE company_id = 1 AND code LIKE 'P%';"
+        )["n"]
+        fts = database.fetch_one("SELECT COUNT(*) AS n FROM catalog_fts WHERE item_type = 'product';")["n"]
+        print(
+            f"importação: {args.rows:,} linhas em {elapsed:.1f} s = {args.rows / elapsed:,.0f} linhas/s "
+            f"(interrompida na linha {partial['line_no']:,} e retomada)"
+        )
+        print(
+            f"  gravadas={result['rows_written']:,} inalteradas={result['rows_unchanged']:,} "
+            f"com erro={result['rows_failed']:,}  produtos no banco={count:,}  no FTS (ativos)={fts:,}"
+        )
+        print(f"  pico de RSS cresceu {rss_growth:.1f} MB durante a importação")
+        if count != expected_rows or result["rows_written"] != expected_rows or result["rows_failed"] != expected_errors:
+            print(f"  esperado: {expected_rows:,} gravadas e {expected_errors:,} erros")
+            ok = False
+        if result["rows_read"] != args.rows:
+            print(f"  retomada leu {result['rows_read']:,} linhas (esperado {args.rows:,})")
+            ok = False
+        if rss_growth > args.max_rss_growth_mb:
+            print(f"  memória acima do limite de {args.max_rss_growth_mb:.0f} MB")
+            ok = False
+
+        # 2) Mesmo arquivo de novo: nenhuma linha deve ser regravada.
+        with Timer() as t:
+            again = import_file("products", csv_path, 1, chunk_size=args.chunk_size, restart=True)
+        print(
+            f"reimportação: {args.rows / t.elapsed:,.0f} linhas/s  gravadas={again['rows_written']:,} "
+            f"inalteradas={again['rows_unchanged']:,}"
+        )
+        if again["rows_written"] != 0 or again["rows_unchanged"] != expected_rows:
+            ok = False
+
+    print("OK" if ok else "FALHOU")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
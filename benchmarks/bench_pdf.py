@@ -0,0 +1,67 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\benchmarks\bench_pdf.py
+# Último recode: 2026-10-17 16:20 (America/Bahia)
+# Motivo: Vazão de renderização de PDF de orçamento: renders novos no pool de processos
+#         (workers aquecidos) vs. acertos no cache por hash.
+#
+# Uso: python benchmarks/bench_pdf.py [--docs 40] [--workers 2] [--items 15]
+# Requer weasyprint instalado (requirements.txt).
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+from _common import Timer
+
+from modules.pdf import PdfRenderer, budget_html
+
+
+def _document(i: int, items: int) -> str:
+    budget = {"code": f"ORC-2026-{i:04d}", "total": 123.45 * items, "created_at": "2026-10-17T12:00:00Z"}
+    rows = [
+        {"description_snapshot": f"Cimento CP-II 50kg lote {n}", "qty": 2, "unit_price": 61.725, "subtotal": 123.45}
+        for n in range(items)
+    ]
+    return budget_html(budget, rows, "Loja Exemplo", f"Cliente {i}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--items", type=int, default=15)
+    args = parser.parse_args()
+
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError):
+        # OSError: pacote instalado, mas sem as bibliotecas nativas (pango/cairo).
+        print("weasyprint não está disponível; instale requirements.txt para rodar este benchmark.")
+        return 2
+
+    docs = [_document(i, args.items) for i in range(args.docs)]
+    with tempfile.TemporaryDirectory(prefix="gestflow-pdf-") as tmp:
+        renderer = PdfRenderer(cache_dir=Path(tmp), workers=args.workers)
+        try:
+            # Aquece os workers (import do weasyprint + CSS/fontes) fora da medição.
+            renderer.render(_document(-1, 1))
+
+            with Timer() as cold:
+                for f in [renderer.render_async(d) for d in docs]:
+                    f.result()
+            with Timer() as warm:
+                for d in docs:
+                    renderer.render(d)
+        finally:
+            renderer.shutdown()
+
+    print(f"render novo ({args.workers} workers): {args.docs / cold.elapsed:8.1f} PDFs/s")
+    print(f"acerto de cache             : {args.docs / warm.elapsed:8.1f} PDFs/s")
+    print(f"renders={renderer.renders} hits={renderer.hits}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\benchmarks\bench_pool.py
+# Último recode: 2026-10-17 09:20 (America/Bahia)
+# Motivo: Medir queries/segundo de fetch_one/execute com conexão por chamada vs. pool.
+#
+# Uso: python benchmarks/bench_pool.py [--queries 5000] [--threads 4]
+
+from __future__ import annotations
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from _common import Timer, temp_database
+
+import database
+
+
+def _run(queries: int, threads: int) -> float:
+    company = database.fetch_one("SELECT id FROM companies ORDER BY id LIMIT 1;")
+    company_id = int(company["id"])
+
+    def worker(n: int) -> None:
+        for i in range(n):
+            if i % 5 == 0:
+                database.execute(
+                    "UPDATE companies SET name=? WHERE id=?;",
+                    (f"GESTFLOW {i}", company_id),
+                )
+            else:
+                database.fetch_one("SELECT id, name FROM companies WHERE id=?;", (company_id,))
+
+    per_thread = max(1, queries // threads)
+    with Timer() as t:
+        with ThreadPoolExecutor(max_workers=threads) as ex:
+            list(ex.map(worker, [per_thread] * threads))
+    return (per_thread * threads) / t.elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    with temp_database(pool_size=0):
+        before = _run(args.queries, args.threads)
+    with temp_database(pool_size=max(args.threads, 1)):
+        after = _run(args.queries, args.threads)
+
+    print(f"conexão por chamada : {before:10.0f} queries/s")
+    print(f"pool de conexões    : {after:10.0f} queries/s")
+    print(f"ganho               : {after / before:10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\benchmarks\bench_reminders.py
+# Último recode: 2026-10-17 21:50 (America/Bahia)
+# Motivo: Vazão do envio de lembretes (modules/reminders.py + DeliveryPool) contra o
+#         StubSender com latência e falhas transitórias simuladas: 1 worker vs. vários,
+#         e aderência ao limite de taxa. Falha se sobrar pendência, houver duplicata
+#         ou o limite for excedido.
+#
+# Uso: python benchmarks/bench_reminders.py [--titles 1000] [--latency-ms 20] [--fail-rate 0.05]
+
+from __future__ import annotations
+
+import argparse
+import sys
+from collections import Counter
+from datetime import date, timedelta
+
+from _common import Timer, temp_database
+
+import database
+from modules import reminders
+from modules.outbound import DeliveryPool, StubSender
+
+TODAY = date(2026, 10, 17)
+
+
+def _seed(titles: int) -> None:
+    now = database.utc_iso()
+    database.execute_many(
+        "INSERT INTO customers (id, company_id, name, phone, created_at) VALUES (?, 1, ?, ?, ?);",
+        [(i, f"Cliente {i}", f"(71) 9{i:04d}-{i % 10000:04d}", now) for i in range(1, titles + 1)],
+    )
+    database.execute_many(
+        "INSERT INTO sales (id, company_id, code, customer_id, status, total, created_at) "
+        "VALUES (?, 1, ?, ?, 'open', 100, ?);",
+        [(i, f"VEN-{i}", i, now) for i in range(1, titles + 1)],
+    )
+    # Metade vence nos próximos dias, metade já venceu.
+    database.execute_many(
+        "INSERT INTO accounts_receivable (company_id, sale_id, status, due_date, total, created_at) "
+        "VALUES (1, ?, 'open', ?, 100, ?);",
+        [(i, (TODAY + timedelta(days=(i % 7) - 3)).isoformat(), now) for i in range(1, titles + 1)],
+    )
+
+
+def _round(workers: int, rate: float, args: argparse.Namespace) -> int:
+    failures = 0
+    with temp_database():
+        _seed(args.titles)
+        stub = StubSender(delay=args.latency_ms / 1000.0, fail_rate=args.fail_rate, seed=18)
+        pool = DeliveryPool(
+            sender_factory=lambda: stub, workers=workers, rate_per_second=rate, burst=workers,
+            max_attempts=6, backoff_seconds=0.005,
+        )
+        with Timer() as t:
+            stats = reminders.run_once(today=TODAY, pool=pool)
+        pool.close()
+
+        pending = database.fetch_one(
+            "SELECT COUNT(*) AS n FROM message_deliveries WHERE status <> 'sent';"
+        )["n"]
+        dupes = [k for k, n in Counter(stub.sent).items() if n > 1]
+        attempts = len(stub.sent) + stub.failures
+        throughput = len(stub.sent) / t.elapsed
+        label = f"{workers} worker(s), limite {'livre' if rate <= 0 else f'{rate:.0f}/s'}"
+        print(
+            f"{label:<28} {stats['queued']:>6} msgs em {t.elapsed:6.2f} s = {throughput:7.1f} msg/s "
+            f"(tentativas {attempts}, falhas simuladas {stub.failures})"
+        )
+        if pending or stats["failed"]:
+            failures += 1
+            print(f"FALHA: {pending} mensagem(ns) sem envio confirmado")
+        if dupes:
+            failures += 1
+            print(f"FALHA: {len(dupes)} mensagem(ns) enviada(s) em duplicidade")
+        if rate > 0 and attempts / t.elapsed > rate * 1.1 + workers / t.elapsed:
+            failures += 1
+            print(f"FALHA: {attempts / t.elapsed:.1f} envios/s acima do limite de {rate:.0f}/s")
+        # Rodar de novo no mesmo dia não pode reenviar nada.
+        again = reminders.run_once(today=TODAY, pool=DeliveryPool(sender_factory=lambda: stub, workers=2))
+        if again["queued"] or again["sent"]:
+            failures += 1
+            print(f"FALHA: segunda rodada reenfileirou {again['queued']} mensagem(ns)")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--titles", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="latência simulada do provedor")
+    parser.add_argument("--fail-rate", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=200.0, help="limite de taxa na última rodada")
+    args = parser.parse_args()
+
+    failures = 0
+    failures += _round(1, 0, args)
+    failures += _round(args.workers, 0, args)
+    failures += _round(args.workers, args.rate, args)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
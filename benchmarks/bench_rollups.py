@@ -0,0 +1,79 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\benchmarks\bench_rollups.py
+# Último recode: 2026-10-17 18:45 (America/Bahia)
+# Motivo: Latência do relatório "vendas do mês" conforme o histórico cresce:
+#         SUM direto em sales vs. soma dos buckets diários de sales_daily.
+#
+# Uso: python benchmarks/bench_rollups.py [--sizes 10000,100000,300000] [--repeat 20]
+
+from __future__ import annotations
+
+import argparse
+from datetime import datetime, timedelta
+
+from _common import Timer, percentile, temp_database
+
+import database
+from modules import reports
+
+RAW_SQL = (
+    "SELECT COUNT(*) AS sales_count, COALESCE(SUM(total), 0) AS total FROM sales "
+    "WHERE company_id = ? AND status <> 'cancelled' "
+    "AND date(created_at, '-3 hours') BETWEEN ? AND ?;"
+)
+
+
+def _grow(total_rows: int, already: int) -> None:
+    """
+    Acrescenta vendas até `total_rows`, espalhadas em ~3 anos, 3 empresas.
+    """
+    base = datetime(2024, 1, 1)
+    batch = []
+    for i in range(already, total_rows):
+        ts = (base + timedelta(minutes=(i * 7) % (3 * 365 * 24 * 60))).strftime("%Y-%m-%dT%H:%M:%SZ")
+        batch.append((1 + i % 3, f"VEN-{i}", 1, "paid" if i % 10 else "open", float(i % 200 + 1), ts))
+        if len(batch) == 10000:
+            database.execute_many(
+                "INSERT INTO sales (company_id, code, customer_id, status, total, created_at) VALUES (?, ?, ?, ?, ?, ?);",
+                batch,
+            )
+            batch = []
+    if batch:
+        database.execute_many(
+            "INSERT INTO sales (company_id, code, customer_id, status, total, created_at) VALUES (?, ?, ?, ?, ?, ?);",
+            batch,
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,300000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    sizes = [int(x) for x in args.sizes.split(",")]
+
+    with temp_database():
+        database.execute_many(
+            "INSERT INTO companies (id, name, created_at) VALUES (?, ?, '2024-01-01');",
+            [(2, "Empresa 2"), (3, "Empresa 3")],
+        )
+        database.execute("INSERT INTO customers (company_id, name, created_at) VALUES (1, 'Cliente', '2024-01-01');")
+        start, end = "2025-06-01", "2025-06-30"
+        rows = 0
+        print(f"{'vendas':>9} {'SUM direto p50':>15} {'rollup p50':>11}")
+        for size in sizes:
+            _grow(size, rows)
+            rows = size
+            raw, rolled = [], []
+            for _ in range(args.repeat):
+                with Timer() as t:
+                    expected = database.fetch_one(RAW_SQL, (1, start, end))
+                raw.append(t.elapsed * 1000)
+                with Timer() as t:
+                    got = reports.sales_totals(1, start, end)
+                rolled.append(t.elapsed * 1000)
+            assert int(expected["sales_count"]) == got["sales_count"], (expected, got)
+            print(f"{size:>9} {percentile(raw, 50):>12.2f} ms {percentile(rolled, 50):>8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\benchmarks\bench_rows.py
+# Último recode: 2026-10-17 10:05 (America/Bahia)
+# Motivo: Comparar tempo e pico de memória de fetch_all (dict) vs. fetch_iter (Record em streaming).
+#
+# Uso: python benchmarks/bench_rows.py [--rows 200000]
+
+from __future__ import annotations
+
+import argparse
+import tracemalloc
+from typing import Callable
+
+from _common import Timer, temp_database
+
+import database
+
+
+def _seed(rows: int) -> None:
+    company_id = int(database.fetch_one("SELECT id FROM companies LIMIT 1;")["id"])
+    with database.db_cursor() as cur:
+        cur.execute(
+            "INSERT INTO products (company_id, code, name, price_sale, created_at) VALUES (?, 'P1', 'Produto', 10, '2026-01-01');",
+            (company_id,),
+        )
+        product_id = int(cur.lastrowid)
+        cur.executemany(
+            "INSERT INTO stock_movements (company_id, product_id, movement_type, qty, reason, ref_type, created_at) "
+            "VALUES (?, ?, 'in', ?, 'bench', 'manual', '2026-01-01T00:00:00Z');",
+            ((company_id, product_id, float(i % 17 + 1)) for i in range(rows)),
+        )
+
+
+def _measure(label: str, fn: Callable[[], float]) -> None:
+    tracemalloc.start()
+    with Timer() as t:
+        total = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:28s} {t.elapsed * 1000:9.1f} ms  pico {peak / 1024 / 1024:8.2f} MiB  (soma={total:.0f})")
+
+
+SQL = "SELECT id, company_id, product_id, movement_type, qty, reason, created_at FROM stock_movements;"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    with temp_database():
+        _seed(args.rows)
+        _measure("fetch_all (dict)", lambda: sum(r["qty"] for r in database.fetch_all(SQL)))
+        _measure("fetch_iter (dict)", lambda: sum(r["qty"] for r in database.fetch_iter(SQL, as_dict=True)))
+        _measure("fetch_iter (Record)", lambda: sum(r["qty"] for r in database.fetch_iter(SQL)))
+        _measure(
+            "fetch_batches (Record)",
+            lambda: sum(r.qty for batch in database.fetch_batches(SQL, size=1000) for r in batch),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\benchmarks\bench_sale_write.py
+# Último recode: 2026-10-17 11:02 (America/Bahia)
+# Motivo: Medir latência de gravação de uma venda (sale + N itens + N movimentos + pagamento)
+#         com execute() por comando vs. transaction() + execute_many + RETURNING.
+#
+# Uso: python benchmarks/bench_sale_write.py [--sales 50] [--items 1,5,10,25,50]
+
+from __future__ import annotations
+
+import argparse
+from typing import List, Tuple
+
+from _common import Timer, percentile, temp_database
+
+import database
+
+NOW = "2026-01-01T00:00:00Z"
+
+
+def _seed() -> Tuple[int, int, List[int]]:
+    company_id = int(database.fetch_one("SELECT id FROM companies LIMIT 1;")["id"])
+    customer_id = database.execute(
+        "INSERT INTO customers (company_id, name, created_at) VALUES (?, 'Cliente', ?);",
+        (company_id, NOW),
+    )
+    database.execute_many(
+        "INSERT INTO products (company_id, code, name, price_sale, created_at) VALUES (?, ?, ?, 10, ?);",
+        [(company_id, f"P{i}", f"Produto {i}", NOW) for i in range(100)],
+    )
+    product_ids = [int(r["id"]) for r in database.fetch_all("SELECT id FROM products ORDER BY id;")]
+    return company_id, customer_id, product_ids
+
+
+def _write_per_statement(company_id: int, customer_id: int, products: List[int], code: str) -> None:
+    sale_id = database.execute(
+        "INSERT INTO sales (company_id, code, customer_id, status, total, created_at) VALUES (?, ?, ?, 'paid', ?, ?);",
+        (company_id, code, customer_id, 10.0 * len(products), NOW),
+    )
+    for pid in products:
+        database.execute(
+            "INSERT INTO sale_items (company_id, sale_id, item_type, item_id, description_snapshot, unit_price, qty, subtotal) "
+            "VALUES (?, ?, 'product', ?, 'Produto', 10, 1, 10);",
+            (company_id, sale_id, pid),
+        )
+        database.execute(
+            "INSERT INTO stock_movements (company_id, product_id, movement_type, qty, ref_type, ref_id, created_at) "
+            "VALUES (?, ?, 'sale', 1, 'sale', ?, ?);",
+            (company_id, pid, sale_id, NOW),
+        )
+    database.execute(
+        "INSERT INTO payments (company_id, direction, origin_type, origin_id, method, amount, paid_at) "
+        "VALUES (?, 'in', 'sale_direct', ?, 'pix', ?, ?);",
+        (company_id, sale_id, 10.0 * len(products), NOW),
+    )
+
+
+def _write_unit_of_work(company_id: int, customer_id: int, products: List[int], code: str) -> None:
+    with database.transaction() as tx:
+        sale = tx.insert_returning(
+            "INSERT INTO sales (company_id, code, customer_id, status, total, created_at) "
+            "VALUES (?, ?, ?, 'paid', ?, ?) RETURNING id;",
+            (company_id, code, customer_id, 10.0 * len(products), NOW),
+        )
+        sale_id = int(sale["id"])
+        tx.execute_many(
+            "INSERT INTO sale_items (company_id, sale_id, item_type, item_id, description_snapshot, unit_price, qty, subtotal) "
+            "VALUES (?, ?, 'product', ?, 'Produto', 10, 1, 10);",
+            [(company_id, sale_id, pid) for pid in products],
+        )
+        tx.execute_many(
+            "INSERT INTO stock_movements (company_id, product_id, movement_type, qty, ref_type, ref_id, created_at) "
+            "VALUES (?, ?, 'sale', 1, 'sale', ?, ?);",
+            [(company_id, pid, sale_id, NOW) for pid in products],
+        )
+        tx.execute(
+            "INSERT INTO payments (company_id, direction, origin_type, origin_id, method, amount, paid_at) "
+            "VALUES (?, 'in', 'sale_direct', ?, 'pix', ?, ?);",
+            (company_id, sale_id, 10.0 * len(products), NOW),
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sales", type=int, default=50)
+    parser.add_argument("--items", default="1,5,10,25,50")
+    args = parser.parse_args()
+    item_counts = [int(x) for x in args.items.split(",")]
+
+    with temp_database():
+        company_id, customer_id, product_ids = _seed()
+        print(f"{'itens':>6} {'por comando p50':>16} {'transação p50':>14} {'ganho':>7}")
+        seq = 0
+        for n in item_counts:
+            products = product_ids[:n]
+            results = {}
+            for label, fn in (("stmt", _write_per_statement), ("uow", _write_unit_of_work)):
+                samples = []
+                for _ in range(args.sales):
+                    seq += 1
+                    with Timer() as t:
+                        fn(company_id, customer_id, products, f"VEN-{seq}")
+                    samples.append(t.elapsed * 1000)
+                results[label] = percentile(samples, 50)
+            print(f"{n:>6} {results['stmt']:>13.2f} ms {results['uow']:>11.2f} ms {results['stmt'] / results['uow']:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
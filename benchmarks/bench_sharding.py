@@ -0,0 +1,125 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\benchmarks\bench_sharding.py
+# Último recode: 2026-10-17 22:40 (America/Bahia)
+# Motivo: Vazão de escrita com várias empresas gravando ao mesmo tempo: um banco só
+#         (um lock de escrita global) vs. sharding por empresa e por N arquivos fixos.
+#         Cada transação grava venda + itens + título a receber + pagamento.
+#
+# Uso: python benchmarks/bench_sharding.py [--companies 8] [--tx 300] [--fixed-shards 4]
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import sys
+import threading
+from typing import List
+
+from _common import Timer, percentile, temp_database
+
+import config
+import database
+
+
+def _seed(companies: int) -> None:
+    now = database.utc_iso()
+    database.execute_many(
+        "INSERT OR IGNORE INTO companies (id, name, created_at) VALUES (?, ?, ?);",
+        [(c, f"Empresa {c}", now) for c in range(1, companies + 1)],
+    )
+    database.execute_many(
+        "INSERT INTO customers (id, company_id, name, created_at) VALUES (?, ?, 'Cliente', ?);",
+        [(c, c, now) for c in range(1, companies + 1)],
+    )
+
+
+def _writer(company_id: int, count: int, latencies: List[float], errors: List[str]) -> None:
+    with database.tenant(company_id):
+        for i in range(count):
+            now = database.utc_iso()
+            try:
+                with Timer() as t:
+                    with database.transaction() as tx:
+                        sale_id = tx.execute(
+                            "INSERT INTO sales (company_id, code, customer_id, status, total, created_at) "
+                            "VALUES (?, ?, ?, 'open', 300, ?);",
+                            (company_id, f"VEN-{company_id}-{i}", company_id, now),
+                        )
+                        tx.execute_many(
+                            "INSERT INTO sale_items (company_id, sale_id, item_type, item_id, description_snapshot, qty, "
+                            "unit_price, subtotal) VALUES (?, ?, 'product', 1, 'Item', 1, 100, 100);",
+                            [(company_id, sale_id)] * 3,
+                        )
+                        tx.execute(
+                            "INSERT INTO accounts_receivable (company_id, sale_id, status, due_date, total, created_at) "
+                            "VALUES (?, ?, 'open', '2026-11-17', 300, ?);",
+                            (company_id, sale_id, now),
+                        )
+                        tx.execute(
+                            "INSERT INTO payments (company_id, direction, origin_type, origin_id, method, amount, paid_at) "
+                            "VALUES (?, 'in', 'sale_direct', ?, 'pix', 100, ?);",
+                            (company_id, sale_id, now),
+                        )
+                latencies.append(t.elapsed * 1000)
+            except sqlite3.OperationalError as exc:
+                errors.append(str(exc))
+                if len(errors) == 1:
+                    print(f"erro: {exc}", file=sys.stderr)
+
+
+def _round(mode: str, args: argparse.Namespace) -> int:
+    config.SQLITE_SHARDING = mode
+    with temp_database(pool_size=4) as db_path:
+        config.SQLITE_SHARD_DIR = db_path.parent / "shards"
+        config.SQLITE_SHARD_COUNT = args.fixed_shards
+        try:
+            config.SQLITE_SHARDING = "off"
+            _seed(args.companies)
+            config.SQLITE_SHARDING = mode
+            if mode != "off":
+                from modules import sharding
+
+                sharding.split_all()
+
+            latencies: List[float] = []
+            errors: List[str] = []
+            threads = [
+                threading.Thread(target=_writer, args=(c, args.tx, latencies, errors))
+                for c in range(1, args.companies + 1)
+            ]
+            with Timer() as wall:
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+            rows = sum(
+                r["n"] for r in database.fan_out("SELECT COUNT(*) AS n FROM sales;")
+            )
+        finally:
+            config.SQLITE_SHARDING = "off"
+
+    label = {"off": "banco único", "company": "shard por empresa", "fixed": f"{args.fixed_shards} shards fixos"}[mode]
+    print(
+        f"{label:<20} {len(latencies) / wall.elapsed:8.0f} tx/s  p50={percentile(latencies, 50):6.2f} ms  "
+        f"p99={percentile(latencies, 99):7.2f} ms  erros de lock={len(errors)}"
+    )
+    expected = args.companies * args.tx
+    if rows != expected:
+        print(f"FALHA: {rows} vendas gravadas, esperado {expected}")
+        return 1
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--companies", type=int, default=8)
+    parser.add_argument("--tx", type=int, default=300, help="transações por empresa")
+    parser.add_argument("--fixed-shards", type=int, default=4)
+    args = parser.parse_args()
+
+    failures = sum(_round(mode, args) for mode in ("off", "company", "fixed"))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\benchmarks\bench_startup.py
+# Último recode: 2026-10-17 17:10 (America/Bahia)
+# Motivo: Tempo de boot (import do wsgi) e da primeira requisição em processos novos:
+#         banco novo (migrações), boot quente (schema atual) e boot "legado" (user_version=0,
+#         que reexecuta todo o DDL como o init_db antigo fazia em todo boot).
+#
+# Uso: python benchmarks/bench_startup.py [--runs 10]
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+from _common import ROOT_DIR, percentile
+
+_CHILD = r"""
+import json, time
+t0 = time.perf_counter()
+import wsgi
+t1 = time.perf_counter()
+client = wsgi.app.test_client()
+resp = client.post("/bot", data={"From": "whatsapp:+5571999990000", "Body": "oi", "MessageSid": "SMSTARTUP%d"})
+t2 = time.perf_counter()
+assert resp.status_code == 200
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "first_request_ms": (t2 - t1) * 1000}))
+"""
+
+
+def _run_child(db_path: Path, i: int) -> Dict[str, float]:
+    env = dict(os.environ, SQLITE_DB_PATH=str(db_path))
+    out = subprocess.run(
+        [sys.executable, "-c", _CHILD % i],
+        cwd=str(ROOT_DIR),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _report(label: str, samples: List[Dict[str, float]]) -> None:
+    imp = [s["import_ms"] for s in samples]
+    req = [s["first_request_ms"] for s in samples]
+    print(
+        f"{label:28s} import p50={percentile(imp, 50):7.1f} ms  "
+        f"1ª requisição p50={percentile(req, 50):7.1f} ms  total p50={percentile([a + b for a, b in zip(imp, req)], 50):7.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="gestflow-startup-") as tmp:
+        cold = [_run_child(Path(tmp) / f"cold{i}.db", i) for i in range(args.runs)]
+
+        warm_db = Path(tmp) / "warm.db"
+        _run_child(warm_db, 0)
+        warm = [_run_child(warm_db, i + 1) for i in range(args.runs)]
+
+        legacy = []
+        for i in range(args.runs):
+            conn = sqlite3.connect(str(warm_db))
+            conn.execute("PRAGMA user_version = 0;")
+            conn.close()
+            legacy.append(_run_child(warm_db, 1000 + i))
+
+    _report("banco novo (migrações)", cold)
+    _report("boot legado (todo o DDL)", legacy)
+    _report("boot quente (user_version)", warm)
+
+
+if __name__ == "__main__":
+    main()
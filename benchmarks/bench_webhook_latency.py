@@ -0,0 +1,96 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\benchmarks\bench_webhook_latency.py
+# Último recode: 2026-10-17 13:15 (America/Bahia)
+# Motivo: Latência p50/p99 do POST /bot sob carga concorrente (waitress local),
+#         comparando o modo síncrono (TwiML) com o modo assíncrono (fast-ack + workers).
+#
+# Uso: python benchmarks/bench_webhook_latency.py [--requests 400] [--concurrency 32] [--turn-ms 30]
+
+from __future__ import annotations
+
+import argparse
+import logging
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from _common import Timer, percentile, temp_database
+
+import config
+import modules.whatsapp as whatsapp
+from modules import webhook_async
+from modules.outbound import StubSender, set_sender
+from waitress.server import create_server
+
+
+def _post(url: str, i: int) -> float:
+    data = urllib.parse.urlencode(
+        {"From": f"whatsapp:+5571999{i % 50:06d}", "Body": f"mensagem {i}", "MessageSid": f"SM{uuid.uuid4().hex}"}
+    ).encode()
+    with Timer() as t:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data), timeout=60) as resp:
+            resp.read()
+    return t.elapsed * 1000
+
+
+def _run(url: str, requests: int, concurrency: int) -> List[float]:
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        return list(ex.map(lambda i: _post(url, i), range(requests)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--turn-ms", type=float, default=30.0, help="custo simulado de um turno do bot")
+    parser.add_argument("--waitress-threads", type=int, default=4)
+    args = parser.parse_args()
+
+    original = whatsapp.handle_message
+
+    def slow_handler(from_number: str, body: str) -> str:
+        time.sleep(args.turn_ms / 1000.0)
+        return original(from_number=from_number, body=body)
+
+    # Waitress avisa a cada tarefa enfileirada; aqui a fila é proposital.
+    logging.getLogger("waitress.queue").setLevel(logging.ERROR)
+
+    whatsapp.handle_message = slow_handler
+    stub = StubSender()
+    set_sender(stub)
+
+    with temp_database():
+        _serve_and_measure(args, stub)
+    whatsapp.handle_message = original
+    set_sender(None)
+
+
+def _serve_and_measure(args: argparse.Namespace, stub: StubSender) -> None:
+    from app import app
+
+    server = create_server(app, host="127.0.0.1", port=0, threads=args.waitress_threads)
+    # Thread daemon: o servidor morre junto com o processo (close() concorrente com o
+    # loop do waitress gera erros de descritor no encerramento).
+    threading.Thread(target=server.run, daemon=True).start()
+    url = f"http://127.0.0.1:{server.effective_port}{config.WEBHOOK_PATH}"
+
+    for mode in (False, True):
+        config.WEBHOOK_ASYNC = mode
+        samples = _run(url, args.requests, args.concurrency)
+        webhook_async.shutdown_worker_pool()
+        label = "assíncrono" if mode else "síncrono"
+        print(
+            f"{label:11s} p50={percentile(samples, 50):8.1f} ms  "
+            f"p99={percentile(samples, 99):8.1f} ms  max={max(samples):8.1f} ms"
+        )
+    print(
+        f"modo assíncrono: {len(stub.sent)} respostas via envio ativo, "
+        f"{args.requests - len(stub.sent)} recusadas (ocupado) por fila cheia"
+    )
+
+
+if __name__ == "__main__":
+    main()
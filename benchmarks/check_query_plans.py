@@ -0,0 +1,83 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\benchmarks\check_query_plans.py
+# Último recode: 2026-10-18 05:00 (America/Bahia)
+# Motivo: SQL importado das constantes dos módulos (sem cópias que divergem do código de produção).
+#
+# Uso: python benchmarks/check_query_plans.py   (sai com código 1 se houver SCAN)
+
+from __future__ import annotations
+
+import sys
+from typing import Any, Dict, List, Tuple
+
+from _common import temp_database
+
+import database
+from modules import aging, exports, flows, idempotency, pdf, reminders, reports, sequences, sessions, stock
+
+# (rótulo, SQL, parâmetros). O SQL vem das constantes dos próprios módulos, para que o plano
+# conferido seja o da consulta que roda em produção. Consulta quente nova: exponha e acrescente aqui.
+_PERIOD = (1, "2026-10-01", "2026-10-31")
+HOT_QUERIES: List[Tuple[str, str, Any]] = [
+    ("users por whatsapp", sessions.USER_SQL, (1, "x")),
+    ("wa_sessions por whatsapp", sessions.SESSION_SQL, (1, "x")),
+    ("webhook_messages por SID", idempotency.REPLY_SQL, ("SM1",)),
+    ("webhook_messages forget", idempotency.FORGET_SQL, ("SM1",)),
+    ("webhook_messages purge", idempotency.PURGE_SQL, ("2026-01-01",)),
+    ("saldo de estoque", stock.BALANCE_SQL, (1, 1)),
+    ("snapshot de inventário", stock.INVENTORY_SQL.format(active_filter=" AND p.active = 1"), (1,)),
+    ("cliente por nome", flows.CUSTOMER_BY_NAME_SQL, (1, "Maria")),
+    ("produto por código", flows.ITEM_BY_CODE_SQL.format(table="products"), (1, "P1")),
+    ("serviço por código", flows.ITEM_BY_CODE_SQL.format(table="services"), (1, "S1")),
+    ("venda por código", flows.SALE_BY_CODE_SQL, (1, "VEN-2026-0001")),
+    ("orçamento do PDF", pdf.BUDGET_SQL, (1, 1)),
+    ("itens do orçamento", pdf.BUDGET_ITEMS_SQL, (1,)),
+    ("sequência", sequences.UPSERT_SQL, {"company_id": 1, "key": "SALE", "year": 2026, "block": 1}),
+    ("vendas do período (rollup)", reports.SALES_TOTALS_SQL, (*_PERIOD, 0)),
+    ("vendas por dia (rollup)", reports.SALES_BY_DAY_SQL, _PERIOD),
+    ("pagamentos por método (rollup)", reports.PAYMENTS_TOTALS_SQL, _PERIOD),
+    ("fluxo de caixa (rollup)", reports.CASH_FLOW_SQL, _PERIOD),
+    ("envios pendentes", reminders.PENDING_SQL.format(company_filter=""), (0, 500)),
+    ("envios pendentes (empresa)", reminders.PENDING_SQL.format(company_filter="AND company_id = ? "), (0, 1, 500)),
+]
+
+for _kind in ("receivable", "payable"):
+    HOT_QUERIES.append((f"vencidos ({_kind})", aging.OVERDUE_SQL[_kind], (1, "2026-10-17")))
+    HOT_QUERIES.append((f"a vencer ({_kind})", aging.DUE_BETWEEN_SQL[_kind], (1, "2026-10-17", "2026-10-24")))
+    HOT_QUERIES.append((f"aging ({_kind})", aging.AGING_SQL[_kind], {"company_id": 1, "today": "2026-10-17"}))
+
+for _dataset, _sql in exports.DATASETS.items():
+    HOT_QUERIES.append((f"exportação ({_dataset})", _sql, (1, "2026-10-01T03:00:00Z", "2026-11-01T03:00:00Z")))
+
+
+def _full_scans(plan: List[Dict[str, Any]]) -> List[str]:
+    """
+    Linhas do plano que leem uma tabela/índice inteiro. Tabelas temporárias do próprio
+    SQLite (GROUP BY/ORDER BY, CTE materializada) não contam.
+    """
+    bad = []
+    for row in plan:
+        detail = str(row["detail"])
+        if detail.startswith("SCAN ") and not detail.startswith("SCAN CONSTANT ROW"):
+            bad.append(detail)
+    return bad
+
+
+def main() -> int:
+    failures = 0
+    with temp_database():
+        with database.db_connection() as conn:
+            for label, sql, params in HOT_QUERIES:
+                plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+                scans = _full_scans(plan)
+                status = "FALHA" if scans else "ok"
+                print(f"[{status:5s}] {label}")
+                for row in plan:
+                    print(f"          {row['detail']}")
+                failures += bool(scans)
+
+    print(f"\n{len(HOT_QUERIES) - failures}/{len(HOT_QUERIES)} consultas sem SCAN.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
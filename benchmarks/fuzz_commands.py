@@ -0,0 +1,181 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\benchmarks\fuzz_commands.py
+# Último recode: 2026-10-18 02:30 (America/Bahia)
+# Motivo: Fuzz do parser e da máquina de estados do WhatsApp: texto aleatório (unicode,
+#         pontuação, números) nunca derruba parse(); frases geradas pela gramática, com
+#         acentos/maiúsculas/espaços sorteados, caem no comando certo com os argumentos
+#         certos; sequências aleatórias de mensagens de vários números nunca derrubam
+#         handle_message nem deixam a sessão num estado inválido.
+#
+# Uso: python benchmarks/fuzz_commands.py [--cases 20000] [--messages 3000] [--seed 1]
+# Sai com código 1 na primeira categoria com falha (os exemplos que falharam são impressos).
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import traceback
+from typing import Any, Dict, List, Tuple
+
+from _common import temp_database
+
+import database
+from modules import flows
+from modules.commands import COMMAND_NAMES, GRAMMAR, PAYMENT_METHODS, REPORT_PERIODS, normalize, parse
+from modules.sessions import close_session_cache, get_session_cache
+
+_ALPHABET = (
+    "abcdefghijklmnopqrstuvwxyz ABCXYZ 0123456789 ,.;:!?/#+-*()[]{}\"'_~$%@ "
+    "áàâãéêíóôõúçÁÉÍÓÚÇñü ¿¡ \t\n 😀🛒 \u200b\u00a0 中文 ﬁ"
+)
+_ACCENTS = {"a": "áã", "e": "éê", "i": "í", "o": "óô", "u": "ú", "c": "ç"}
+USERS = [f"whatsapp:+55719999900{i:02d}" for i in range(4)]
+STRANGER = "whatsapp:+5571888888888"
+
+
+def _random_text(rng: random.Random) -> str:
+    return "".join(rng.choice(_ALPHABET) for _ in range(rng.randint(0, 40)))
+
+
+def _mangle(rng: random.Random, word: str) -> str:
+    """
+    Variação que o usuário digitaria: acento onde cabe, maiúsculas aleatórias.
+    """
+    out = []
+    for ch in word:
+        if ch in _ACCENTS and rng.random() < 0.3:
+            ch = rng.choice(_ACCENTS[ch])
+        out.append(ch.upper() if rng.random() < 0.3 else ch)
+    return "".join(out)
+
+
+def _spacing(rng: random.Random, words: List[str]) -> str:
+    glue = [rng.choice([" ", "  ", " \t"]) for _ in words]
+    text = "".join(w + g for w, g in zip(words, glue)).strip()
+    return rng.choice(["", " ", "/"]) + text + rng.choice(["", "!", " ", "?!"])
+
+
+def _generated(rng: random.Random) -> Tuple[str, str, Dict[str, Any]]:
+    """
+    (texto, comando esperado, argumentos esperados) a partir da gramática.
+    """
+    name, keywords, _ = rng.choice(GRAMMAR)
+    keyword = rng.choice([k for k in keywords if k.isalpha() or " " in k])
+    words = [_mangle(rng, w) for w in keyword.split()]
+    qty = rng.randint(1, 999)
+    code = f"P{rng.randint(1, 9999):04d}"
+    expected: Dict[str, Any] = {}
+    if name in ("item_add", "stock_in", "stock_out"):
+        words += [str(qty), code.lower()]
+        expected = {"qty": float(qty), "code": code}
+    elif name in ("item_remove", "stock_query"):
+        words.append(code)
+        expected = {"code": code}
+    elif name == "customer":
+        person = rng.choice(["José", "Maria da Penha", "ANA", "João Paulo"])
+        words += person.split()
+        expected = {"name": person}
+    elif name == "search":
+        words += ["cimento", "cp2"]
+        expected = {"query": "cimento cp2"}
+    elif name == "payment":
+        method = rng.choice(list(PAYMENT_METHODS))
+        if rng.random() < 0.5:
+            words += [f"{qty},50", _mangle(rng, method)]
+            expected = {"amount": qty + 0.5, "method": PAYMENT_METHODS[method]}
+        else:
+            # Milhar pt-BR com ponto: "1.500" é mil e quinhentos, nunca 1,5.
+            words += [f"{qty // 100 + 1}.{qty:03d}", _mangle(rng, method)]
+            expected = {"amount": (qty // 100 + 1) * 1000.0 + qty, "method": PAYMENT_METHODS[method]}
+    elif name == "report":
+        period = rng.choice(list(REPORT_PERIODS))
+        words.append(_mangle(rng, period))
+        expected = {"period": REPORT_PERIODS[period]}
+    return _spacing(rng, words), name, expected
+
+
+def _check(label: str, failures: List[str], limit: int = 10) -> bool:
+    print(f"[{'FALHA' if failures else 'ok':5s}] {label}")
+    for line in failures[:limit]:
+        print(f"          {line}")
+    return not failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases", type=int, default=20_000)
+    parser.add_argument("--messages", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    ok = True
+
+    # 1) Lixo aleatório: sem exceção, nome conhecido e normalize() idempotente.
+    failures: List[str] = []
+    for _ in range(args.cases):
+        text = _random_text(rng)
+        try:
+            cmd = parse(text)
+            if cmd.name not in COMMAND_NAMES:
+                failures.append(f"{text!r}: comando {cmd.name!r}")
+            once = normalize(text)
+            if normalize(once) != once:
+                failures.append(f"{text!r}: normalize não é idempotente ({once!r})")
+        except Exception as exc:  # noqa: BLE001
+            failures.append(f"{text!r}: {type(exc).__name__}: {exc}")
+    ok &= _check(f"texto aleatório ({args.cases:,} casos)", failures)
+
+    # 2) Frases da gramática: comando e argumentos esperados.
+    failures = []
+    for _ in range(args.cases):
+        text, name, expected = _generated(rng)
+        cmd = parse(text)
+        if cmd.name != name or any(cmd.args.get(k) != v for k, v in expected.items()):
+            failures.append(f"{text!r}: esperado {name} {expected}, veio {cmd!r}")
+    ok &= _check(f"frases da gramática ({args.cases:,} casos)", failures)
+
+    # 3) Conversas aleatórias em várias sessões (inclui número não cadastrado).
+    vocabulary = [_generated(rng)[0] for _ in range(200)] + ["1", "2", "3", "9", "", "confirmar", "cancelar"]
+    failures = []
+    close_session_cache()
+    try:
+        with temp_database():
+            now = "2026-01-01T00:00:00Z"
+            with database.transaction() as cur:
+                for phone in USERS:
+                    cur.execute(
+                        "INSERT INTO users (company_id, whatsapp, name, role, created_at) VALUES (1, ?, 'Fuzz', 'owner', ?);",
+                        (phone, now),
+                    )
+                cur.execute_many(
+                    "INSERT INTO products (company_id, code, name, price_sale, created_at) VALUES (1, ?, ?, ?, ?);",
+                    [(f"P{i:04d}", f"Produto {i} cimento", 5 + i % 50, now) for i in range(1, 301)],
+                )
+            cache = get_session_cache()
+            for _ in range(args.messages):
+                phone = rng.choice(USERS + [STRANGER])
+                text = rng.choice(vocabulary) if rng.random() < 0.8 else _random_text(rng)
+                try:
+                    reply = flows.handle_message(phone, text, company_id=1)
+                    if not isinstance(reply, str) or not reply:
+                        failures.append(f"{phone} {text!r}: resposta vazia")
+                    state = cache.get(1, phone).state
+                    if state not in flows.STATES:
+                        failures.append(f"{phone} {text!r}: estado inválido {state!r}")
+                except Exception:  # noqa: BLE001
+                    failures.append(f"{phone} {text!r}: {traceback.format_exc(limit=3)}")
+            cache.flush()
+            stored = database.fetch_all("SELECT DISTINCT state FROM wa_sessions WHERE company_id = 1;")
+            bad = [row["state"] for row in stored if row["state"] not in flows.STATES]
+            if bad:
+                failures.append(f"wa_sessions com estado inválido: {bad}")
+    finally:
+        close_session_cache()
+    ok &= _check(f"conversas aleatórias ({args.messages:,} mensagens, {len(USERS) + 1} números)", failures)
+
+    print("OK" if ok else "FALHOU")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\benchmarks\stress_sequences.py
+# Último recode: 2026-10-17 12:30 (America/Bahia)
+# Motivo: Estressar o alocador ORC/VEN com muitas threads e conferir duplicatas e buracos,
+#         incluindo a virada de ano.
+#
+# Uso: python benchmarks/stress_sequences.py [--threads 16] [--per-thread 200]
+# Sai com código 1 se encontrar duplicata (ou buraco com block_size=1).
+
+from __future__ import annotations
+
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from _common import Timer, temp_database
+
+from modules.sequences import KEY_BUDGET, SequenceAllocator
+
+
+def _hammer(allocator: SequenceAllocator, threads: int, per_thread: int, years: Tuple[int, ...]) -> List[Tuple[int, int]]:
+    def worker(i: int) -> List[Tuple[int, int]]:
+        out = []
+        for n in range(per_thread):
+            # Metade antes e metade depois da virada de ano.
+            year = years[min(len(years) - 1, n * len(years) // per_thread)]
+            out.append(allocator.next_number(1, KEY_BUDGET, year=year))
+        return out
+
+    with ThreadPoolExecutor(max_workers=threads) as ex:
+        return [item for chunk in ex.map(worker, range(threads)) for item in chunk]
+
+
+def _check(label: str, issued: List[Tuple[int, int]], block_size: int, elapsed: float) -> bool:
+    ok = True
+    by_year = {}
+    for year, number in issued:
+        by_year.setdefault(year, []).append(number)
+
+    for year, numbers in sorted(by_year.items()):
+        dupes = len(numbers) - len(set(numbers))
+        expected = set(range(1, max(numbers) + 1))
+        gaps = len(expected - set(numbers))
+        print(f"  {label} ano={year}: emitidos={len(numbers)} duplicatas={dupes} buracos={gaps}")
+        if dupes or (block_size == 1 and gaps):
+            ok = False
+    print(f"  {label}: {len(issued) / elapsed:,.0f} códigos/s")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--per-thread", type=int, default=200)
+    args = parser.parse_args()
+
+    ok = True
+    for block_size in (1, 50):
+        with temp_database(pool_size=args.threads):
+            allocator = SequenceAllocator(block_size=block_size)
+            with Timer() as t:
+                issued = _hammer(allocator, args.threads, args.per_thread, years=(2025, 2026))
+            ok &= _check(f"block_size={block_size}", issued, block_size, t.elapsed)
+
+    print("OK" if ok else "FALHOU")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\benchmarks\stress_writer.py
+# Último recode: 2026-10-18 06:10 (America/Bahia)
+# Motivo: Estressar leituras e escritas misturadas nos dois modos de escrita (direct e queue)
+#         e contar erros "database is locked". No modo queue a contagem tem que ser zero e
+#         todas as linhas confirmadas precisam estar no banco. Por último, BEGIN recusado
+#         (lock preso por outra conexão): os jobs do lote falham em vez de ficar pendentes.
+#
+# Uso: python benchmarks/stress_writer.py [--writers 16] [--readers 8] [--per-writer 300]
+# Sai com código 1 se o modo queue tiver erro de lock, falha de escrita, contagem divergente
+# ou job pendente depois do BEGIN recusado.
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Dict, List
+
+from _common import Timer, summarize, temp_database
+
+import config
+import database
+
+
+def _seed() -> None:
+    now = database.utc_iso()
+    database.execute("INSERT OR IGNORE INTO companies (id, name, created_at) VALUES (1, 'Empresa', ?);", (now,))
+
+
+def _write_one(worker: int, i: int) -> None:
+    now = database.utc_iso()
+    if i % 3:
+        # Comando isolado (execute -> fila no modo queue).
+        database.execute(
+            "INSERT INTO customers (company_id, name, phone, created_at) VALUES (1, ?, ?, ?);",
+            (f"Cliente {worker}-{i}", f"55{worker:03d}{i:06d}", now),
+        )
+        return
+    # Unidade de trabalho com várias instruções (transaction()).
+    with database.transaction() as tx:
+        customer_id = tx.execute(
+            "INSERT INTO customers (company_id, name, phone, created_at) VALUES (1, ?, ?, ?);",
+            (f"Cliente {worker}-{i}", f"55{worker:03d}{i:06d}", now),
+        )
+        tx.execute(
+            "INSERT INTO sales (company_id, code, customer_id, status, total, created_at) VALUES (1, ?, ?, 'open', 10, ?);",
+            (f"VEN-{worker}-{i}", customer_id, now),
+        )
+
+
+def _round(mode: str, args: argparse.Namespace) -> Dict[str, object]:
+    config.SQLITE_WRITE_MODE = mode
+    with temp_database(pool_size=args.writers + args.readers):
+        _seed()
+        errors: Dict[str, int] = {"locked": 0, "other": 0}
+        write_ms: List[float] = []
+        read_ms: List[float] = []
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def count_error(exc: Exception) -> None:
+            key = "locked" if isinstance(exc, sqlite3.OperationalError) and "locked" in str(exc) else "other"
+            with lock:
+                errors[key] += 1
+                first = errors["locked"] + errors["other"] == 1
+            if first:
+                print(f"  erro ({mode}): {exc}", file=sys.stderr)
+
+        def writer(worker: int) -> int:
+            ok = 0
+            for i in range(args.per_writer):
+                try:
+                    with Timer() as t:
+                        _write_one(worker, i)
+                except Exception as exc:
+                    count_error(exc)
+                    continue
+                write_ms.append(t.elapsed * 1000)
+                ok += 1 + (0 if i % 3 else 1)
+            return ok
+
+        def reader(_: int) -> None:
+            while not done.is_set():
+                try:
+                    with Timer() as t:
+                        database.fetch_all(
+                            "SELECT c.id, COUNT(s.id) AS n FROM customers c LEFT JOIN sales s ON s.customer_id = c.id "
+                            "WHERE c.company_id = 1 GROUP BY c.id ORDER BY c.id DESC LIMIT 20;"
+                        )
+                except Exception as exc:
+                    count_error(exc)
+                    continue
+                read_ms.append(t.elapsed * 1000)
+
+        with ThreadPoolExecutor(max_workers=args.readers) as readers:
+            for r in range(args.readers):
+                readers.submit(reader, r)
+            with Timer() as t:
+                with ThreadPoolExecutor(max_workers=args.writers) as ex:
+                    expected_rows = sum(ex.map(writer, range(args.writers)))
+            done.set()
+
+        row = database.fetch_one(
+            "SELECT (SELECT COUNT(*) FROM customers) + (SELECT COUNT(*) FROM sales) AS n;"
+        )
+        writer_stats = database.get_writer().stats() if mode == "queue" else {}
+
+    return {
+        "mode": mode,
+        "errors": errors,
+        "rows_expected": expected_rows,
+        "rows_found": int(row["n"]),
+        "writes": summarize(write_ms, t.elapsed),
+        "reads": summarize(read_ms, t.elapsed),
+        "writer": writer_stats,
+    }
+
+
+def _begin_refused(jobs: int = 5, wait: float = 30.0) -> bool:
+    """
+    Outra conexão segura o lock de escrita além do busy timeout da thread escritora: todo
+    job do lote (inclusive os que não começaram) tem que falhar com "locked". Solto o lock,
+    a fila volta a gravar.
+    """
+    config.SQLITE_WRITE_MODE = "queue"
+    with temp_database(pool_size=2) as db_path:
+        _seed()
+        writer = database.get_writer()
+        holder = sqlite3.connect(str(db_path), isolation_level=None)
+        try:
+            holder.execute("BEGIN IMMEDIATE;")
+            futures = [
+                writer.submit(
+                    lambda tx, i=i: tx.execute(
+                        "INSERT INTO customers (company_id, name, created_at) VALUES (1, ?, ?);",
+                        (f"Bloqueado {i}", database.utc_iso()),
+                    )
+                )
+                for i in range(jobs)
+            ]
+            failed = pending = 0
+            for future in futures:
+                try:
+                    future.result(timeout=wait)
+                except sqlite3.OperationalError:
+                    failed += 1
+                except FutureTimeout:
+                    pending += 1
+            holder.execute("ROLLBACK;")
+        finally:
+            holder.close()
+        database.execute("INSERT INTO customers (company_id, name, created_at) VALUES (1, 'Depois', ?);", (database.utc_iso(),))
+        row = database.fetch_one("SELECT COUNT(*) AS n FROM customers;")
+
+    print(f"BEGIN recusado: {failed}/{jobs} jobs falharam, {pending} pendentes; depois do lock: {row['n']} linha(s)")
+    return failed == jobs and pending == 0 and row["n"] == 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--per-writer", type=int, default=300)
+    parser.add_argument("--batch-max", type=int, default=config.SQLITE_WRITER_BATCH_MAX)
+    args = parser.parse_args()
+
+    config.SQLITE_WRITER_BATCH_MAX = args.batch_max
+    original_mode = config.SQLITE_WRITE_MODE
+    ok = True
+    try:
+        for mode in ("direct", "queue"):
+            result = _round(mode, args)
+            writes, reads, errors = result["writes"], result["reads"], result["errors"]
+            print(
+                f"{mode:<7} escritas={writes['count']:>6} ({writes['ops_per_sec']:>8,.0f}/s, p99 {writes['p99_ms']:.2f} ms)  "
+                f"leituras={reads['count']:>6} ({reads['ops_per_sec']:>8,.0f}/s, p99 {reads['p99_ms']:.2f} ms)  "
+                f"locked={errors['locked']} outros={errors['other']}"
+            )
+            if result["writer"]:
+                stats = result["writer"]
+                print(f"        group commit: {stats['jobs']} jobs em {stats['batches']} COMMITs (média {stats['avg_batch']}/lote)")
+            if result["rows_found"] != result["rows_expected"]:
+                print(f"        linhas divergentes: esperado={result['rows_expected']} encontrado={result['rows_found']}")
+                ok = False
+            if mode == "queue" and (errors["locked"] or errors["other"]):
+                ok = False
+        ok = _begin_refused() and ok
+    finally:
+        config.SQLITE_WRITE_MODE = original_mode
+
+    print("OK" if ok else "FALHOU")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
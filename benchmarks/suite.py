@@ -0,0 +1,437 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\benchmarks\suite.py
+# Último recode: 2026-10-17 20:40 (America/Bahia)
+# Motivo: Suíte reprodutível de desempenho: microbenchmarks do database.py sobre uma base
+#         multiempresa semeada + carga no POST /bot (Flask test client e waitress real em
+#         subprocesso). Grava JSON com p50/p95/p99 e vazão e compara dois resultados.
+#
+# Uso:
+#   python benchmarks/suite.py run --out benchmarks/results/$(git rev-parse --short HEAD).json
+#   python benchmarks/suite.py run --only db --quick
+#   python benchmarks/suite.py compare antes.json depois.json [--threshold 15]
+#
+# O compare sai com código 1 se algum p95 piorar mais que o limite (% e 0,05 ms absolutos).
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from _common import ROOT_DIR, Timer, summarize, temp_database
+
+import config
+import database
+
+# Semente fixa: mesma base e mesma sequência de consultas em todas as execuções.
+SEED = 16
+# Diferença absoluta mínima para contar como regressão (ruído de timer em ops sub-ms).
+MIN_REGRESSION_MS = 0.05
+
+
+# ============================================================
+# BASE SEMEADA (MULTIEMPRESA)
+# ============================================================
+
+
+def seed_dataset(companies: int, customers: int, products: int, sales: int) -> Dict[str, int]:
+    """
+    Popula o banco atual com `companies` empresas, cada uma com clientes, produtos e
+    vendas (com pagamentos), espalhadas em ~1 ano. Devolve as contagens totais.
+    """
+    rnd = random.Random(SEED)
+    base = datetime(2025, 1, 1)
+    now = database.utc_iso()
+    database.execute_many(
+        "INSERT OR IGNORE INTO companies (id, name, created_at) VALUES (?, ?, ?);",
+        [(c, f"Empresa {c}", now) for c in range(1, companies + 1)],
+    )
+    for company_id in range(1, companies + 1):
+        database.execute_many(
+            "INSERT INTO customers (company_id, name, phone, created_at) VALUES (?, ?, ?, ?);",
+            [(company_id, f"Cliente {company_id}-{i}", f"+557199{company_id:03d}{i:04d}", now) for i in range(customers)],
+        )
+        database.execute_many(
+            "INSERT INTO products (company_id, code, name, price_sale, created_at) VALUES (?, ?, ?, ?, ?);",
+            [(company_id, f"P{i:05d}", f"Produto {i}", float(rnd.randint(1, 500)), now) for i in range(products)],
+        )
+        first_customer = database.fetch_one(
+            "SELECT MIN(id) AS id FROM customers WHERE company_id = ?;", (company_id,)
+        )["id"]
+        rows = []
+        for i in range(sales):
+            ts = (base + timedelta(minutes=rnd.randint(0, 365 * 24 * 60))).strftime("%Y-%m-%dT%H:%M:%SZ")
+            status = "paid" if i % 10 else "open"
+            rows.append((company_id, f"VEN-{company_id}-{i}", first_customer + rnd.randrange(customers), status,
+                         float(rnd.randint(10, 2000)), ts))
+        database.execute_many(
+            "INSERT INTO sales (company_id, code, customer_id, status, total, created_at) VALUES (?, ?, ?, ?, ?, ?);",
+            rows,
+        )
+        database.execute(
+            "INSERT INTO payments (company_id, direction, origin_type, origin_id, method, amount, paid_at) "
+            "SELECT company_id, 'in', 'sale_direct', id, 'pix', total, created_at FROM sales "
+            "WHERE company_id = ? AND status = 'paid';",
+            (company_id,),
+        )
+    return {
+        "companies": companies,
+        "customers": companies * customers,
+        "products": companies * products,
+        "sales": companies * sales,
+    }
+
+
+# ============================================================
+# MICROBENCHMARKS DO BANCO
+# ============================================================
+
+
+def _measure(fn: Callable[[], Any], iterations: int, warmup: int = 20) -> Dict[str, Any]:
+    for _ in range(warmup):
+        fn()
+    samples: List[float] = []
+    with Timer() as wall:
+        for _ in range(iterations):
+            with Timer() as t:
+                fn()
+            samples.append(t.elapsed * 1000)
+    return summarize(samples, wall.elapsed)
+
+
+def run_db(dataset: Dict[str, int], iterations: int) -> Dict[str, Any]:
+    rnd = random.Random(SEED)
+    companies = dataset["companies"]
+    max_customer = dataset["customers"]
+    max_product = dataset["products"]
+
+    def fetch_one() -> None:
+        database.fetch_one(
+            "SELECT id, name, phone FROM customers WHERE id = ?;", (rnd.randint(1, max_customer),)
+        )
+
+    def fetch_all_page() -> None:
+        database.fetch_all(
+            "SELECT id, code, name, price_sale FROM products WHERE company_id = ? AND active = 1 "
+            "ORDER BY name LIMIT 50;",
+            (rnd.randint(1, companies),),
+        )
+
+    def fetch_all_month() -> None:
+        month = rnd.randint(1, 12)
+        database.fetch_all(
+            "SELECT id, code, status, total, created_at FROM sales WHERE company_id = ? "
+            "AND created_at >= ? AND created_at < ?;",
+            (rnd.randint(1, companies), f"2025-{month:02d}-01", f"2025-{month:02d}-32"),
+        )
+
+    def execute_insert() -> None:
+        company_id = rnd.randint(1, companies)
+        database.execute(
+            "INSERT INTO customers (company_id, name, created_at) VALUES (?, ?, ?);",
+            (company_id, f"Novo {rnd.random()}", database.utc_iso()),
+        )
+
+    def execute_update() -> None:
+        database.execute(
+            "UPDATE products SET price_sale = ? WHERE id = ?;",
+            (float(rnd.randint(1, 500)), rnd.randint(1, max_product)),
+        )
+
+    def init_db_warm() -> None:
+        database.init_db()
+
+    def init_db_cold() -> None:
+        # Simula o primeiro init_db de um processo novo (lê PRAGMA user_version).
+        database._schema_ready.clear()
+        database.init_db()
+
+    cases = {
+        "fetch_one_by_pk": fetch_one,
+        "fetch_all_page_50": fetch_all_page,
+        "fetch_all_month_sales": fetch_all_month,
+        "execute_insert": execute_insert,
+        "execute_update": execute_update,
+        "init_db_warm": init_db_warm,
+        "init_db_cold": init_db_cold,
+    }
+    results: Dict[str, Any] = {}
+    for name, fn in cases.items():
+        results[f"db.{name}"] = _measure(fn, iterations)
+        print(f"  db.{name:<24} p50={results[f'db.{name}']['p50_ms']:.3f} ms", flush=True)
+    return results
+
+
+# ============================================================
+# GERADOR DE CARGA DO WEBHOOK
+# ============================================================
+
+
+class TwilioPayloads:
+    """
+    Formulários como os do Twilio (From/Body/MessageSid), com remetentes repetidos
+    (conversas) e SIDs sempre novos (sem cair na idempotência).
+    """
+
+    BODIES = ("oi", "menu", "1", "orçamento", "cimento 50kg", "quero pagar", "status do pedido 123", "obrigado")
+
+    def __init__(self, senders: int) -> None:
+        self.senders = senders
+        self._rnd = random.Random(SEED)
+        self._lock = threading.Lock()
+
+    def next(self) -> Dict[str, str]:
+        with self._lock:
+            sender = self._rnd.randrange(self.senders)
+            body = self._rnd.choice(self.BODIES)
+        return {
+            "From": f"whatsapp:+5571988{sender:06d}",
+            "To": "whatsapp:+14155238886",
+            "Body": body,
+            "MessageSid": f"SM{uuid.uuid4().hex}",
+            "AccountSid": "AC" + "0" * 32,
+            "NumMedia": "0",
+        }
+
+
+def run_test_client(requests: int, senders: int) -> Dict[str, Any]:
+    """
+    Carga sequencial via Flask test client: mede o custo da app sem rede nem servidor.
+    """
+    from app import app
+
+    client = app.test_client()
+    payloads = TwilioPayloads(senders)
+    for _ in range(20):
+        client.post(config.WEBHOOK_PATH, data=payloads.next())
+    samples: List[float] = []
+    errors = 0
+    with Timer() as wall:
+        for _ in range(requests):
+            with Timer() as t:
+                resp = client.post(config.WEBHOOK_PATH, data=payloads.next())
+            samples.append(t.elapsed * 1000)
+            errors += resp.status_code != 200
+    result = summarize(samples, wall.elapsed)
+    result["errors"] = errors
+    return result
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_waitress(db_path: Path, threads: int) -> tuple:
+    port = _free_port()
+    env = dict(os.environ, SQLITE_DB_PATH=str(db_path), OUTBOUND_SENDER="stub", WEBHOOK_ASYNC="false")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "waitress", f"--listen=127.0.0.1:{port}", f"--threads={threads}", "app:app"],
+        cwd=str(ROOT_DIR),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"waitress encerrou: {proc.stderr.read().decode(errors='replace')[-2000:]}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return proc, port
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("waitress não respondeu em 30 s")
+
+
+def run_waitress(db_path: Path, requests: int, concurrency: int, senders: int, threads: int) -> Dict[str, Any]:
+    """
+    Carga concorrente contra um processo waitress real (conexões keep-alive por cliente).
+    """
+    proc, port = _start_waitress(db_path, threads)
+    payloads = TwilioPayloads(senders)
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    per_worker = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+
+    def worker(count: int) -> tuple:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        samples, errors = [], 0
+        for _ in range(count):
+            body = urllib.parse.urlencode(payloads.next())
+            with Timer() as t:
+                try:
+                    conn.request("POST", config.WEBHOOK_PATH, body=body, headers=headers)
+                    resp = conn.getresponse()
+                    resp.read()
+                    errors += resp.status != 200
+                except (OSError, http.client.HTTPException):
+                    errors += 1
+                    conn.close()
+                    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            samples.append(t.elapsed * 1000)
+        conn.close()
+        return samples, errors
+
+    try:
+        worker(20)
+        with Timer() as wall:
+            with ThreadPoolExecutor(max_workers=concurrency) as ex:
+                parts = list(ex.map(worker, per_worker))
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    samples = [s for part, _ in parts for s in part]
+    result = summarize(samples, wall.elapsed)
+    result["errors"] = sum(e for _, e in parts)
+    result["concurrency"] = concurrency
+    return result
+
+
+# ============================================================
+# EXECUÇÃO / COMPARAÇÃO
+# ============================================================
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=str(ROOT_DIR), capture_output=True, text=True, timeout=10
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def cmd_run(args: argparse.Namespace) -> int:
+    sizes = (
+        {"companies": 5, "customers": 200, "products": 200, "sales": 1000}
+        if args.quick
+        else {"companies": 20, "customers": 1000, "products": 1000, "sales": 5000}
+    )
+    iterations = 300 if args.quick else args.iterations
+    http_requests = 300 if args.quick else args.requests
+    only = set(args.only.split(",")) if args.only else {"db", "client", "waitress"}
+
+    # Nada de envio real durante a carga.
+    config.OUTBOUND_SENDER = "stub"
+    config.WEBHOOK_ASYNC = False
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "revision": _git_revision(),
+            "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "pool_size": config.SQLITE_POOL_SIZE,
+            "quick": args.quick,
+        },
+        "results": {},
+    }
+    with temp_database() as db_path:
+        with Timer() as t:
+            report["meta"]["dataset"] = seed_dataset(**sizes)
+        print(f"base semeada em {t.elapsed:.1f} s: {report['meta']['dataset']}", flush=True)
+        if "db" in only:
+            report["results"].update(run_db(report["meta"]["dataset"], iterations))
+        if "client" in only:
+            report["results"]["webhook.test_client"] = run_test_client(http_requests, args.senders)
+            print(f"  webhook.test_client        p50={report['results']['webhook.test_client']['p50_ms']:.3f} ms", flush=True)
+        if "waitress" in only:
+            # Libera o arquivo para o processo do waitress (WAL aceita os dois, mas sem disputa fica mais estável).
+            database.close_pool()
+            report["results"]["webhook.waitress"] = run_waitress(
+                db_path, http_requests, args.concurrency, args.senders, args.waitress_threads
+            )
+            print(f"  webhook.waitress           p50={report['results']['webhook.waitress']['p50_ms']:.3f} ms", flush=True)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False, sort_keys=True)
+    if args.out:
+        out = Path(args.out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(text + "\n", encoding="utf-8")
+        print(f"resultado gravado em {out}")
+    else:
+        print(text)
+    failed = [name for name, r in report["results"].items() if r.get("errors")]
+    if failed:
+        print(f"requisições com erro em: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def cmd_compare(args: argparse.Namespace) -> int:
+    before = json.loads(Path(args.before).read_text(encoding="utf-8"))
+    after = json.loads(Path(args.after).read_text(encoding="utf-8"))
+    print(f"{'caso':<30} {'p95 antes':>11} {'p95 depois':>11} {'Δ%':>8} {'ops/s antes':>12} {'ops/s depois':>13}")
+    regressions = []
+    for name in sorted(set(before["results"]) | set(after["results"])):
+        a = before["results"].get(name)
+        b = after["results"].get(name)
+        if a is None or b is None:
+            print(f"{name:<30} {'(só em um dos arquivos)':>30}")
+            continue
+        delta = (b["p95_ms"] - a["p95_ms"]) / a["p95_ms"] * 100 if a["p95_ms"] else 0.0
+        flag = ""
+        if delta > args.threshold and b["p95_ms"] - a["p95_ms"] > MIN_REGRESSION_MS:
+            regressions.append(name)
+            flag = "  <-- regressão"
+        print(
+            f"{name:<30} {a['p95_ms']:>8.3f} ms {b['p95_ms']:>8.3f} ms {delta:>+7.1f}% "
+            f"{a['ops_per_sec']:>12.1f} {b['ops_per_sec']:>13.1f}{flag}"
+        )
+    if regressions:
+        print(f"\n{len(regressions)} caso(s) com p95 pior que {args.threshold:.0f}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Suíte de benchmarks do GESTFLOW")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="executa os benchmarks e grava JSON")
+    run.add_argument("--out", help="arquivo JSON de saída (padrão: stdout)")
+    run.add_argument("--only", help="subconjunto: db,client,waitress")
+    run.add_argument("--quick", action="store_true", help="base e amostras menores (smoke test)")
+    run.add_argument("--iterations", type=int, default=2000)
+    run.add_argument("--requests", type=int, default=2000)
+    run.add_argument("--concurrency", type=int, default=16)
+    run.add_argument("--senders", type=int, default=200)
+    run.add_argument("--waitress-threads", type=int, default=4)
+
+    compare = sub.add_parser("compare", help="compara dois JSON (antes/depois)")
+    compare.add_argument("before")
+    compare.add_argument("after")
+    compare.add_argument("--threshold", type=float, default=15.0, help="piora máxima aceita no p95 (%%)")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        return cmd_run(args)
+    return cmd_compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
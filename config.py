@@ -1,8 +1,6 @@
 # Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\config.py
-# Último recode: 2026-02-09 19:56 (America/Bahia)
-# Motivo: Criação do arquivo central de configuração do GESTFLOW (DEV),
-#         com carregamento de variáveis de ambiente (.env), Twilio Sandbox,
-#         SQLite, PDF e parâmetros gerais do sistema.
+# Último recode: 2026-10-18 06:30 (America/Bahia)
+# Motivo: /metrics só responde com METRICS_TOKEN definido (como /exports com EXPORT_TOKEN).
 
 import os
 from pathlib import Path
@@ -37,41 +35,167 @@ TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 TWILIO_WHATSAPP_FROM = os.getenv("TWILIO_WHATSAPP_FROM")  # ex: whatsapp:+14155238886
 WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/bot")
 
-if not TWILIO_ACCOUNT_SID or not TWILIO_AUTH_TOKEN or not TWILIO_WHATSAPP_FROM:
-    raise RuntimeError("Variáveis do Twilio não configuradas corretamente no .env")
+# Empresa atendida pelo número do bot (MVP: um número Twilio por empresa).
+WHATSAPP_COMPANY_ID = int(os.getenv("WHATSAPP_COMPANY_ID", "1"))
+
+# Modo assíncrono do webhook: responde <Response/> na hora e envia a resposta depois.
+WEBHOOK_ASYNC = os.getenv("WEBHOOK_ASYNC", "false").lower() == "true"
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "100"))
+
+# Despacho por remetente (modules/dispatcher.py): ordem por número, paralelismo entre números.
+DISPATCH_WORKERS = int(os.getenv("DISPATCH_WORKERS", "8"))
+DISPATCH_MAX_PENDING = int(os.getenv("DISPATCH_MAX_PENDING", "200"))
+DISPATCH_MAX_PENDING_PER_SENDER = int(os.getenv("DISPATCH_MAX_PENDING_PER_SENDER", "20"))
+SENDER_RATE_PER_MINUTE = float(os.getenv("SENDER_RATE_PER_MINUTE", "30"))
+SENDER_BURST = int(os.getenv("SENDER_BURST", "10"))
+
+# Deduplicação de retries do Twilio por MessageSid (modules/idempotency.py).
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MEMORY_MAX = int(os.getenv("IDEMPOTENCY_MEMORY_MAX", "10000"))
+
+# Envio ativo de mensagens: "twilio" (produção) ou "stub" (local/testes).
+OUTBOUND_SENDER = os.getenv("OUTBOUND_SENDER", "twilio").lower()
+
+# Envio em lote (modules/outbound.py DeliveryPool): workers, limite global de mensagens/s,
+# tentativas por mensagem e base do backoff exponencial entre elas.
+OUTBOUND_WORKERS = int(os.getenv("OUTBOUND_WORKERS", "8"))
+OUTBOUND_RATE_PER_SECOND = float(os.getenv("OUTBOUND_RATE_PER_SECOND", "10"))
+OUTBOUND_BURST = int(os.getenv("OUTBOUND_BURST", "10"))
+OUTBOUND_MAX_ATTEMPTS = int(os.getenv("OUTBOUND_MAX_ATTEMPTS", "4"))
+OUTBOUND_BACKOFF_SECONDS = float(os.getenv("OUTBOUND_BACKOFF_SECONDS", "1.0"))
+
+# Lembretes de vencimento (modules/reminders.py): antecedência e tamanho do lote lido do banco.
+REMINDER_DAYS_AHEAD = int(os.getenv("REMINDER_DAYS_AHEAD", "3"))
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "500"))
+# Hora local da rodada diária quando o agendador roda em loop (--loop).
+REMINDER_HOUR = int(os.getenv("REMINDER_HOUR", "8"))
+
+
+def require_twilio() -> None:
+    """
+    Valida as credenciais do Twilio. Chamado no primeiro uso do envio (não no import),
+    para que o boot do app não dependa disso.
+    """
+    if not TWILIO_ACCOUNT_SID or not TWILIO_AUTH_TOKEN or not TWILIO_WHATSAPP_FROM:
+        raise RuntimeError("Variáveis do Twilio não configuradas corretamente no .env")
+
 
 # ============================================================
 # BANCO DE DADOS (SQLITE)
+# Diretórios (data/, backups/, tmp/) são criados sob demanda por quem os usa,
+# não no import, para manter o boot leve.
 # ============================================================
 
 DATA_DIR = BASE_DIR / "data"
-DATA_DIR.mkdir(exist_ok=True)
 
-SQLITE_DB_PATH = DATA_DIR / "gestflow.db"
+SQLITE_DB_PATH = Path(os.getenv("SQLITE_DB_PATH") or DATA_DIR / "gestflow.db")
+
+# Pool de conexões: 0 desliga (abre/fecha uma conexão por chamada).
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+SQLITE_STATEMENT_CACHE = int(os.getenv("SQLITE_STATEMENT_CACHE", "256"))
+SQLITE_POOL_HEALTHCHECK_SECONDS = float(os.getenv("SQLITE_POOL_HEALTHCHECK_SECONDS", "30"))
+
+# Escritas: "direct" (cada thread grava na própria conexão, disputando o lock) ou "queue"
+# (uma thread escritora por banco agrupa as escritas em um COMMIT; leituras somente leitura).
+SQLITE_WRITE_MODE = os.getenv("SQLITE_WRITE_MODE", "direct").lower()
+SQLITE_WRITER_BATCH_MAX = int(os.getenv("SQLITE_WRITER_BATCH_MAX", "64"))
+SQLITE_WRITER_BATCH_WAIT_MS = float(os.getenv("SQLITE_WRITER_BATCH_WAIT_MS", "0"))
+
+# Sharding por empresa: "off" (um banco só), "company" (um arquivo por empresa) ou
+# "fixed" (SQLITE_SHARD_COUNT arquivos, empresa % N). O banco principal continua com o
+# diretório (companies/users) e as tabelas globais. Dividir: python -m modules.sharding split
+SQLITE_SHARDING = os.getenv("SQLITE_SHARDING", "off").lower()
+SQLITE_SHARD_DIR = Path(os.getenv("SQLITE_SHARD_DIR") or DATA_DIR / "shards")
+SQLITE_SHARD_COUNT = int(os.getenv("SQLITE_SHARD_COUNT", "8"))
+
+# Cache de sessão/usuário do WhatsApp (modules/sessions.py).
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "300"))
+SESSION_CACHE_MAX_ENTRIES = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "10000"))
+SESSION_CACHE_MAX_BYTES = int(os.getenv("SESSION_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+SESSION_FLUSH_INTERVAL_SECONDS = float(os.getenv("SESSION_FLUSH_INTERVAL_SECONDS", "2"))
+
+# ============================================================
+# OBSERVABILIDADE
+# ============================================================
+
+# Métricas Prometheus em /metrics (tempo de requisições e de SQL por fingerprint).
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Sem METRICS_TOKEN a rota /metrics fica desligada (404); com ele, exige
+# "Authorization: Bearer <token>". A coleta em memória segue METRICS_ENABLED.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# Teto de fingerprints distintos de SQL (o excedente cai em um rótulo só).
+METRICS_MAX_FINGERPRINTS = int(os.getenv("METRICS_MAX_FINGERPRINTS", "500"))
+# Consultas a partir deste tempo vão para o log (0 desliga).
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
 
 # ============================================================
 # BACKUPS
 # ============================================================
 
 BACKUP_DIR = BASE_DIR / "backups"
-BACKUP_DIR.mkdir(exist_ok=True)
 
 BACKUP_RETENTION_DAYS = int(os.getenv("BACKUP_RETENTION_DAYS", "30"))
 
+# Backup online (modules/backup.py): páginas copiadas por passo e pausa entre passos.
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))
+BACKUP_STEP_SLEEP_MS = float(os.getenv("BACKUP_STEP_SLEEP_MS", "5"))
+
+# ============================================================
+# ARQUIVAMENTO (DADOS FRIOS)
+# ============================================================
+
+# Um arquivo SQLite por ano (modules/archive.py). Vazio: pasta "archive" ao lado do banco.
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "")
+# Anos completos mantidos no banco quente além do atual (1: em 2026 arquiva até 2024).
+ARCHIVE_KEEP_YEARS = int(os.getenv("ARCHIVE_KEEP_YEARS", "1"))
+# Registros movidos por transação: cada lote segura o lock de escrita só por um instante.
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "2000"))
+
 # ============================================================
 # PDF / ORÇAMENTOS
 # ============================================================
 
 PDF_TEMP_DIR = BASE_DIR / "tmp"
-PDF_TEMP_DIR.mkdir(exist_ok=True)
 
 ORCAMENTO_VALIDADE_DIAS = int(os.getenv("ORCAMENTO_VALIDADE_DIAS", "7"))
 
+# Renderização em processos separados + cache por hash em PDF_TEMP_DIR (modules/pdf.py).
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", "2"))
+PDF_CACHE_MAX_AGE_DAYS = float(os.getenv("PDF_CACHE_MAX_AGE_DAYS", "7"))
+PDF_CACHE_MAX_MB = int(os.getenv("PDF_CACHE_MAX_MB", "200"))
+
 PDF_RODAPE_PADRAO = os.getenv(
     "PDF_RODAPE_PADRAO",
     "Orçamento gerado via GESTFLOW"
 )
 
+# ============================================================
+# RELATÓRIOS
+# ============================================================
+
+# Deslocamento (horas) do UTC gravado para o "dia" dos rollups diários.
+# America/Bahia é UTC-3 o ano todo (sem horário de verão).
+ROLLUP_DAY_OFFSET_HOURS = int(os.getenv("ROLLUP_DAY_OFFSET_HOURS", "-3"))
+
+# Exportações CSV/NDJSON (modules/exports.py). Sem EXPORT_TOKEN as rotas /exports ficam
+# desligadas; com ele, exigem "Authorization: Bearer <token>".
+EXPORT_TOKEN = os.getenv("EXPORT_TOKEN", "")
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
+
+# ============================================================
+# CATÁLOGO
+# ============================================================
+
+# Validade do cache de autocomplete por empresa (modules/catalog_search.py).
+CATALOG_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "60"))
+
+# Importação de CSV (modules/importer.py): linhas por executemany/COMMIT/checkpoint e
+# quantos erros de linha ficam no resumo (o arquivo --errors-out recebe todos).
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "2000"))
+IMPORT_MAX_REPORTED_ERRORS = int(os.getenv("IMPORT_MAX_REPORTED_ERRORS", "100"))
+
 # ============================================================
 # NUMERAÇÃO
 # ============================================================
@@ -79,12 +203,18 @@ PDF_RODAPE_PADRAO = os.getenv(
 ORCAMENTO_PREFIX = "ORC"
 VENDA_PREFIX = "VEN"
 
+# Quantos números cada processo reserva por vez na tabela sequences (1 = sem buracos).
+SEQUENCE_BLOCK_SIZE = int(os.getenv("SEQUENCE_BLOCK_SIZE", "1"))
+
 # ============================================================
 # LIMITES / UX WHATSAPP
 # ============================================================
 
 MAX_MESSAGE_LENGTH = int(os.getenv("MAX_MESSAGE_LENGTH", "1500"))
 
+# Itens por orçamento/venda montados na conversa (contexto guardado em wa_sessions).
+DRAFT_MAX_ITEMS = int(os.getenv("DRAFT_MAX_ITEMS", "50"))
+
 # ============================================================
 # FLAGS DO SISTEMA (MVP)
 # ============================================================
@@ -1,21 +1,30 @@
 # Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\database.py
-# Último recode: 2026-02-09 20:43 (America/Bahia)
-# Motivo: Implementar núcleo SQLite do GESTFLOW (conexão + init_db com criação de tabelas/índices
-#         e seed mínimo DEV), mantendo SQL centralizado e simples.
+# Último recode: 2026-10-18 06:30 (America/Bahia)
+# Motivo: existing_pools() para o /metrics ler os pools abertos (principal e shards) sem
+#         criar nenhum.
 
 from __future__ import annotations
 
+import atexit
 import os
+import queue
 import sqlite3
+import threading
+import time
+from concurrent.futures import Future
 from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
 
 import config
 
+# Parâmetros aceitos pelo sqlite3: posicionais (?) ou nomeados (:nome).
+Params = Union[Sequence[Any], Dict[str, Any]]
 
-def _utc_iso() -> str:
+
+def utc_iso() -> str:
     return datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
 
 
@@ -23,18 +32,103 @@ def _dict_row_factory(cursor: sqlite3.Cursor, row: Tuple[Any, ...]) -> Dict[str,
     return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
 
 
+class Record:
+    """
+    Linha compacta: guarda a tupla crua do sqlite3 e um índice {coluna: posição}
+    compartilhado por todas as linhas do mesmo cursor.
+    Aceita row["col"], row[0] e row.col; dict(row) e row.get() funcionam como em dict.
+    """
+
+    __slots__ = ("_values", "_index")
+
+    def __init__(self, values: Tuple[Any, ...], index: Dict[str, int]) -> None:
+        self._values = values
+        self._index = index
+
+    def __getitem__(self, key: Any) -> Any:
+        if isinstance(key, str):
+            return self._values[self._index[key]]
+        return self._values[key]
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self._values[self._index[name]]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Record):
+            return self._values == other._values and list(self._index) == list(other._index)
+        if isinstance(other, dict):
+            return self.as_dict() == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Record({self.as_dict()!r})"
+
+    def keys(self) -> Iterable[str]:
+        return self._index.keys()
+
+    def values(self) -> Tuple[Any, ...]:
+        return self._values
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return zip(self._index, self._values)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        idx = self._index.get(key)
+        return default if idx is None else self._values[idx]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(zip(self._index, self._values))
+
+
+def _column_index(cursor: sqlite3.Cursor) -> Dict[str, int]:
+    return {col[0]: idx for idx, col in enumerate(cursor.description or ())}
+
+
 def _ensure_parent_dir(db_path: Path) -> None:
     db_path.parent.mkdir(parents=True, exist_ok=True)
 
 
-def get_connection() -> sqlite3.Connection:
+def get_connection(db_path: Optional[Path] = None, readonly: bool = False) -> sqlite3.Connection:
     """
-    Abre conexão SQLite no caminho padrão do projeto, com PRAGMAs razoáveis para DEV/MVP.
+    Abre conexão SQLite (por padrão no banco principal), com PRAGMAs razoáveis para DEV/MVP.
+    readonly=True abre com mode=ro + query_only (o banco precisa existir).
     """
-    db_path = Path(config.SQLITE_DB_PATH)
+    db_path = Path(db_path or config.SQLITE_DB_PATH)
+
+    if readonly:
+        conn = sqlite3.connect(
+            f"{db_path.resolve().as_uri()}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+            cached_statements=config.SQLITE_STATEMENT_CACHE,
+        )
+        conn.row_factory = _dict_row_factory
+        conn.execute("PRAGMA query_only = ON;")
+        return conn
+
     _ensure_parent_dir(db_path)
 
-    conn = sqlite3.connect(str(db_path))
+    # check_same_thread=False: a conexão pode ser reutilizada pelo pool em outra thread,
+    # mas nunca por duas threads ao mesmo tempo.
+    conn = sqlite3.connect(
+        str(db_path),
+        check_same_thread=False,
+        cached_statements=config.SQLITE_STATEMENT_CACHE,
+    )
     conn.row_factory = _dict_row_factory
 
     # PRAGMAs simples e seguros para MVP.
@@ -46,394 +140,1749 @@ def get_connection() -> sqlite3.Connection:
     return conn
 
 
+# ============================================================
+# POOL DE CONEXÕES
+# ============================================================
+
+
+class ConnectionPool:
+    """
+    Pool limitado de conexões SQLite já abertas (PRAGMAs aplicados uma única vez).
+    Cada conexão carrega o próprio cache de statements preparados do sqlite3.
+    """
+
+    def __init__(self, db_path: Path, max_size: int, healthcheck_seconds: float, readonly: bool = False) -> None:
+        self.db_path = db_path
+        self.readonly = readonly
+        self.max_size = max_size
+        self.healthcheck_seconds = healthcheck_seconds
+        # LIFO: a conexão mais "quente" (usada por último) volta primeiro.
+        self._idle: "queue.LifoQueue[Tuple[sqlite3.Connection, float]]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._all: List[sqlite3.Connection] = []
+        self._closed = False
+
+    def acquire(self) -> sqlite3.Connection:
+        if self._closed:
+            raise RuntimeError("Pool de conexões já foi fechado.")
+
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    conn, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._open()
+
+                if time.monotonic() - last_used < self.healthcheck_seconds or self._is_healthy(conn):
+                    return conn
+                self._discard(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        try:
+            if self._closed:
+                self._discard(conn)
+                return
+            if conn.in_transaction:
+                # Não devolve transação pendente para o próximo usuário.
+                try:
+                    conn.rollback()
+                except sqlite3.Error:
+                    self._discard(conn)
+                    return
+            self._idle.put((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            open_count = len(self._all)
+        return {"open": open_count, "idle": self._idle.qsize(), "max_size": self.max_size}
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            conns, self._all = self._all, []
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def _open(self) -> sqlite3.Connection:
+        conn = get_connection(self.db_path, readonly=self.readonly)
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            if conn in self._all:
+                self._all.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    @staticmethod
+    def _is_healthy(conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1;").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+
+# ============================================================
+# ROTEAMENTO POR EMPRESA (SHARDING OPCIONAL)
+# ============================================================
+
+# Empresa da unidade de trabalho atual (ver tenant()); None = banco principal.
+_current_company: ContextVar[Optional[int]] = ContextVar("gestflow_company_id", default=None)
+
+# Tabelas de diretório copiadas do banco principal para cada shard (as FKs exigem).
+SHARD_DIRECTORY_TABLES = ("companies", "users")
+
+
+def sharding_enabled() -> bool:
+    return config.SQLITE_SHARDING in ("company", "fixed")
+
+
+def shard_path(company_id: int) -> Path:
+    """
+    Arquivo do shard da empresa: um por empresa ("company") ou empresa % N ("fixed").
+    """
+    shard_dir = Path(config.SQLITE_SHARD_DIR)
+    if config.SQLITE_SHARDING == "fixed":
+        return shard_dir / f"shard_{int(company_id) % config.SQLITE_SHARD_COUNT:02d}.db"
+    return shard_dir / f"company_{int(company_id):06d}.db"
+
+
+def shard_paths() -> List[Path]:
+    """
+    Shards existentes em disco (vazio com sharding desligado).
+    """
+    if not sharding_enabled():
+        return []
+    shard_dir = Path(config.SQLITE_SHARD_DIR)
+    pattern = "shard_*.db" if config.SQLITE_SHARDING == "fixed" else "company_*.db"
+    return sorted(shard_dir.glob(pattern))
+
+
+@contextmanager
+def tenant(company_id: Optional[int]) -> Iterator[None]:
+    """
+    Direciona os acessos ao banco deste bloco (helpers, transaction, db_connection) para
+    o shard da empresa. Com sharding desligado não muda nada.
+    """
+    token = _current_company.set(company_id)
+    try:
+        yield
+    finally:
+        _current_company.reset(token)
+
+
+def _route(company_id: Optional[int] = None) -> Path:
+    if not sharding_enabled():
+        return Path(config.SQLITE_DB_PATH)
+    if company_id is None:
+        company_id = _current_company.get()
+    if company_id is None:
+        return Path(config.SQLITE_DB_PATH)
+    path = shard_path(company_id)
+    if _schema_key(path) not in _schema_ready:
+        prepare_shard(company_id)
+    return path
+
+
+_shard_lock = threading.Lock()
+
+
+def prepare_shard(company_id: int) -> Path:
+    """
+    Garante o schema do shard (migrações sem seed) e copia o diretório da empresa
+    (companies/users) do banco principal. Chamado sob demanda, uma vez por processo.
+    """
+    path = shard_path(company_id)
+    with _shard_lock:
+        init_db()
+        conn = get_connection(path)
+        try:
+            if get_schema_version(conn) < SCHEMA_VERSION:
+                migrate(conn, seed=False)
+            _sync_directory(conn, company_id)
+        finally:
+            conn.close()
+        _schema_ready.add(_schema_key(path))
+    return path
+
+
+def sync_shard_directory(company_id: int) -> None:
+    """
+    Recopia companies/users da empresa para o shard (após cadastrar usuário novo).
+    """
+    if not sharding_enabled():
+        return
+    conn = get_connection(shard_path(company_id))
+    try:
+        _sync_directory(conn, company_id)
+    finally:
+        conn.close()
+
+
+def _sync_directory(conn: sqlite3.Connection, company_id: int) -> None:
+    conn.execute("ATTACH DATABASE ? AS directory;", (str(Path(config.SQLITE_DB_PATH)),))
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO main.companies SELECT * FROM directory.companies WHERE id = ?;",
+                (company_id,),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO main.users SELECT * FROM directory.users WHERE company_id = ?;",
+                (company_id,),
+            )
+    finally:
+        conn.execute("DETACH DATABASE directory;")
+
+
+# ============================================================
+# POOLS (UM POR ARQUIVO DE BANCO)
+# ============================================================
+
+_pools: Dict[str, ConnectionPool] = {}
+_pool_lock = threading.Lock()
+
+
+def _pool_for(db_path: Path, readonly: bool = False) -> Optional[ConnectionPool]:
+    if config.SQLITE_POOL_SIZE <= 0:
+        return None
+    key = f"{db_path}?ro" if readonly else str(db_path)
+    pool = _pools.get(key)
+    if pool is not None:
+        return pool
+    with _pool_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(
+                db_path=db_path,
+                max_size=config.SQLITE_POOL_SIZE,
+                healthcheck_seconds=config.SQLITE_POOL_HEALTHCHECK_SECONDS,
+                readonly=readonly,
+            )
+            _pools[key] = pool
+        return pool
+
+
+def get_pool(company_id: Optional[int] = None) -> Optional[ConnectionPool]:
+    """
+    Pool do banco roteado (criado sob demanda). None quando SQLITE_POOL_SIZE=0.
+    """
+    return _pool_for(_route(company_id))
+
+
+def existing_pools() -> List[ConnectionPool]:
+    """
+    Pools já criados (um por arquivo de banco, leitura e escrita), sem criar nenhum.
+    """
+    with _pool_lock:
+        return list(_pools.values())
+
+
+def close_pool() -> None:
+    """
+    Fecha todas as conexões de todos os pools (e as threads escritoras, após gravar o
+    que estiver na fila). O próximo acesso cria tudo de novo (útil também quando
+    config.SQLITE_DB_PATH é trocado em runtime).
+    """
+    close_writers()
+    with _pool_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+        # Banco pode ter sido trocado/restaurado: init_db() volta a conferir a versão.
+        _schema_ready.clear()
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(close_pool)
+
+
+@contextmanager
+def _connection_for(db_path: Path, readonly: bool = False) -> Iterator[sqlite3.Connection]:
+    pool = _pool_for(db_path, readonly)
+    if pool is None:
+        conn = get_connection(db_path, readonly=readonly)
+        try:
+            yield conn
+        finally:
+            conn.close()
+        return
+
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+def db_path(company_id: Optional[int] = None) -> Path:
+    """
+    Arquivo do banco roteado (principal ou shard da empresa), o mesmo que db_connection() usaria.
+    """
+    return _route(company_id)
+
+
+@contextmanager
+def db_connection(company_id: Optional[int] = None) -> Iterator[sqlite3.Connection]:
+    """
+    Empresta uma conexão do pool do banco roteado (ou abre uma avulsa se o pool estiver
+    desligado). company_id explícito tem precedência sobre tenant().
+    """
+    with _connection_for(_route(company_id)) as conn:
+        yield conn
+
+
+def fan_out(sql: str, params: Params = ()) -> List[Dict[str, Any]]:
+    """
+    Consulta administrativa entre empresas: roda em cada shard e concatena as linhas
+    (sem sharding, roda uma vez no banco principal). Empresas que ainda não estão em
+    nenhum shard (nunca divididas nem acessadas) são lidas do banco principal, com as
+    tabelas filtradas só para elas. Agregações finais ficam com o chamador.
+    """
+    main_path = Path(config.SQLITE_DB_PATH)
+    if not sharding_enabled():
+        with _connection_for(main_path) as conn:
+            started = time.perf_counter()
+            rows = conn.execute(sql, params).fetchall()
+            _observe(sql, started)
+            return rows
+
+    init_db()
+    rows: List[Dict[str, Any]] = []
+    covered: Set[int] = set()
+    for path in shard_paths():
+        if _schema_key(path) not in _schema_ready:
+            conn = get_connection(path)
+            try:
+                if get_schema_version(conn) < SCHEMA_VERSION:
+                    migrate(conn, seed=False)
+            finally:
+                conn.close()
+            _schema_ready.add(_schema_key(path))
+        with _connection_for(path) as conn:
+            covered.update(row["id"] for row in conn.execute("SELECT id FROM companies;").fetchall())
+            started = time.perf_counter()
+            rows.extend(conn.execute(sql, params).fetchall())
+            _observe(sql, started)
+
+    with _connection_for(main_path) as conn:
+        pending = [row["id"] for row in conn.execute("SELECT id FROM companies ORDER BY id;").fetchall()]
+    pending = [cid for cid in pending if cid not in covered]
+    if pending:
+        rows.extend(_fan_out_main(sql, params, pending))
+    return rows
+
+
+def _fan_out_main(sql: str, params: Params, company_ids: List[int]) -> List[Dict[str, Any]]:
+    """
+    Roda `sql` no banco principal enxergando só as empresas informadas: cada tabela com
+    company_id (e companies) é encoberta por uma view TEMP de mesmo nome com o filtro.
+    Conexão avulsa, fora do pool (as views não podem vazar para outras consultas).
+    """
+    ids = ", ".join(str(int(cid)) for cid in company_ids)
+    conn = get_connection(Path(config.SQLITE_DB_PATH))
+    try:
+        tables = [
+            row["name"]
+            for row in conn.execute(
+                "SELECT name FROM main.sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%';"
+            ).fetchall()
+        ]
+        for table in tables:
+            columns = {row["name"] for row in conn.execute(f"PRAGMA main.table_info({table});").fetchall()}
+            key = "id" if table == "companies" else "company_id" if "company_id" in columns else None
+            if key is not None:
+                conn.execute(f"CREATE TEMP VIEW {table} AS SELECT * FROM main.{table} WHERE {key} IN ({ids});")
+        started = time.perf_counter()
+        rows = conn.execute(sql, params).fetchall()
+        _observe(sql, started)
+        return rows
+    finally:
+        conn.close()
+
+
 @contextmanager
 def db_cursor() -> Iterator[sqlite3.Cursor]:
     """
     Context manager para cursor com commit/rollback.
     """
-    conn = get_connection()
-    cur = conn.cursor()
+    with db_connection() as conn:
+        cur = conn.cursor()
+        try:
+            yield cur
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+
+@contextmanager
+def _read_cursor() -> Iterator[sqlite3.Cursor]:
+    """
+    Cursor para leituras dos helpers: conexão somente leitura no modo queue (não
+    disputa o lock de escrita); nos demais modos, o mesmo db_cursor() de sempre.
+    """
+    if config.SQLITE_WRITE_MODE != "queue":
+        with db_cursor() as cur:
+            yield cur
+        return
+    with _connection_for(_route(), readonly=True) as conn:
+        cur = conn.cursor()
+        try:
+            yield cur
+        finally:
+            cur.close()
+            if conn.in_transaction:
+                conn.rollback()
+
+
+@contextmanager
+def snapshot_reader(company_id: Optional[int] = None) -> Iterator[sqlite3.Connection]:
+    """
+    Conexão somente leitura dedicada (fora do pool: leituras longas não prendem conexões
+    das requisições), já dentro de uma transação de leitura. Em WAL, tudo o que for lido
+    nela vem do mesmo snapshot, enquanto as escritas continuam livres.
+    """
+    conn = get_connection(_route(company_id), readonly=True)
     try:
-        yield cur
-        conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
+        conn.execute("BEGIN;")
+        conn.execute("SELECT 1 FROM sqlite_master LIMIT 1;").fetchone()
+        yield conn
     finally:
-        cur.close()
+        if conn.in_transaction:
+            conn.rollback()
         conn.close()
 
 
+# Observador do tempo de SQL (modules/metrics.py registra o seu). None = nenhum custo extra
+# além de um perf_counter por comando.
+_sql_observer: Optional[Callable[[str, float], None]] = None
+
+
+def set_sql_observer(observer: Optional[Callable[[str, float], None]]) -> None:
+    """
+    Registra a função chamada como observer(sql, segundos) após cada comando dos helpers
+    e da Transaction. None desliga.
+    """
+    global _sql_observer
+    _sql_observer = observer
+
+
+def _observe(sql: str, started: float) -> None:
+    observer = _sql_observer
+    if observer is not None:
+        observer(sql, time.perf_counter() - started)
+
+
+class Transaction:
+    """
+    Unidade de trabalho: todos os comandos rodam no mesmo cursor/conexão
+    e são confirmados juntos (um único COMMIT / fsync) ao sair do bloco.
+    """
+
+    def __init__(self, cur: sqlite3.Cursor) -> None:
+        self.cur = cur
+
+    def execute(self, sql: str, params: Params = ()) -> int:
+        """
+        Executa um comando e retorna lastrowid (0 se não aplicável).
+        """
+        started = time.perf_counter()
+        self.cur.execute(sql, params)
+        _observe(sql, started)
+        return int(self.cur.lastrowid or 0)
+
+    def execute_many(self, sql: str, seq_params: Iterable[Tuple[Any, ...]]) -> int:
+        """
+        Executa o mesmo comando para vários conjuntos de parâmetros; retorna linhas afetadas.
+        """
+        started = time.perf_counter()
+        self.cur.executemany(sql, seq_params)
+        _observe(sql, started)
+        return int(self.cur.rowcount if self.cur.rowcount is not None and self.cur.rowcount >= 0 else 0)
+
+    def insert_returning(self, sql: str, params: Params = ()) -> Optional[Dict[str, Any]]:
+        """
+        Executa INSERT/UPDATE ... RETURNING e devolve a primeira linha retornada.
+        """
+        started = time.perf_counter()
+        rows = self.cur.execute(sql, params).fetchall()
+        _observe(sql, started)
+        return rows[0] if rows else None
+
+    def fetch_one(self, sql: str, params: Params = ()) -> Optional[Dict[str, Any]]:
+        started = time.perf_counter()
+        row = self.cur.execute(sql, params).fetchone()
+        _observe(sql, started)
+        return row
+
+    def fetch_all(self, sql: str, params: Params = ()) -> List[Dict[str, Any]]:
+        started = time.perf_counter()
+        rows = self.cur.execute(sql, params).fetchall()
+        _observe(sql, started)
+        return rows
+
+    def fetch_batches(self, sql: str, params: Params = (), size: int = 500) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Lotes de até `size` linhas lidos num cursor próprio da mesma conexão: o chamador pode
+        gravar pela transação enquanto consome os lotes (sem emprestar uma segunda conexão).
+        """
+        cur = self.cur.connection.cursor()
+        try:
+            started = time.perf_counter()
+            cur.execute(sql, params)
+            _observe(sql, started)
+            while True:
+                chunk = cur.fetchmany(size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            cur.close()
+
+
+@contextmanager
+def transaction(immediate: bool = True) -> Iterator[Transaction]:
+    """
+    Agrupa vários comandos em um único BEGIN [IMMEDIATE] ... COMMIT.
+    IMMEDIATE reserva o lock de escrita logo no início, evitando que a transação
+    falhe no meio por "database is locked" ao promover leitura para escrita.
+    No modo queue o bloco roda na conexão da thread escritora (com exclusividade).
+    """
+    lent = getattr(_writer_local, "tx", None)
+    if lent is not None:
+        # Já dentro de uma escrita da fila (job ou transaction aninhada): reaproveita.
+        yield lent
+        return
+    writer = get_writer()
+    if writer is not None:
+        with writer.exclusive() as tx:
+            yield tx
+        return
+
+    with db_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE;" if immediate else "BEGIN;")
+            yield Transaction(cur)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+
+# ============================================================
+# THREAD ESCRITORA ÚNICA (SQLITE_WRITE_MODE=queue)
+# ============================================================
+
+# Transaction emprestada à thread atual (thread escritora durante um job, ou quem está
+# dentro de writer.exclusive()); escritas aninhadas usam essa em vez de ir para a fila.
+_writer_local = threading.local()
+
+_STOP = object()
+
+
+class SingleWriter:
+    """
+    Uma conexão de escrita e uma thread por arquivo de banco. Os jobs da fila são
+    agrupados (até batch_max, esperando até batch_wait pelos próximos) em um único
+    BEGIN IMMEDIATE ... COMMIT; cada job roda em um SAVEPOINT, então a falha de um
+    não desfaz os outros. O Future de cada job só é resolvido após o COMMIT.
+    """
+
+    def __init__(self, db_path: Path, batch_max: int, batch_wait: float) -> None:
+        self.db_path = db_path
+        self.batch_max = max(1, batch_max)
+        self.batch_wait = batch_wait
+        self.jobs = 0
+        self.batches = 0
+        self._queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"sqlite-writer-{db_path.name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable[[Transaction], Any]) -> "Future[Any]":
+        if self._closed:
+            raise RuntimeError("Thread escritora já foi encerrada.")
+        future: "Future[Any]" = Future()
+        self._queue.put((fn, future))
+        return future
+
+    @contextmanager
+    def exclusive(self) -> Iterator[Transaction]:
+        """
+        Empresta a conexão de escrita à thread chamadora durante o bloco (API de
+        transaction()). Commit junto com o lote em que o job entrou.
+        """
+        granted = threading.Event()
+        release = threading.Event()
+        box: Dict[str, Any] = {}
+
+        def job(tx: Transaction) -> None:
+            box["tx"] = tx
+            granted.set()
+            release.wait()
+            if "error" in box:
+                raise box["error"]
+
+        future = self.submit(job)
+        while not granted.wait(0.05):
+            if future.done():
+                future.result()
+        tx = box["tx"]
+        _writer_local.tx = tx
+        try:
+            yield tx
+        except BaseException as exc:
+            box["error"] = exc
+            raise
+        finally:
+            _writer_local.tx = None
+            release.set()
+        future.result()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "jobs": self.jobs,
+            "batches": self.batches,
+            "avg_batch": round(self.jobs / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+    def close(self, timeout: float = 10.0) -> None:
+        """
+        Grava o que já está na fila e encerra a thread.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout=timeout)
+
+    def _run(self) -> None:
+        conn = get_connection(self.db_path)
+        cur = conn.cursor()
+        tx = Transaction(cur)
+        stop = False
+        try:
+            while not stop:
+                first = self._queue.get()
+                if first is _STOP:
+                    break
+                batch = [first]
+                deadline = time.monotonic() + self.batch_wait
+                while len(batch) < self.batch_max:
+                    try:
+                        remaining = deadline - time.monotonic()
+                        item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+                self._commit_batch(conn, cur, tx, batch)
+        finally:
+            cur.close()
+            conn.close()
+
+    def _commit_batch(
+        self,
+        conn: sqlite3.Connection,
+        cur: sqlite3.Cursor,
+        tx: Transaction,
+        batch: List[Tuple[Callable[[Transaction], Any], "Future[Any]"]],
+    ) -> None:
+        outcomes: List[Tuple["Future[Any]", bool, Any]] = []
+        _writer_local.tx = tx
+        try:
+            cur.execute("BEGIN IMMEDIATE;")
+            for fn, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                cur.execute("SAVEPOINT writer_job;")
+                try:
+                    value = fn(tx)
+                except BaseException as exc:
+                    cur.execute("ROLLBACK TO writer_job;")
+                    cur.execute("RELEASE writer_job;")
+                    outcomes.append((future, False, exc))
+                else:
+                    cur.execute("RELEASE writer_job;")
+                    outcomes.append((future, True, value))
+            conn.commit()
+        except BaseException as exc:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+            # Lote inteiro desfeito: todos os jobs falham, inclusive os que "deram certo" e os
+            # que nem começaram (BEGIN recusado com o lock preso por outro processo).
+            for fn, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        finally:
+            _writer_local.tx = None
+
+        self.jobs += len(outcomes)
+        self.batches += 1
+        for future, ok, value in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+_writers: Dict[str, SingleWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(company_id: Optional[int] = None) -> Optional[SingleWriter]:
+    """
+    Thread escritora do banco roteado (criada sob demanda). None fora do modo queue.
+    """
+    if config.SQLITE_WRITE_MODE != "queue":
+        return None
+    path = _route(company_id)
+    key = str(path)
+    writer = _writers.get(key)
+    if writer is not None:
+        return writer
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = SingleWriter(
+                path,
+                batch_max=config.SQLITE_WRITER_BATCH_MAX,
+                batch_wait=config.SQLITE_WRITER_BATCH_WAIT_MS / 1000.0,
+            )
+            _writers[key] = writer
+        return writer
+
+
+def existing_writers() -> List[SingleWriter]:
+    """
+    Threads escritoras já criadas (uma por arquivo de banco), sem criar nenhuma.
+    """
+    with _writers_lock:
+        return list(_writers.values())
+
+
+def close_writers() -> None:
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
+
+
+def submit_write(fn: Callable[[Transaction], Any]) -> "Future[Any]":
+    """
+    Agenda fn(tx) na thread escritora e devolve o Future do resultado (resolvido após o
+    COMMIT do lote). Fora do modo queue roda na hora, em transaction() própria.
+    """
+    lent = getattr(_writer_local, "tx", None)
+    writer = None if lent is not None else get_writer()
+    if writer is not None:
+        return writer.submit(fn)
+    future: "Future[Any]" = Future()
+    try:
+        if lent is not None:
+            future.set_result(fn(lent))
+        else:
+            with transaction() as tx:
+                future.set_result(fn(tx))
+    except Exception as exc:
+        future.set_exception(exc)
+    return future
+
+
+def run_write(fn: Callable[[Transaction], Any]) -> Any:
+    """
+    Versão síncrona de submit_write(): espera o COMMIT e devolve o resultado de fn(tx).
+    """
+    return submit_write(fn).result()
+
+
+# Recalcula stock_balances a partir do ledger (usado no backfill e em modules/stock.py).
+STOCK_BALANCES_REBUILD_SQL = """
+    INSERT INTO stock_balances (company_id, product_id, qty, last_movement_id, updated_at)
+    SELECT
+        company_id,
+        product_id,
+        SUM(CASE WHEN movement_type = 'in' THEN qty ELSE -qty END),
+        MAX(id),
+        MAX(created_at)
+    FROM stock_movements
+    WHERE (:company_id IS NULL OR company_id = :company_id)
+    GROUP BY company_id, product_id;
+"""
+
+
 def _exec_many(cur: sqlite3.Cursor, statements: Iterable[str]) -> None:
     for stmt in statements:
         cur.execute(stmt)
 
 
-def init_db() -> None:
+def _migration_001_base(cur: sqlite3.Cursor) -> None:
     """
-    Cria tabelas e índices se não existirem e faz seed mínimo para DEV.
+    Schema base do MVP. Usa IF NOT EXISTS para também servir bancos criados antes do versionamento.
     """
-    with db_cursor() as cur:
-        # ------------------------------------------------------------
-        # TABELAS BASE
-        # ------------------------------------------------------------
-        _exec_many(
-            cur,
-            [
-                """
-                CREATE TABLE IF NOT EXISTS companies (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    created_at TEXT NOT NULL
-                );
-                """,
-                """
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    company_id INTEGER NOT NULL,
-                    whatsapp TEXT NOT NULL,
-                    name TEXT NOT NULL,
-                    role TEXT NOT NULL,
-                    created_at TEXT NOT NULL,
-                    FOREIGN KEY (company_id) REFERENCES companies(id)
-                );
-                """,
-                """
-                CREATE TABLE IF NOT EXISTS customers (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    company_id INTEGER NOT NULL,
-                    name TEXT NOT NULL,
-                    phone TEXT,
-                    active INTEGER NOT NULL DEFAULT 1,
-                    created_at TEXT NOT NULL,
-                    FOREIGN KEY (company_id) REFERENCES companies(id)
-                );
-                """,
-                """
-                CREATE TABLE IF NOT EXISTS products (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    company_id INTEGER NOT NULL,
-                    code TEXT NOT NULL,
-                    name TEXT NOT NULL,
-                    price_sale REAL NOT NULL,
-                    active INTEGER NOT NULL DEFAULT 1,
-                    created_at TEXT NOT NULL,
-                    FOREIGN KEY (company_id) REFERENCES companies(id)
-                );
-                """,
-                """
-                CREATE TABLE IF NOT EXISTS services (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    company_id INTEGER NOT NULL,
-                    code TEXT NOT NULL,
-                    name TEXT NOT NULL,
-                    price_sale REAL NOT NULL,
-                    active INTEGER NOT NULL DEFAULT 1,
-                    created_at TEXT NOT NULL,
-                    FOREIGN KEY (company_id) REFERENCES companies(id)
-                );
-                """,
-            ],
-        )
+    # ------------------------------------------------------------
+    # TABELAS BASE
+    # ------------------------------------------------------------
+    _exec_many(
+        cur,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS companies (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_id INTEGER NOT NULL,
+                whatsapp TEXT NOT NULL,
+                name TEXT NOT NULL,
+                role TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                FOREIGN KEY (company_id) REFERENCES companies(id)
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS customers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                phone TEXT,
+                active INTEGER NOT NULL DEFAULT 1,
+                created_at TEXT NOT NULL,
+                FOREIGN KEY (company_id) REFERENCES companies(id)
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS products (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_id INTEGER NOT NULL,
+                code TEXT NOT NULL,
+                name TEXT NOT NULL,
+                price_sale REAL NOT NULL,
+                active INTEGER NOT NULL DEFAULT 1,
+                created_at TEXT NOT NULL,
+                FOREIGN KEY (company_id) REFERENCES companies(id)
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS services (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_id INTEGER NOT NULL,
+                code TEXT NOT NULL,
+                name TEXT NOT NULL,
+                price_sale REAL NOT NULL,
+                active INTEGER NOT NULL DEFAULT 1,
+                created_at TEXT NOT NULL,
+                FOREIGN KEY (company_id) REFERENCES companies(id)
+            );
+            """,
+        ],
+    )
 
-        # ------------------------------------------------------------
-        # ORÇAMENTOS
-        # ------------------------------------------------------------
-        _exec_many(
-            cur,
-            [
-                """
-                CREATE TABLE IF NOT EXISTS budgets (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    company_id INTEGER NOT NULL,
-                    code TEXT NOT NULL,
-                    customer_id INTEGER NOT NULL,
-                    status TEXT NOT NULL, -- draft | confirmed | cancelled | approved
-                    total REAL NOT NULL DEFAULT 0,
-                    created_by INTEGER,
-                    created_at TEXT NOT NULL,
-                    updated_at TEXT NOT NULL,
-                    FOREIGN KEY (company_id) REFERENCES companies(id),
-                    FOREIGN KEY (customer_id) REFERENCES customers(id),
-                    FOREIGN KEY (created_by) REFERENCES users(id)
-                );
-                """,
-                """
-                CREATE TABLE IF NOT EXISTS budget_items (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    company_id INTEGER NOT NULL,
-                    budget_id INTEGER NOT NULL,
-                    item_type TEXT NOT NULL, -- product | service
-                    item_id INTEGER NOT NULL,
-                    description_snapshot TEXT NOT NULL,
-                    unit_price REAL NOT NULL,
-                    qty REAL NOT NULL,
-                    subtotal REAL NOT NULL,
-                    FOREIGN KEY (company_id) REFERENCES companies(id),
-                    FOREIGN KEY (budget_id) REFERENCES budgets(id)
-                );
-                """,
-            ],
-        )
+    # ------------------------------------------------------------
+    # ORÇAMENTOS
+    # ------------------------------------------------------------
+    _exec_many(
+        cur,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS budgets (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_id INTEGER NOT NULL,
+                code TEXT NOT NULL,
+                customer_id INTEGER NOT NULL,
+                status TEXT NOT NULL, -- draft | confirmed | cancelled | approved
+                total REAL NOT NULL DEFAULT 0,
+                created_by INTEGER,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                FOREIGN KEY (company_id) REFERENCES companies(id),
+                FOREIGN KEY (customer_id) REFERENCES customers(id),
+                FOREIGN KEY (created_by) REFERENCES users(id)
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS budget_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_id INTEGER NOT NULL,
+                budget_id INTEGER NOT NULL,
+                item_type TEXT NOT NULL, -- product | service
+                item_id INTEGER NOT NULL,
+                description_snapshot TEXT NOT NULL,
+                unit_price REAL NOT NULL,
+                qty REAL NOT NULL,
+                subtotal REAL NOT NULL,
+                FOREIGN KEY (company_id) REFERENCES companies(id),
+                FOREIGN KEY (budget_id) REFERENCES budgets(id)
+            );
+            """,
+        ],
+    )
 
-        # ------------------------------------------------------------
-        # VENDAS
-        # ------------------------------------------------------------
-        _exec_many(
-            cur,
-            [
-                """
-                CREATE TABLE IF NOT EXISTS sales (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    company_id INTEGER NOT NULL,
-                    code TEXT NOT NULL,
-                    budget_id INTEGER,
-                    customer_id INTEGER NOT NULL,
-                    status TEXT NOT NULL, -- open | paid | cancelled
-                    total REAL NOT NULL DEFAULT 0,
-                    created_by INTEGER,
-                    created_at TEXT NOT NULL,
-                    FOREIGN KEY (company_id) REFERENCES companies(id),
-                    FOREIGN KEY (budget_id) REFERENCES budgets(id),
-                    FOREIGN KEY (customer_id) REFERENCES customers(id),
-                    FOREIGN KEY (created_by) REFERENCES users(id)
-                );
-                """,
-                """
-                CREATE TABLE IF NOT EXISTS sale_items (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    company_id INTEGER NOT NULL,
-                    sale_id INTEGER NOT NULL,
-                    item_type TEXT NOT NULL, -- product | service
-                    item_id INTEGER NOT NULL,
-                    description_snapshot TEXT NOT NULL,
-                    unit_price REAL NOT NULL,
-                    qty REAL NOT NULL,
-                    subtotal REAL NOT NULL,
-                    FOREIGN KEY (company_id) REFERENCES companies(id),
-                    FOREIGN KEY (sale_id) REFERENCES sales(id)
-                );
-                """,
-            ],
-        )
+    # ------------------------------------------------------------
+    # VENDAS
+    # ------------------------------------------------------------
+    _exec_many(
+        cur,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS sales (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_id INTEGER NOT NULL,
+                code TEXT NOT NULL,
+                budget_id INTEGER,
+                customer_id INTEGER NOT NULL,
+                status TEXT NOT NULL, -- open | paid | cancelled
+                total REAL NOT NULL DEFAULT 0,
+                created_by INTEGER,
+                created_at TEXT NOT NULL,
+                FOREIGN KEY (company_id) REFERENCES companies(id),
+                FOREIGN KEY (budget_id) REFERENCES budgets(id),
+                FOREIGN KEY (customer_id) REFERENCES customers(id),
+                FOREIGN KEY (created_by) REFERENCES users(id)
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS sale_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_id INTEGER NOT NULL,
+                sale_id INTEGER NOT NULL,
+                item_type TEXT NOT NULL, -- product | service
+                item_id INTEGER NOT NULL,
+                description_snapshot TEXT NOT NULL,
+                unit_price REAL NOT NULL,
+                qty REAL NOT NULL,
+                subtotal REAL NOT NULL,
+                FOREIGN KEY (company_id) REFERENCES companies(id),
+                FOREIGN KEY (sale_id) REFERENCES sales(id)
+            );
+            """,
+        ],
+    )
 
-        # ------------------------------------------------------------
-        # ESTOQUE (MOVIMENTAÇÕES)
-        # Regra MVP: qty sempre positivo, direction vem do movement_type.
-        # movement_type: in | out | sale
-        # ------------------------------------------------------------
-        _exec_many(
-            cur,
-            [
-                """
-                CREATE TABLE IF NOT EXISTS stock_movements (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    company_id INTEGER NOT NULL,
-                    product_id INTEGER NOT NULL,
-                    movement_type TEXT NOT NULL, -- in | out | sale
-                    qty REAL NOT NULL, -- sempre positivo
-                    reason TEXT,
-                    ref_type TEXT, -- sale | manual | other
-                    ref_id INTEGER,
-                    created_by INTEGER,
-                    created_at TEXT NOT NULL,
-                    FOREIGN KEY (company_id) REFERENCES companies(id),
-                    FOREIGN KEY (product_id) REFERENCES products(id),
-                    FOREIGN KEY (created_by) REFERENCES users(id)
-                );
-                """,
-            ],
+    # ------------------------------------------------------------
+    # ESTOQUE (MOVIMENTAÇÕES)
+    # Regra MVP: qty sempre positivo, direction vem do movement_type.
+    # movement_type: in | out | sale
+    # ------------------------------------------------------------
+    _exec_many(
+        cur,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS stock_movements (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_id INTEGER NOT NULL,
+                product_id INTEGER NOT NULL,
+                movement_type TEXT NOT NULL, -- in | out | sale
+                qty REAL NOT NULL, -- sempre positivo
+                reason TEXT,
+                ref_type TEXT, -- sale | manual | other
+                ref_id INTEGER,
+                created_by INTEGER,
+                created_at TEXT NOT NULL,
+                FOREIGN KEY (company_id) REFERENCES companies(id),
+                FOREIGN KEY (product_id) REFERENCES products(id),
+                FOREIGN KEY (created_by) REFERENCES users(id)
+            );
+            """,
+            # Saldo atual por produto (projeção do ledger acima).
+            # in soma, out/sale subtraem. Atualizado pelo trigger abaixo,
+            # dentro da mesma transação do INSERT em stock_movements.
+            """
+            CREATE TABLE IF NOT EXISTS stock_balances (
+                company_id INTEGER NOT NULL,
+                product_id INTEGER NOT NULL,
+                qty REAL NOT NULL DEFAULT 0,
+                last_movement_id INTEGER,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (company_id, product_id),
+                FOREIGN KEY (company_id) REFERENCES companies(id),
+                FOREIGN KEY (product_id) REFERENCES products(id)
+            ) WITHOUT ROWID;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_stock_movements_balance
+            AFTER INSERT ON stock_movements
+            BEGIN
+                INSERT INTO stock_balances (company_id, product_id, qty, last_movement_id, updated_at)
+                VALUES (
+                    NEW.company_id,
+                    NEW.product_id,
+                    CASE WHEN NEW.movement_type = 'in' THEN NEW.qty ELSE -NEW.qty END,
+                    NEW.id,
+                    NEW.created_at
+                )
+                ON CONFLICT(company_id, product_id) DO UPDATE SET
+                    qty = qty + excluded.qty,
+                    last_movement_id = excluded.last_movement_id,
+                    updated_at = excluded.updated_at;
+            END;
+            """,
+        ],
+    )
+
+    # Bancos criados antes do trigger: projeta o ledger existente uma única vez.
+    has_movements = cur.execute("SELECT 1 FROM stock_movements LIMIT 1;").fetchone()
+    has_balances = cur.execute("SELECT 1 FROM stock_balances LIMIT 1;").fetchone()
+    if has_movements and not has_balances:
+        cur.execute(STOCK_BALANCES_REBUILD_SQL, {"company_id": None})
+
+    # ------------------------------------------------------------
+    # FINANCEIRO
+    # Regra MVP: contas a receber só para fiado.
+    # ------------------------------------------------------------
+    _exec_many(
+        cur,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS accounts_receivable (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_id INTEGER NOT NULL,
+                sale_id INTEGER NOT NULL,
+                status TEXT NOT NULL, -- open | partial | paid | cancelled
+                due_date TEXT NOT NULL, -- YYYY-MM-DD
+                total REAL NOT NULL,
+                paid_total REAL NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                FOREIGN KEY (company_id) REFERENCES companies(id),
+                FOREIGN KEY (sale_id) REFERENCES sales(id)
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS accounts_payable (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_id INTEGER NOT NULL,
+                supplier_name TEXT NOT NULL,
+                description TEXT,
+                status TEXT NOT NULL, -- open | partial | paid | cancelled
+                due_date TEXT NOT NULL, -- YYYY-MM-DD
+                total REAL NOT NULL,
+                paid_total REAL NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                FOREIGN KEY (company_id) REFERENCES companies(id)
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS payments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_id INTEGER NOT NULL,
+                direction TEXT NOT NULL, -- in | out
+                origin_type TEXT NOT NULL, -- receivable | payable | sale_direct | manual
+                origin_id INTEGER,
+                method TEXT NOT NULL, -- pix | cash | card | transfer
+                amount REAL NOT NULL,
+                paid_at TEXT NOT NULL, -- ISO
+                created_by INTEGER,
+                note TEXT,
+                FOREIGN KEY (company_id) REFERENCES companies(id),
+                FOREIGN KEY (created_by) REFERENCES users(id)
+            );
+            """,
+        ],
+    )
+
+    # ------------------------------------------------------------
+    # SESSÃO WHATSAPP (ESTADO DA CONVERSA)
+    # ------------------------------------------------------------
+    _exec_many(
+        cur,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS wa_sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_id INTEGER NOT NULL,
+                whatsapp TEXT NOT NULL,
+                state TEXT NOT NULL,
+                context_json TEXT,
+                updated_at TEXT NOT NULL,
+                FOREIGN KEY (company_id) REFERENCES companies(id)
+            );
+            """,
+        ],
+    )
+
+    # ------------------------------------------------------------
+    # SEQUÊNCIAS (POR ANO)
+    # key: BUDGET | SALE
+    # year: AAAA
+    # next_number: próximo inteiro a emitir
+    # ------------------------------------------------------------
+    _exec_many(
+        cur,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS sequences (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_id INTEGER NOT NULL,
+                key TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                next_number INTEGER NOT NULL,
+                UNIQUE(company_id, key, year),
+                FOREIGN KEY (company_id) REFERENCES companies(id)
+            );
+            """,
+        ],
+    )
+
+    # ------------------------------------------------------------
+    # IDEMPOTÊNCIA DO WEBHOOK (MessageSid do Twilio)
+    # reply NULL = ainda processando (ou resposta enviada de forma assíncrona)
+    # ------------------------------------------------------------
+    _exec_many(
+        cur,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS webhook_messages (
+                message_sid TEXT PRIMARY KEY,
+                from_number TEXT,
+                reply TEXT,
+                created_at TEXT NOT NULL
+            ) WITHOUT ROWID;
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_webhook_messages_created_at ON webhook_messages(created_at);",
+        ],
+    )
+
+    # ------------------------------------------------------------
+    # BACKUPS
+    # ------------------------------------------------------------
+    _exec_many(
+        cur,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS backups (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_id INTEGER NOT NULL,
+                backup_date TEXT NOT NULL, -- YYYY-MM-DD
+                file_name TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                FOREIGN KEY (company_id) REFERENCES companies(id)
+            );
+            """,
+        ],
+    )
+
+    # ------------------------------------------------------------
+    # ÍNDICES / CONSTRAINTS ÚTEIS
+    # ------------------------------------------------------------
+    _exec_many(
+        cur,
+        [
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_users_company_whatsapp ON users(company_id, whatsapp);",
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_products_company_code ON products(company_id, code);",
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_services_company_code ON services(company_id, code);",
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_budgets_company_code ON budgets(company_id, code);",
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_sales_company_code ON sales(company_id, code);",
+            "CREATE INDEX IF NOT EXISTS idx_budget_items_budget_id ON budget_items(budget_id);",
+            "CREATE INDEX IF NOT EXISTS idx_sale_items_sale_id ON sale_items(sale_id);",
+            "CREATE INDEX IF NOT EXISTS idx_stock_movements_product_id ON stock_movements(product_id);",
+            "CREATE INDEX IF NOT EXISTS idx_payments_paid_at ON payments(paid_at);",
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_sessions_company_whatsapp ON wa_sessions(company_id, whatsapp);",
+            "CREATE INDEX IF NOT EXISTS idx_ar_sale_id ON accounts_receivable(sale_id);",
+        ],
+    )
+
+
+def _seed_dev(cur: sqlite3.Cursor) -> None:
+    # ------------------------------------------------------------
+    # SEED MÍNIMO (DEV)
+    # - cria 1 company se não existir
+    # - cria 1 user owner se variáveis existirem e ainda não existir
+    # ------------------------------------------------------------
+    now = utc_iso()
+
+    existing_company = cur.execute("SELECT id FROM companies ORDER BY id LIMIT 1;").fetchone()
+    if not existing_company:
+        company_name = os.getenv("GESTFLOW_COMPANY_NAME", "GESTFLOW")
+        cur.execute(
+            "INSERT INTO companies (name, created_at) VALUES (?, ?);",
+            (company_name, now),
         )
+        company_id = int(cur.lastrowid)
+    else:
+        company_id = int(existing_company["id"])
+
+    owner_whatsapp = (os.getenv("GESTFLOW_OWNER_WHATSAPP") or "").strip()
+    owner_name = (os.getenv("GESTFLOW_OWNER_NAME") or "Dono").strip()
+
+    if owner_whatsapp:
+        exists_owner = cur.execute(
+            "SELECT id FROM users WHERE company_id=? AND whatsapp=? LIMIT 1;",
+            (company_id, owner_whatsapp),
+        ).fetchone()
+
+        if not exists_owner:
+            cur.execute(
+                "INSERT INTO users (company_id, whatsapp, name, role, created_at) VALUES (?, ?, ?, ?, ?);",
+                (company_id, owner_whatsapp, owner_name, "owner", now),
+            )
+
+
+def _add_column(cur: sqlite3.Cursor, table: str, column: str, ddl: str) -> None:
+    """
+    ALTER TABLE ... ADD COLUMN idempotente (SQLite não tem ADD COLUMN IF NOT EXISTS).
+    """
+    existing = {row["name"] for row in cur.execute(f"PRAGMA table_info({table});").fetchall()}
+    if column not in existing:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl};")
+
+
+def _migration_002_backup_checksum(cur: sqlite3.Cursor) -> None:
+    # Arquivo compactado (.gz): tamanho e SHA-256 para restauração verificada.
+    _add_column(cur, "backups", "size_bytes", "INTEGER")
+    _add_column(cur, "backups", "sha256", "TEXT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_backups_created_at ON backups(created_at);")
+
+
+def rollup_day_modifier() -> str:
+    """
+    Modificador do date() do SQLite que converte o timestamp UTC gravado para o dia local.
+    """
+    return f"{int(config.ROLLUP_DAY_OFFSET_HOURS):+d} hours"
+
 
-        # ------------------------------------------------------------
-        # FINANCEIRO
-        # Regra MVP: contas a receber só para fiado.
-        # ------------------------------------------------------------
+def create_rollup_triggers(cur: sqlite3.Cursor) -> None:
+    """
+    (Re)cria os triggers de rollup com o fuso atual de config.ROLLUP_DAY_OFFSET_HOURS.
+    DELETE não desconta dos rollups de propósito: arquivamento move linhas sem mudar o histórico.
+    """
+    day = rollup_day_modifier()
+    _exec_many(
+        cur,
+        [
+            "DROP TRIGGER IF EXISTS trg_sales_rollup_insert;",
+            "DROP TRIGGER IF EXISTS trg_sales_rollup_update;",
+            "DROP TRIGGER IF EXISTS trg_payments_rollup_insert;",
+            "DROP TRIGGER IF EXISTS trg_payments_rollup_update;",
+            f"""
+            CREATE TRIGGER trg_sales_rollup_insert AFTER INSERT ON sales
+            BEGIN
+                INSERT INTO sales_daily (company_id, day, status, sales_count, total)
+                VALUES (NEW.company_id, date(NEW.created_at, '{day}'), NEW.status, 1, NEW.total)
+                ON CONFLICT(company_id, day, status) DO UPDATE SET
+                    sales_count = sales_count + 1,
+                    total = total + excluded.total;
+            END;
+            """,
+            f"""
+            CREATE TRIGGER trg_sales_rollup_update
+            AFTER UPDATE OF company_id, status, total, created_at ON sales
+            BEGIN
+                UPDATE sales_daily SET sales_count = sales_count - 1, total = total - OLD.total
+                WHERE company_id = OLD.company_id AND day = date(OLD.created_at, '{day}') AND status = OLD.status;
+                INSERT INTO sales_daily (company_id, day, status, sales_count, total)
+                VALUES (NEW.company_id, date(NEW.created_at, '{day}'), NEW.status, 1, NEW.total)
+                ON CONFLICT(company_id, day, status) DO UPDATE SET
+                    sales_count = sales_count + 1,
+                    total = total + excluded.total;
+            END;
+            """,
+            f"""
+            CREATE TRIGGER trg_payments_rollup_insert AFTER INSERT ON payments
+            BEGIN
+                INSERT INTO payments_daily (company_id, day, direction, method, payments_count, amount)
+                VALUES (NEW.company_id, date(NEW.paid_at, '{day}'), NEW.direction, NEW.method, 1, NEW.amount)
+                ON CONFLICT(company_id, day, direction, method) DO UPDATE SET
+                    payments_count = payments_count + 1,
+                    amount = amount + excluded.amount;
+            END;
+            """,
+            f"""
+            CREATE TRIGGER trg_payments_rollup_update
+            AFTER UPDATE OF company_id, direction, method, amount, paid_at ON payments
+            BEGIN
+                UPDATE payments_daily SET payments_count = payments_count - 1, amount = amount - OLD.amount
+                WHERE company_id = OLD.company_id AND day = date(OLD.paid_at, '{day}')
+                  AND direction = OLD.direction AND method = OLD.method;
+                INSERT INTO payments_daily (company_id, day, direction, method, payments_count, amount)
+                VALUES (NEW.company_id, date(NEW.paid_at, '{day}'), NEW.direction, NEW.method, 1, NEW.amount)
+                ON CONFLICT(company_id, day, direction, method) DO UPDATE SET
+                    payments_count = payments_count + 1,
+                    amount = amount + excluded.amount;
+            END;
+            """,
+        ],
+    )
+
+
+def rebuild_rollups(cur: sqlite3.Cursor, company_id: Optional[int] = None) -> None:
+    """
+    Recalcula sales_daily/payments_daily a partir das tabelas brutas (backfill ou troca de fuso).
+    """
+    day = rollup_day_modifier()
+    params = {"company_id": company_id}
+    cur.execute("DELETE FROM sales_daily WHERE (:company_id IS NULL OR company_id = :company_id);", params)
+    cur.execute("DELETE FROM payments_daily WHERE (:company_id IS NULL OR company_id = :company_id);", params)
+    cur.execute(
+        f"""
+        INSERT INTO sales_daily (company_id, day, status, sales_count, total)
+        SELECT company_id, date(created_at, '{day}'), status, COUNT(*), SUM(total)
+        FROM sales
+        WHERE (:company_id IS NULL OR company_id = :company_id)
+        GROUP BY 1, 2, 3;
+        """,
+        params,
+    )
+    cur.execute(
+        f"""
+        INSERT INTO payments_daily (company_id, day, direction, method, payments_count, amount)
+        SELECT company_id, date(paid_at, '{day}'), direction, method, COUNT(*), SUM(amount)
+        FROM payments
+        WHERE (:company_id IS NULL OR company_id = :company_id)
+        GROUP BY 1, 2, 3, 4;
+        """,
+        params,
+    )
+
+
+def _migration_003_daily_rollups(cur: sqlite3.Cursor) -> None:
+    # Rollups diários: day é a data local (YYYY-MM-DD) conforme ROLLUP_DAY_OFFSET_HOURS.
+    _exec_many(
+        cur,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS sales_daily (
+                company_id INTEGER NOT NULL,
+                day TEXT NOT NULL, -- YYYY-MM-DD (local)
+                status TEXT NOT NULL, -- open | paid | cancelled
+                sales_count INTEGER NOT NULL DEFAULT 0,
+                total REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (company_id, day, status)
+            ) WITHOUT ROWID;
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS payments_daily (
+                company_id INTEGER NOT NULL,
+                day TEXT NOT NULL, -- YYYY-MM-DD (local)
+                direction TEXT NOT NULL, -- in | out
+                method TEXT NOT NULL, -- pix | cash | card | transfer
+                payments_count INTEGER NOT NULL DEFAULT 0,
+                amount REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (company_id, day, direction, method)
+            ) WITHOUT ROWID;
+            """,
+        ],
+    )
+    create_rollup_triggers(cur)
+    rebuild_rollups(cur)
+
+
+def _migration_004_aging_indexes(cur: sqlite3.Cursor) -> None:
+    # Cobrindo: relatórios por status/vencimento respondem só com o índice (sem ler a tabela).
+    # Parciais: só títulos open/partial, que são os únicos que entram em vencidos/aging.
+    _exec_many(
+        cur,
+        [
+            "CREATE INDEX IF NOT EXISTS idx_ar_company_status_due ON accounts_receivable(company_id, status, due_date, total, paid_total);",
+            "CREATE INDEX IF NOT EXISTS idx_ap_company_status_due ON accounts_payable(company_id, status, due_date, total, paid_total);",
+            "CREATE INDEX IF NOT EXISTS idx_ar_open_due ON accounts_receivable(company_id, due_date, total, paid_total) "
+            "WHERE status IN ('open', 'partial');",
+            "CREATE INDEX IF NOT EXISTS idx_ap_open_due ON accounts_payable(company_id, due_date, total, paid_total) "
+            "WHERE status IN ('open', 'partial');",
+        ],
+    )
+
+
+# rowid no catalog_fts: id * 2 + deslocamento do tipo (produtos e serviços não colidem).
+CATALOG_FTS_SOURCES = (
+    ("products", "product", 0),
+    ("services", "service", 1),
+)
+
+
+def _migration_005_catalog_fts(cur: sqlite3.Cursor) -> None:
+    # Só itens ativos entram no índice. scope = 'c<company_id>' permite filtrar a empresa
+    # dentro do próprio MATCH; remove_diacritics 2 faz "acao" achar "ação".
+    cur.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS catalog_fts USING fts5(
+            name,
+            code,
+            scope,
+            item_type UNINDEXED,
+            item_id UNINDEXED,
+            company_id UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        );
+        """
+    )
+    for table, item_type, offset in CATALOG_FTS_SOURCES:
+        insert_new = (
+            "INSERT INTO catalog_fts (rowid, name, code, scope, item_type, item_id, company_id) "
+            f"SELECT NEW.id * 2 + {offset}, NEW.name, NEW.code, 'c' || NEW.company_id, '{item_type}', NEW.id, NEW.company_id "
+            "WHERE NEW.active = 1;"
+        )
         _exec_many(
             cur,
             [
-                """
-                CREATE TABLE IF NOT EXISTS accounts_receivable (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    company_id INTEGER NOT NULL,
-                    sale_id INTEGER NOT NULL,
-                    status TEXT NOT NULL, -- open | partial | paid | cancelled
-                    due_date TEXT NOT NULL, -- YYYY-MM-DD
-                    total REAL NOT NULL,
-                    paid_total REAL NOT NULL DEFAULT 0,
-                    created_at TEXT NOT NULL,
-                    FOREIGN KEY (company_id) REFERENCES companies(id),
-                    FOREIGN KEY (sale_id) REFERENCES sales(id)
-                );
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_insert AFTER INSERT ON {table}
+                BEGIN
+                    {insert_new}
+                END;
                 """,
-                """
-                CREATE TABLE IF NOT EXISTS accounts_payable (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    company_id INTEGER NOT NULL,
-                    supplier_name TEXT NOT NULL,
-                    description TEXT,
-                    status TEXT NOT NULL, -- open | partial | paid | cancelled
-                    due_date TEXT NOT NULL, -- YYYY-MM-DD
-                    total REAL NOT NULL,
-                    paid_total REAL NOT NULL DEFAULT 0,
-                    created_at TEXT NOT NULL,
-                    FOREIGN KEY (company_id) REFERENCES companies(id)
-                );
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_update
+                AFTER UPDATE OF name, code, active, company_id ON {table}
+                BEGIN
+                    DELETE FROM catalog_fts WHERE rowid = OLD.id * 2 + {offset};
+                    {insert_new}
+                END;
                 """,
-                """
-                CREATE TABLE IF NOT EXISTS payments (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    company_id INTEGER NOT NULL,
-                    direction TEXT NOT NULL, -- in | out
-                    origin_type TEXT NOT NULL, -- receivable | payable | sale_direct | manual
-                    origin_id INTEGER,
-                    method TEXT NOT NULL, -- pix | cash | card | transfer
-                    amount REAL NOT NULL,
-                    paid_at TEXT NOT NULL, -- ISO
-                    created_by INTEGER,
-                    note TEXT,
-                    FOREIGN KEY (company_id) REFERENCES companies(id),
-                    FOREIGN KEY (created_by) REFERENCES users(id)
-                );
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_delete AFTER DELETE ON {table}
+                BEGIN
+                    DELETE FROM catalog_fts WHERE rowid = OLD.id * 2 + {offset};
+                END;
                 """,
             ],
         )
-
-        # ------------------------------------------------------------
-        # SESSÃO WHATSAPP (ESTADO DA CONVERSA)
-        # ------------------------------------------------------------
-        _exec_many(
-            cur,
-            [
-                """
-                CREATE TABLE IF NOT EXISTS wa_sessions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    company_id INTEGER NOT NULL,
-                    whatsapp TEXT NOT NULL,
-                    state TEXT NOT NULL,
-                    context_json TEXT,
-                    updated_at TEXT NOT NULL,
-                    FOREIGN KEY (company_id) REFERENCES companies(id)
-                );
-                """,
-            ],
+        cur.execute(f"DELETE FROM catalog_fts WHERE item_type = '{item_type}';")
+        cur.execute(
+            "INSERT INTO catalog_fts (rowid, name, code, scope, item_type, item_id, company_id) "
+            f"SELECT id * 2 + {offset}, name, code, 'c' || company_id, '{item_type}', id, company_id "
+            f"FROM {table} WHERE active = 1;"
         )
 
-        # ------------------------------------------------------------
-        # SEQUÊNCIAS (POR ANO)
-        # key: BUDGET | SALE
-        # year: AAAA
-        # next_number: próximo inteiro a emitir
-        # ------------------------------------------------------------
-        _exec_many(
-            cur,
-            [
-                """
-                CREATE TABLE IF NOT EXISTS sequences (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    company_id INTEGER NOT NULL,
-                    key TEXT NOT NULL,
-                    year INTEGER NOT NULL,
-                    next_number INTEGER NOT NULL,
-                    UNIQUE(company_id, key, year),
-                    FOREIGN KEY (company_id) REFERENCES companies(id)
-                );
-                """,
-            ],
-        )
 
-        # ------------------------------------------------------------
-        # BACKUPS
-        # ------------------------------------------------------------
-        _exec_many(
-            cur,
-            [
-                """
-                CREATE TABLE IF NOT EXISTS backups (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    company_id INTEGER NOT NULL,
-                    backup_date TEXT NOT NULL, -- YYYY-MM-DD
-                    file_name TEXT NOT NULL,
-                    created_at TEXT NOT NULL,
-                    FOREIGN KEY (company_id) REFERENCES companies(id)
-                );
-                """,
-            ],
-        )
+def _migration_006_message_deliveries(cur: sqlite3.Cursor) -> None:
+    # Uma linha por mensagem lógica (todas as partes). dedupe_key impede reenvio quando o
+    # agendador roda de novo no mesmo dia; parts_sent permite retomar do ponto em que parou.
+    _exec_many(
+        cur,
+        [
+            """
+            CREATE TABLE IF NOT EXISTS message_deliveries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_id INTEGER NOT NULL,
+                kind TEXT NOT NULL, -- due_reminder | overdue_reminder | daily_summary
+                ref_type TEXT,
+                ref_id INTEGER,
+                to_number TEXT NOT NULL,
+                body TEXT NOT NULL,
+                parts INTEGER NOT NULL DEFAULT 1,
+                parts_sent INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'pending', -- pending | sent | failed
+                attempts INTEGER NOT NULL DEFAULT 0,
+                provider_ids TEXT,
+                last_error TEXT,
+                dedupe_key TEXT NOT NULL UNIQUE,
+                created_at TEXT NOT NULL,
+                sent_at TEXT,
+                FOREIGN KEY (company_id) REFERENCES companies(id)
+            );
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_message_deliveries_pending
+            ON message_deliveries(id) WHERE status = 'pending';
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_message_deliveries_company_created
+            ON message_deliveries(company_id, created_at);
+            """,
+        ],
+    )
 
-        # ------------------------------------------------------------
-        # ÍNDICES / CONSTRAINTS ÚTEIS
-        # ------------------------------------------------------------
-        _exec_many(
-            cur,
-            [
-                "CREATE UNIQUE INDEX IF NOT EXISTS idx_users_company_whatsapp ON users(company_id, whatsapp);",
-                "CREATE UNIQUE INDEX IF NOT EXISTS idx_products_company_code ON products(company_id, code);",
-                "CREATE UNIQUE INDEX IF NOT EXISTS idx_services_company_code ON services(company_id, code);",
-                "CREATE UNIQUE INDEX IF NOT EXISTS idx_budgets_company_code ON budgets(company_id, code);",
-                "CREATE UNIQUE INDEX IF NOT EXISTS idx_sales_company_code ON sales(company_id, code);",
-                "CREATE INDEX IF NOT EXISTS idx_budget_items_budget_id ON budget_items(budget_id);",
-                "CREATE INDEX IF NOT EXISTS idx_sale_items_sale_id ON sale_items(sale_id);",
-                "CREATE INDEX IF NOT EXISTS idx_stock_movements_product_id ON stock_movements(product_id);",
-                "CREATE INDEX IF NOT EXISTS idx_payments_paid_at ON payments(paid_at);",
-                "CREATE UNIQUE INDEX IF NOT EXISTS idx_sessions_company_whatsapp ON wa_sessions(company_id, whatsapp);",
-                "CREATE INDEX IF NOT EXISTS idx_ar_sale_id ON accounts_receivable(sale_id);",
-            ],
-        )
 
-        # ------------------------------------------------------------
-        # SEED MÍNIMO (DEV)
-        # - cria 1 company se não existir
-        # - cria 1 user owner se variáveis existirem e ainda não existir
-        # ------------------------------------------------------------
-        now = _utc_iso()
+def _migration_007_bulk_import(cur: sqlite3.Cursor) -> None:
+    # customers.code: código do cliente no sistema anterior, chave do upsert da importação
+    # (parcial: clientes cadastrados pelo bot continuam sem código).
+    _add_column(cur, "customers", "code", "TEXT")
+    _exec_many(
+        cur,
+        [
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_customers_company_code
+            ON customers(company_id, code) WHERE code IS NOT NULL;
+            """,
+            # Checkpoint gravado na mesma transação de cada lote: retomar nunca repete linhas.
+            """
+            CREATE TABLE IF NOT EXISTS import_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_id INTEGER NOT NULL,
+                kind TEXT NOT NULL, -- products | services | customers
+                source TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'running', -- running | done
+                byte_offset INTEGER NOT NULL DEFAULT 0,
+                line_no INTEGER NOT NULL DEFAULT 0,
+                rows_read INTEGER NOT NULL DEFAULT 0,
+                rows_written INTEGER NOT NULL DEFAULT 0,
+                rows_unchanged INTEGER NOT NULL DEFAULT 0,
+                rows_failed INTEGER NOT NULL DEFAULT 0,
+                started_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                finished_at TEXT,
+                FOREIGN KEY (company_id) REFERENCES companies(id)
+            );
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_import_jobs_lookup
+            ON import_jobs(company_id, kind, fingerprint);
+            """,
+        ],
+    )
 
-        existing_company = cur.execute("SELECT id FROM companies ORDER BY id LIMIT 1;").fetchone()
-        if not existing_company:
-            company_name = os.getenv("GESTFLOW_COMPANY_NAME", "GESTFLOW")
-            cur.execute(
-                "INSERT INTO companies (name, created_at) VALUES (?, ?);",
-                (company_name, now),
-            )
-            company_id = int(cur.lastrowid)
-        else:
-            company_id = int(existing_company["id"])
 
-        owner_whatsapp = (os.getenv("GESTFLOW_OWNER_WHATSAPP") or "").strip()
-        owner_name = (os.getenv("GESTFLOW_OWNER_NAME") or "Dono").strip()
+def _migration_008_export_indexes(cur: sqlite3.Cursor) -> None:
+    # Exportações por empresa + período (modules/exports.py) em ordem de data, sem ordenar
+    # em memória (o índice já entrega na ordem).
+    _exec_many(
+        cur,
+        [
+            "CREATE INDEX IF NOT EXISTS idx_sales_company_created ON sales(company_id, created_at);",
+            "CREATE INDEX IF NOT EXISTS idx_payments_company_paid ON payments(company_id, paid_at);",
+            "CREATE INDEX IF NOT EXISTS idx_stock_movements_company_created ON stock_movements(company_id, created_at);",
+        ],
+    )
 
-        if owner_whatsapp:
-            exists_owner = cur.execute(
-                "SELECT id FROM users WHERE company_id=? AND whatsapp=? LIMIT 1;",
-                (company_id, owner_whatsapp),
-            ).fetchone()
 
-            if not exists_owner:
-                cur.execute(
-                    "INSERT INTO users (company_id, whatsapp, name, role, created_at) VALUES (?, ?, ?, ?, ?);",
-                    (company_id, owner_whatsapp, owner_name, "owner", now),
-                )
+def _migration_009_customer_name_index(cur: sqlite3.Cursor) -> None:
+    # "cliente <nome>" no WhatsApp procura o cliente pelo nome, sem diferenciar maiúsculas.
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_customers_company_name ON customers(company_id, name COLLATE NOCASE);"
+    )
+
+
+def _migration_010_archive_indexes(cur: sqlite3.Cursor) -> None:
+    # Arquivamento (modules/archive.py): orçamentos por empresa + data e "alguma venda ainda
+    # no banco quente aponta para este orçamento?" sem varrer sales.
+    _exec_many(
+        cur,
+        [
+            "CREATE INDEX IF NOT EXISTS idx_budgets_company_created ON budgets(company_id, created_at);",
+            "CREATE INDEX IF NOT EXISTS idx_sales_budget_id ON sales(budget_id) WHERE budget_id IS NOT NULL;",
+        ],
+    )
+
+
+# ============================================================
+# MIGRAÇÕES (PRAGMA user_version)
+# Cada migração roda uma única vez, em ordem; user_version guarda a última aplicada.
+# Migrações novas entram no fim da lista, nunca editando as já publicadas.
+# ============================================================
+
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, "schema base", _migration_001_base),
+    (2, "backups: tamanho e checksum", _migration_002_backup_checksum),
+    (3, "rollups diários de vendas e pagamentos", _migration_003_daily_rollups),
+    (4, "índices de vencimento em contas a receber/pagar", _migration_004_aging_indexes),
+    (5, "busca FTS5 do catálogo", _migration_005_catalog_fts),
+    (6, "log de envios ativos (lembretes/resumos)", _migration_006_message_deliveries),
+    (7, "importação em massa: código de cliente e checkpoints", _migration_007_bulk_import),
+    (8, "índices das exportações por período", _migration_008_export_indexes),
+    (9, "índice de clientes por nome", _migration_009_customer_name_index),
+    (10, "índices do arquivamento anual", _migration_010_archive_indexes),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
 
+# Bancos já conferidos neste processo: init_db() vira um no-op.
+_schema_ready: Set[str] = set()
 
-def fetch_one(sql: str, params: Tuple[Any, ...] = ()) -> Optional[Dict[str, Any]]:
+
+def _schema_key(db_path: Path) -> str:
+    # Mesma chave em init_db(), _route() e fan_out(): caminho absoluto (sem resolve(), que
+    # custaria syscalls por acesso no _route()).
+    return os.path.abspath(db_path)
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    row = conn.execute("PRAGMA user_version;").fetchone()
+    return int(row["user_version"] if isinstance(row, dict) else row[0])
+
+
+def migrate(conn: sqlite3.Connection, seed: bool = True) -> List[int]:
+    """
+    Aplica as migrações pendentes em uma única transação (BEGIN IMMEDIATE, então dois
+    processos subindo juntos não aplicam a mesma migração duas vezes). Retorna as aplicadas.
+    Shards migram com seed=False (empresa e usuários vêm do banco principal).
+    """
+    cur = conn.cursor()
+    applied: List[int] = []
+    try:
+        cur.execute("BEGIN IMMEDIATE;")
+        # Relê sob o lock de escrita: outro processo pode ter migrado enquanto esperávamos.
+        version = get_schema_version(conn)
+        for number, _, apply in MIGRATIONS:
+            if number <= version:
+                continue
+            apply(cur)
+            cur.execute(f"PRAGMA user_version = {int(number)};")
+            applied.append(number)
+        if applied and seed:
+            _seed_dev(cur)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return applied
+
+
+def init_db() -> None:
+    """
+    Garante o schema atual. Em boot "quente" (schema já na última versão) custa só um
+    PRAGMA user_version; chamadas seguintes no mesmo processo não tocam o banco.
+    """
+    db_path = Path(config.SQLITE_DB_PATH)
+    db_key = _schema_key(db_path)
+    if db_key in _schema_ready:
+        return
+    with _connection_for(db_path) as conn:
+        if get_schema_version(conn) < SCHEMA_VERSION:
+            migrate(conn)
+    _schema_ready.add(db_key)
+
+
+def seed_dev() -> None:
+    """
+    Reaplica o seed mínimo (ex.: após definir GESTFLOW_OWNER_WHATSAPP num banco já migrado).
+    """
+    init_db()
     with db_cursor() as cur:
+        _seed_dev(cur)
+
+
+
+def fetch_one(sql: str, params: Params = ()) -> Optional[Dict[str, Any]]:
+    with _read_cursor() as cur:
+        started = time.perf_counter()
         row = cur.execute(sql, params).fetchone()
+        _observe(sql, started)
         return row
 
 
-def fetch_all(sql: str, params: Tuple[Any, ...] = ()) -> List[Dict[str, Any]]:
-    with db_cursor() as cur:
+def fetch_all(sql: str, params: Params = ()) -> List[Dict[str, Any]]:
+    with _read_cursor() as cur:
+        started = time.perf_counter()
+        # fetchall() já devolve uma lista nova; não precisa copiar.
         rows = cur.execute(sql, params).fetchall()
-        return list(rows or [])
+        _observe(sql, started)
+        return rows
+
+
+def fetch_batches(
+    sql: str,
+    params: Params = (),
+    size: int = 500,
+    as_dict: bool = False,
+) -> Iterator[List[Any]]:
+    """
+    Gera lotes de até `size` linhas sem materializar o resultado inteiro.
+    Por padrão as linhas são Record; as_dict=True mantém o formato dict.
+    A conexão fica emprestada até o gerador terminar (ou ser fechado).
+    """
+    with _read_cursor() as cur:
+        if not as_dict:
+            cur.row_factory = None
+        started = time.perf_counter()
+        # Mede só o execute (até a primeira linha); o consumo em lotes é do chamador.
+        cur.execute(sql, params)
+        _observe(sql, started)
+        index = _column_index(cur)
+        while True:
+            chunk = cur.fetchmany(size)
+            if not chunk:
+                break
+            if as_dict:
+                yield chunk
+            else:
+                yield [Record(values, index) for values in chunk]
 
 
-def execute(sql: str, params: Tuple[Any, ...] = ()) -> int:
+def fetch_iter(
+    sql: str,
+    params: Params = (),
+    as_dict: bool = False,
+    arraysize: int = 500,
+) -> Iterator[Any]:
+    """
+    Itera as linhas uma a uma (em streaming), lendo do SQLite em blocos de `arraysize`.
+    """
+    for chunk in fetch_batches(sql, params, size=arraysize, as_dict=as_dict):
+        yield from chunk
+
+
+def execute(sql: str, params: Params = ()) -> int:
     """
     Executa INSERT/UPDATE/DELETE e retorna lastrowid (0 se não aplicável).
     """
+    if config.SQLITE_WRITE_MODE == "queue":
+        return run_write(lambda tx: tx.execute(sql, params))
     with db_cursor() as cur:
+        started = time.perf_counter()
         cur.execute(sql, params)
+        _observe(sql, started)
         try:
             return int(cur.lastrowid or 0)
         except Exception:
             return 0
+
+
+def execute_many(sql: str, seq_params: Iterable[Tuple[Any, ...]]) -> int:
+    """
+    Executa o mesmo comando para vários parâmetros em uma única transação.
+    Retorna o total de linhas afetadas.
+    """
+    if config.SQLITE_WRITE_MODE == "queue":
+        rows = list(seq_params)
+        return run_write(lambda tx: tx.execute_many(sql, rows))
+    with transaction() as tx:
+        return tx.execute_many(sql, seq_params)
+
+
+def insert_returning(sql: str, params: Params = ()) -> Optional[Dict[str, Any]]:
+    """
+    Executa INSERT ... RETURNING (SQLite >= 3.35) e devolve a linha retornada,
+    evitando uma segunda consulta só para obter id/código.
+    """
+    if config.SQLITE_WRITE_MODE == "queue":
+        return run_write(lambda tx: tx.insert_returning(sql, params))
+    with transaction() as tx:
+        return tx.insert_returning(sql, params)
+
+
+if __name__ == "__main__":
+    # python database.py -> aplica migrações pendentes e mostra a versão do schema.
+    init_db()
+    with db_connection() as _conn:
+        print(f"Schema na versão {get_schema_version(_conn)} ({config.SQLITE_DB_PATH})")
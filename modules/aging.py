@@ -0,0 +1,138 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\modules\aging.py
+# Último recode: 2026-10-17 19:30 (America/Bahia)
+# Motivo: Relatórios de contas a receber/pagar: vencidos, a vencer e aging por faixas
+#         (0–30, 31–60, 61–90, 90+), sempre filtrando status open/partial para usar os
+#         índices parciais idx_ar_open_due / idx_ap_open_due.
+#
+# Uso (CLI): python -m modules.aging --company-id 1 [--kind receivable|payable]
+
+from __future__ import annotations
+
+import argparse
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import database
+from modules.reports import local_today
+
+_TABLES = {
+    "receivable": "accounts_receivable",
+    "payable": "accounts_payable",
+}
+
+# Mesmo texto do WHERE dos índices parciais (o planner exige o termo equivalente).
+_OPEN_FILTER = "status IN ('open', 'partial')"
+
+BUCKETS = ("a_vencer", "0-30", "31-60", "61-90", "90+")
+
+# Consultas usadas aqui e conferidas em benchmarks/check_query_plans.py.
+OVERDUE_SQL = {
+    "receivable": (
+        "SELECT ar.id, ar.sale_id, ar.due_date, ar.total, ar.paid_total, "
+        "ar.total - ar.paid_total AS balance, s.code AS sale_code, c.name AS customer_name, c.phone "
+        "FROM accounts_receivable ar "
+        "JOIN sales s ON s.id = ar.sale_id "
+        "JOIN customers c ON c.id = s.customer_id "
+        f"WHERE ar.company_id = ? AND ar.{_OPEN_FILTER} AND ar.due_date < ? "
+        "ORDER BY ar.due_date;"
+    ),
+    "payable": (
+        "SELECT id, supplier_name, description, due_date, total, paid_total, total - paid_total AS balance "
+        "FROM accounts_payable "
+        f"WHERE company_id = ? AND {_OPEN_FILTER} AND due_date < ? "
+        "ORDER BY due_date;"
+    ),
+}
+
+DUE_BETWEEN_SQL = {
+    "receivable": (
+        "SELECT ar.id, ar.sale_id, ar.due_date, ar.total - ar.paid_total AS balance, "
+        "s.code AS sale_code, c.name AS customer_name, c.phone "
+        "FROM accounts_receivable ar "
+        "JOIN sales s ON s.id = ar.sale_id "
+        "JOIN customers c ON c.id = s.customer_id "
+        f"WHERE ar.company_id = ? AND ar.{_OPEN_FILTER} AND ar.due_date BETWEEN ? AND ? "
+        "ORDER BY ar.due_date;"
+    ),
+    "payable": (
+        "SELECT id, supplier_name, description, due_date, total - paid_total AS balance "
+        "FROM accounts_payable "
+        f"WHERE company_id = ? AND {_OPEN_FILTER} AND due_date BETWEEN ? AND ? "
+        "ORDER BY due_date;"
+    ),
+}
+
+
+def _aging_sql(table: str) -> str:
+    return (
+        "SELECT "
+        "CASE "
+        "  WHEN due_date >= :today THEN 'a_vencer' "
+        "  WHEN julianday(:today) - julianday(due_date) <= 30 THEN '0-30' "
+        "  WHEN julianday(:today) - julianday(due_date) <= 60 THEN '31-60' "
+        "  WHEN julianday(:today) - julianday(due_date) <= 90 THEN '61-90' "
+        "  ELSE '90+' "
+        "END AS bucket, "
+        "COUNT(*) AS titles, SUM(total - paid_total) AS balance "
+        f"FROM {table} "
+        f"WHERE company_id = :company_id AND {_OPEN_FILTER} "
+        "GROUP BY bucket;"
+    )
+
+
+AGING_SQL = {kind: _aging_sql(table) for kind, table in _TABLES.items()}
+
+
+def _check_kind(kind: str) -> None:
+    if kind not in _TABLES:
+        raise ValueError(f"Tipo inválido: {kind!r} (use receivable ou payable)")
+
+
+def overdue(kind: str, company_id: int, today: Optional[date] = None) -> List[Dict[str, Any]]:
+    """
+    Títulos em aberto com vencimento anterior a hoje, do mais antigo para o mais novo.
+    """
+    _check_kind(kind)
+    today = today or local_today()
+    return database.fetch_all(OVERDUE_SQL[kind], (company_id, today.isoformat()))
+
+
+def due_between(kind: str, company_id: int, start: date, end: date) -> List[Dict[str, Any]]:
+    """
+    Títulos em aberto que vencem entre start e end (inclusive).
+    """
+    _check_kind(kind)
+    return database.fetch_all(DUE_BETWEEN_SQL[kind], (company_id, start.isoformat(), end.isoformat()))
+
+
+def due_soon(kind: str, company_id: int, days: int, today: Optional[date] = None) -> List[Dict[str, Any]]:
+    today = today or local_today()
+    return due_between(kind, company_id, today, today + timedelta(days=days))
+
+
+def aging(kind: str, company_id: int, today: Optional[date] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Saldo em aberto por faixa de atraso. Faixas sem títulos vêm zeradas.
+    """
+    _check_kind(kind)
+    today = today or local_today()
+    result = {b: {"titles": 0, "balance": 0.0} for b in BUCKETS}
+    for row in database.fetch_all(AGING_SQL[kind], {"company_id": company_id, "today": today.isoformat()}):
+        result[row["bucket"]] = {"titles": int(row["titles"]), "balance": float(row["balance"] or 0)}
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m modules.aging")
+    parser.add_argument("--company-id", type=int, required=True)
+    parser.add_argument("--kind", choices=tuple(_TABLES), default="receivable")
+    args = parser.parse_args(argv)
+
+    database.init_db()
+    for bucket, data in aging(args.kind, args.company_id).items():
+        print(f"{bucket:>9}: {data['titles']:5d} título(s)  saldo {data['balance']:12.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
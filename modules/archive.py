@@ -0,0 +1,548 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\modules\archive.py
+# Último recode: 2026-10-18 05:40 (America/Bahia)
+# Motivo: Arquivamento quente/frio. Vendas pagas/canceladas (com itens e contas a receber
+#         quitadas), orçamentos aprovados/cancelados, pagamentos de origem encerrada e
+#         movimentos de estoque anteriores ao corte saem do banco quente para um arquivo
+#         SQLite por ano. Leituras de histórico anexam os anos (ATTACH) atrás de views
+#         UNION ALL com o nome das próprias tabelas; o banco quente é compactado com VACUUM INTO.
+#
+# Uso (CLI):
+#   python -m modules.archive run [--before 2025-01-01] [--company-id 1] [--compact]
+#   python -m modules.archive status
+#   python -m modules.archive compact          (com o app parado: troca o arquivo do banco)
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import config
+import database
+
+# Grupos arquivados, nesta ordem (vendas antes de orçamentos: o orçamento só sai depois da
+# venda que o converteu). (tabela raiz, coluna de data, condição de "encerrado" sobre a
+# linha r, filhas que saem junto e a coluna delas que aponta para a raiz).
+# Rollups (sales_daily/payments_daily) e stock_balances não têm trigger de DELETE: o
+# histórico agregado e o saldo atual continuam intactos no banco quente.
+GROUPS: Tuple[Tuple[str, str, str, Tuple[Tuple[str, str], ...]], ...] = (
+    (
+        "sales",
+        "created_at",
+        "r.status IN ('paid', 'cancelled') AND NOT EXISTS ("
+        "SELECT 1 FROM main.accounts_receivable ar WHERE ar.sale_id = r.id AND ar.status IN ('open', 'partial'))",
+        (("sale_items", "sale_id"), ("accounts_receivable", "sale_id")),
+    ),
+    (
+        "budgets",
+        "created_at",
+        "r.status IN ('approved', 'cancelled') AND NOT EXISTS (SELECT 1 FROM main.sales s WHERE s.budget_id = r.id)",
+        (("budget_items", "budget_id"),),
+    ),
+    (
+        "payments",
+        "paid_at",
+        "NOT EXISTS (SELECT 1 FROM main.accounts_receivable o WHERE r.origin_type = 'receivable' "
+        "AND o.id = r.origin_id AND o.status IN ('open', 'partial')) "
+        "AND NOT EXISTS (SELECT 1 FROM main.accounts_payable o WHERE r.origin_type = 'payable' "
+        "AND o.id = r.origin_id AND o.status IN ('open', 'partial')) "
+        "AND NOT EXISTS (SELECT 1 FROM main.sales o WHERE r.origin_type = 'sale_direct' "
+        "AND o.id = r.origin_id AND o.status = 'open')",
+        (),
+    ),
+    ("stock_movements", "created_at", "1", ()),
+)
+
+ARCHIVED_TABLES = tuple(t for root, _, _, children in GROUPS for t in (root, *(c for c, _ in children)))
+
+# SQLITE_MAX_ATTACHED padrão: mais anos que isso numa mesma leitura exige restringir o período.
+MAX_ATTACHED = 10
+
+_ISO = "%Y-%m-%dT%H:%M:%SZ"
+
+
+# ============================================================
+# ARQUIVOS E DATAS
+# ============================================================
+
+
+def archive_dir(db_path: Path) -> Path:
+    return Path(config.ARCHIVE_DIR) if config.ARCHIVE_DIR else Path(db_path).parent / "archive"
+
+
+def archive_path(db_path: Path, year: int) -> Path:
+    """
+    Arquivo do ano para este banco: <pasta>/<nome do banco>_<ano>.db (um conjunto por shard).
+    """
+    return archive_dir(db_path) / f"{Path(db_path).stem}_{int(year)}.db"
+
+
+def archive_files(db_path: Path) -> List[Tuple[int, Path]]:
+    """
+    (ano, arquivo) dos anos já arquivados deste banco, em ordem.
+    """
+    folder = archive_dir(db_path)
+    if not folder.is_dir():
+        return []
+    pattern = re.compile(re.escape(Path(db_path).stem) + r"_(\d{4})\.db")
+    found = []
+    for path in folder.iterdir():
+        match = pattern.fullmatch(path.name)
+        if match is not None:
+            found.append((int(match.group(1)), path))
+    return sorted(found)
+
+
+def _offset() -> timezone:
+    return timezone(timedelta(hours=config.ROLLUP_DAY_OFFSET_HOURS))
+
+
+def _utc_bound(day: date) -> str:
+    """
+    Meia-noite local do dia -> instante UTC no formato de utc_iso() (mesmo fuso dos rollups).
+    """
+    local = datetime(day.year, day.month, day.day, tzinfo=_offset())
+    return local.astimezone(timezone.utc).strftime(_ISO)
+
+
+def _local_year(stamp: str) -> int:
+    moment = datetime.strptime(stamp[:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+    return moment.astimezone(_offset()).year
+
+
+def default_cutoff(today: Optional[date] = None) -> str:
+    """
+    1º de janeiro de ARCHIVE_KEEP_YEARS anos atrás (dia local, YYYY-MM-DD): fica no banco
+    quente o ano atual mais os anos completos configurados.
+    """
+    today = today or datetime.now(_offset()).date()
+    return date(today.year - config.ARCHIVE_KEEP_YEARS, 1, 1).isoformat()
+
+
+# ============================================================
+# SCHEMA DOS ARQUIVOS
+# ============================================================
+
+
+def _columns(conn: sqlite3.Connection, schema: str, table: str) -> List[Tuple[str, str]]:
+    return [(row["name"], row["type"]) for row in conn.execute(f"PRAGMA {schema}.table_info({table});").fetchall()]
+
+
+def ensure_schema(conn: sqlite3.Connection, alias: str) -> None:
+    """
+    Cria/atualiza as tabelas do arquivo anexado como `alias` a partir do schema quente:
+    mesmas colunas, sem FKs (clientes e produtos continuam só no banco quente) e com os
+    índices que as leituras por empresa + período usam.
+    """
+    for table in ARCHIVED_TABLES:
+        hot = _columns(conn, "main", table)
+        existing = {name for name, _ in _columns(conn, alias, table)}
+        if not existing:
+            defs = ", ".join(f"{name} {ctype}" + (" PRIMARY KEY" if name == "id" else "") for name, ctype in hot)
+            conn.execute(f"CREATE TABLE {alias}.{table} ({defs});")
+            continue
+        # Migrações novas no banco quente: a coluna entra vazia nos anos já arquivados.
+        for name, ctype in hot:
+            if name not in existing:
+                conn.execute(f"ALTER TABLE {alias}.{table} ADD COLUMN {name} {ctype};")
+    for root, column, _, children in GROUPS:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {alias}.idx_{root}_company_{column} ON {root}(company_id, {column});")
+        for child, key in children:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {alias}.idx_{child}_{key} ON {child}({key});")
+
+
+# ============================================================
+# ARQUIVAMENTO
+# ============================================================
+
+
+def _move_batch(
+    conn: sqlite3.Connection,
+    alias: str,
+    group: Tuple[str, str, str, Tuple[Tuple[str, str], ...]],
+    company_id: int,
+    bounds: Tuple[str, str],
+    after: Tuple[str, int],
+    batch_size: int,
+    moved: Dict[str, int],
+) -> Optional[Tuple[str, int]]:
+    """
+    Uma transação: até batch_size registros raiz encerrados (com as filhas) copiados para o
+    arquivo e apagados do banco quente. Devolve a posição (data, id) do último registro
+    movido, ou None quando o intervalo acabou.
+    """
+    root, column, closed, children = group
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE;")
+        rows = cur.execute(
+            f"SELECT r.id, r.{column} AS at FROM main.{root} r "
+            f"WHERE r.company_id = ? AND r.{column} >= ? AND r.{column} < ? AND (r.{column}, r.id) > (?, ?) "
+            f"AND {closed} ORDER BY r.{column}, r.id LIMIT ?;",
+            (company_id, max(bounds[0], after[0]), bounds[1], after[0], after[1], batch_size),
+        ).fetchall()
+        if not rows:
+            conn.commit()
+            return None
+        cur.execute("DELETE FROM temp.archive_batch;")
+        cur.executemany("INSERT INTO temp.archive_batch (id) VALUES (?);", [(row["id"],) for row in rows])
+
+        tables = [*children, (root, "id")]
+        for table, key in tables:
+            cols = ", ".join(name for name, _ in _columns(conn, "main", table))
+            cur.execute(
+                f"INSERT OR REPLACE INTO {alias}.{table} ({cols}) "
+                f"SELECT {cols} FROM main.{table} WHERE {key} IN (SELECT id FROM temp.archive_batch);"
+            )
+            copied = cur.rowcount
+            cur.execute(f"DELETE FROM main.{table} WHERE {key} IN (SELECT id FROM temp.archive_batch);")
+            if cur.rowcount != copied:
+                raise RuntimeError(f"{table}: {copied} linha(s) copiadas e {cur.rowcount} apagadas; lote desfeito.")
+            moved[table] = moved.get(table, 0) + copied
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    last = rows[-1]
+    return last["at"], last["id"]
+
+
+def archive_database(
+    db_path: Path,
+    before_day: str,
+    company_ids: Optional[Iterable[int]] = None,
+    batch_size: Optional[int] = None,
+) -> Dict[int, Dict[str, int]]:
+    """
+    Move os registros encerrados anteriores a before_day (dia local, exclusivo) deste banco
+    para os arquivos anuais. Lotes curtos, cada um na sua transação: o app segue gravando.
+    Cada lote grava no arquivo e apaga do quente no mesmo COMMIT; se o processo cair entre
+    os dois arquivos (WAL não garante atomicidade entre bancos anexados), rodar de novo
+    termina o serviço (INSERT OR REPLACE pelo id). Retorna {ano: {tabela: linhas movidas}}.
+    """
+    try:
+        cutoff_day = date.fromisoformat(before_day)
+    except ValueError:
+        raise ValueError("Data de corte deve estar no formato YYYY-MM-DD.") from None
+    cutoff = _utc_bound(cutoff_day)
+    size = max(1, batch_size or config.ARCHIVE_BATCH_SIZE)
+    result: Dict[int, Dict[str, int]] = {}
+
+    conn = database.get_connection(db_path)
+    try:
+        conn.execute("PRAGMA busy_timeout = 30000;")
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS archive_batch (id INTEGER PRIMARY KEY);")
+        if company_ids is None:
+            companies = [row["id"] for row in conn.execute("SELECT id FROM main.companies ORDER BY id;").fetchall()]
+        else:
+            companies = list(company_ids)
+
+        # Primeiro ano com algo a arquivar (MIN por empresa usa o índice empresa + data).
+        first: Optional[str] = None
+        for root, column, _, _ in GROUPS:
+            for company_id in companies:
+                row = conn.execute(
+                    f"SELECT MIN({column}) AS at FROM main.{root} WHERE company_id = ? AND {column} < ?;",
+                    (company_id, cutoff),
+                ).fetchone()
+                if row["at"] is not None and (first is None or row["at"] < first):
+                    first = row["at"]
+        if first is None:
+            return result
+
+        # Corte no meio do ano: o próprio ano do corte também recebe a parte anterior.
+        last_year = cutoff_day.year if cutoff_day > date(cutoff_day.year, 1, 1) else cutoff_day.year - 1
+        for year in range(_local_year(first), last_year + 1):
+            bounds = (_utc_bound(date(year, 1, 1)), min(_utc_bound(date(year + 1, 1, 1)), cutoff))
+            alias = f"arch_{year}"
+            path = archive_path(db_path, year)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            conn.execute(f"ATTACH DATABASE ? AS {alias};", (str(path),))
+            try:
+                ensure_schema(conn, alias)
+                moved: Dict[str, int] = {}
+                for group in GROUPS:
+                    for company_id in companies:
+                        after: Optional[Tuple[str, int]] = ("", 0)
+                        while after is not None:
+                            after = _move_batch(conn, alias, group, company_id, bounds, after, size, moved)
+                if any(moved.values()):
+                    result[year] = moved
+            finally:
+                conn.execute(f"DETACH DATABASE {alias};")
+    finally:
+        conn.close()
+    return result
+
+
+def databases() -> List[Path]:
+    """
+    Bancos com dados de empresas: os shards (com sharding ligado) ou o banco principal.
+    """
+    if database.sharding_enabled():
+        return database.shard_paths()
+    return [Path(config.SQLITE_DB_PATH)]
+
+
+# ============================================================
+# LEITURA DO HISTÓRICO (ATTACH + VIEWS UNION ALL)
+# ============================================================
+
+
+def attach_history(conn: sqlite3.Connection, db_path: Path, years: Optional[Iterable[int]] = None) -> List[int]:
+    """
+    Anexa os arquivos dos anos pedidos (todos, por padrão) e cria views TEMP com o nome das
+    tabelas arquivadas: banco quente UNION ALL anos. Nomes sem schema resolvem primeiro em
+    temp, então o SQL de sempre passa a enxergar o histórico sem mudar uma linha; escrever
+    nessas tabelas pela conexão deixa de ser possível. Precisa rodar fora de transação.
+    """
+    wanted = None if years is None else set(years)
+    files = [(year, path) for year, path in archive_files(db_path) if wanted is None or year in wanted]
+    if not files:
+        return []
+    if len(files) > MAX_ATTACHED:
+        raise RuntimeError(
+            f"{len(files)} anos arquivados no período (limite de {MAX_ATTACHED} por conexão); restrinja o período."
+        )
+    for year, path in files:
+        conn.execute(f"ATTACH DATABASE ? AS arch_{year};", (str(path),))
+    for table in ARCHIVED_TABLES:
+        hot = [name for name, _ in _columns(conn, "main", table)]
+        parts = [f"SELECT {', '.join(hot)} FROM main.{table}"]
+        for year, _ in files:
+            have = {name for name, _ in _columns(conn, f"arch_{year}", table)}
+            if have:
+                cols = ", ".join(name if name in have else f"NULL AS {name}" for name in hot)
+                parts.append(f"SELECT {cols} FROM arch_{year}.{table}")
+        conn.execute(f"CREATE TEMP VIEW {table} AS " + " UNION ALL ".join(parts) + ";")
+    return [year for year, _ in files]
+
+
+@contextmanager
+def history_reader(
+    company_id: Optional[int] = None,
+    years: Optional[Iterable[int]] = None,
+    db_path: Optional[Path] = None,
+) -> Iterator[sqlite3.Connection]:
+    """
+    database.snapshot_reader() com os anos arquivados anexados (views de attach_history).
+    Sem arquivo para os anos pedidos, é um snapshot comum do banco quente. db_path fixa o
+    banco lido (ex.: o principal com sharding ligado, na conferência do split).
+    """
+    path = Path(db_path) if db_path is not None else database.db_path(company_id)
+    conn = database.get_connection(path, readonly=True)
+    try:
+        # As views vivem em temp; os arquivos continuam abertos só para leitura (mode=ro).
+        conn.execute("PRAGMA query_only = OFF;")
+        attach_history(conn, path, years)
+        conn.execute("PRAGMA query_only = ON;")
+        conn.execute("BEGIN;")
+        conn.execute("SELECT 1 FROM sqlite_master LIMIT 1;").fetchone()
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        conn.close()
+
+
+@contextmanager
+def history_sources(company_id: Optional[int] = None, years: Optional[Iterable[int]] = None) -> Iterator[List[sqlite3.Connection]]:
+    """
+    Um snapshot por arquivo: o banco quente e cada ano arquivado pedido (com o banco quente
+    anexado como "hot", então clientes e produtos resolvem). O mesmo SQL roda em todos sem
+    mudança e o chamador junta os resultados. Serve para joins entre duas tabelas arquivadas
+    (venda + itens): nas views UNION ALL o SQLite materializa os dois lados e junta sem
+    índice; como pai e filhas ficam sempre no mesmo arquivo, juntar arquivo a arquivo dá o
+    mesmo resultado usando os índices de cada um.
+    """
+    path = database.db_path(company_id)
+    wanted = None if years is None else set(years)
+    conns: List[sqlite3.Connection] = []
+    try:
+        conns.append(database.get_connection(path, readonly=True))
+        for year, file in archive_files(path):
+            if wanted is not None and year not in wanted:
+                continue
+            conn = database.get_connection(file, readonly=True)
+            conns.append(conn)
+            conn.execute("ATTACH DATABASE ? AS hot;", (str(path),))
+        for conn in conns:
+            conn.execute("BEGIN;")
+            conn.execute("SELECT 1 FROM sqlite_master LIMIT 1;").fetchone()
+        yield conns
+    finally:
+        for conn in conns:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.close()
+
+
+@contextmanager
+def history_transaction(company_id: Optional[int] = None) -> Iterator[database.Transaction]:
+    """
+    Transação de escrita no banco quente lendo o histórico completo (rebuild de rollups e de
+    saldos). Sem arquivos, é a database.transaction() normal; com arquivos, usa uma conexão
+    própria (fora do pool e da fila de escrita, como as demais tarefas de manutenção).
+    """
+    path = database.db_path(company_id)
+    if not archive_files(path):
+        with database.transaction() as tx:
+            yield tx
+        return
+
+    conn = database.get_connection(path)
+    try:
+        attach_history(conn, path)
+        cur = conn.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE;")
+            yield database.Transaction(cur)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+    finally:
+        conn.close()
+
+
+# ============================================================
+# COMPACTAÇÃO (VACUUM INTO)
+# ============================================================
+
+
+def _size(path: Path) -> int:
+    wal = Path(str(path) + "-wal")
+    return path.stat().st_size + (wal.stat().st_size if wal.exists() else 0)
+
+
+def compact(db_path: Optional[Path] = None, swap: bool = True) -> Dict[str, int]:
+    """
+    VACUUM INTO um arquivo novo ao lado do banco (o banco segue legível durante a cópia),
+    quick_check no resultado e troca atômica (os.replace). A troca exige o app parado:
+    conexões de outros processos continuariam no arquivo antigo. Se alguém gravar durante
+    a cópia (PRAGMA data_version muda), nada é trocado. swap=False só gera o arquivo
+    compactado (<banco>.compact) para medir ou copiar.
+    """
+    path = Path(db_path or config.SQLITE_DB_PATH)
+    target = path.with_name(path.name + ".compact")
+    target.unlink(missing_ok=True)
+    if swap:
+        database.close_pool()
+
+    conn = database.get_connection(path)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+        before = _size(path)
+        version = conn.execute("PRAGMA data_version;").fetchone()["data_version"]
+        conn.execute("VACUUM INTO ?;", (str(target),))
+        changed = conn.execute("PRAGMA data_version;").fetchone()["data_version"] != version
+    finally:
+        conn.close()
+
+    check = sqlite3.connect(str(target))
+    try:
+        # VACUUM INTO gera o arquivo em modo rollback; já sai em WAL para a primeira conexão
+        # depois da troca não precisar de lock exclusivo (leitores abertos a bloqueariam).
+        check.execute("PRAGMA journal_mode = WAL;")
+        status = check.execute("PRAGMA quick_check;").fetchone()[0]
+    finally:
+        check.close()
+    if status != "ok":
+        target.unlink(missing_ok=True)
+        raise RuntimeError(f"Arquivo compactado falhou no quick_check: {status}")
+    after = target.stat().st_size
+
+    if swap:
+        wal = Path(str(path) + "-wal")
+        if changed or (wal.exists() and wal.stat().st_size):
+            target.unlink(missing_ok=True)
+            raise RuntimeError("O banco foi alterado durante a compactação; rode com o app parado.")
+        with open(target, "rb+") as fh:
+            os.fsync(fh.fileno())
+        os.replace(target, path)
+        for suffix in ("-wal", "-shm"):
+            Path(str(path) + suffix).unlink(missing_ok=True)
+    return {"bytes_before": before, "bytes_after": after}
+
+
+# ============================================================
+# STATUS E CLI
+# ============================================================
+
+
+def archive_status(db_path: Path) -> List[Dict[str, object]]:
+    """
+    Um item por ano arquivado: arquivo, tamanho e linhas por tabela.
+    """
+    result = []
+    for year, path in archive_files(db_path):
+        conn = database.get_connection(path, readonly=True)
+        try:
+            tables = {row["name"] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table';")}
+            counts = {
+                t: conn.execute(f"SELECT COUNT(*) AS n FROM {t};").fetchone()["n"] for t in ARCHIVED_TABLES if t in tables
+            }
+        finally:
+            conn.close()
+        result.append({"year": year, "file": path.name, "size_bytes": path.stat().st_size, "rows": counts})
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m modules.archive")
+    parser.add_argument("command", choices=("run", "status", "compact"))
+    parser.add_argument("--before", help="dia local de corte, exclusivo (padrão: ARCHIVE_KEEP_YEARS)")
+    parser.add_argument("--company-id", type=int)
+    parser.add_argument("--batch-size", type=int)
+    parser.add_argument("--compact", action="store_true", help="compacta o banco depois (app parado)")
+    args = parser.parse_args(argv)
+
+    database.init_db()
+    if args.company_id is not None:
+        paths = [database.db_path(args.company_id)]
+    else:
+        paths = databases()
+
+    if args.command == "run":
+        before = args.before or default_cutoff()
+        companies = None if args.company_id is None else [args.company_id]
+        for path in paths:
+            moved = archive_database(path, before, companies, args.batch_size)
+            for year, counts in moved.items():
+                detail = ", ".join(f"{t}={n}" for t, n in counts.items() if n)
+                print(f"{path.name} {year}: {detail} -> {archive_path(path, year).name}")
+            if not moved:
+                print(f"{path.name}: nada anterior a {before} para arquivar.")
+    elif args.command == "status":
+        for path in paths:
+            items = archive_status(path)
+            if not items:
+                print(f"{path.name}: nenhum ano arquivado.")
+            for item in items:
+                rows = sum(item["rows"].values())  # type: ignore[union-attr]
+                print(f"{item['file']:<28} {item['size_bytes'] / 1024:10.1f} KB  {rows:>10} linha(s)")
+
+    if args.command == "compact" or args.compact:
+        # Com sharding, databases() traz só os shards; o principal (users, companies e o
+        # legado pré-split) também precisa de VACUUM.
+        if args.company_id is None:
+            paths = list(dict.fromkeys([Path(config.SQLITE_DB_PATH), *paths]))
+        for path in paths:
+            sizes = compact(path)
+            print(
+                f"{path.name}: {sizes['bytes_before'] / 1e6:.1f} MB -> {sizes['bytes_after'] / 1e6:.1f} MB (VACUUM INTO)"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
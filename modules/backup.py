@@ -0,0 +1,384 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\modules\backup.py
+# Último recode: 2026-10-18 04:50 (America/Bahia)
+# Motivo: Backup online do SQLite com a API de backup (poucas páginas por passo, com pausa entre
+#         passos para não segurar os writers), saída .gz com SHA-256, registro em backups,
+#         retenção por BACKUP_RETENTION_DAYS e restauração verificada. O conjunto inclui os shards
+#         (SQLITE_SHARDING) e os anos arquivados (modules/archive.py), listados num manifesto; a
+#         restauração no banco vivo exige o app parado (lock exclusivo em cada arquivo).
+#
+# Uso (CLI): python -m modules.backup create
+#            python -m modules.backup list
+#            python -m modules.backup prune
+#            python -m modules.backup restore ARQUIVO.db.gz [--target CAMINHO.db] [--verify-only]
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import config
+import database
+from modules import archive
+
+_CHUNK = 1024 * 1024
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _online_copy(source: Path, target: Path, pages_per_step: int, step_sleep: float) -> None:
+    """
+    Copia o banco vivo `source` para `target` em passos de `pages_per_step` páginas.
+    A conexão de origem mantém uma transação de leitura aberta: em WAL isso fixa um snapshot
+    consistente (writers continuam livres) e evita que o backup recomece a cada escrita.
+    """
+    src = database.get_connection(source, readonly=True)
+    dst = sqlite3.connect(str(target))
+    try:
+        src.execute("BEGIN;")
+        src.execute("SELECT 1 FROM sqlite_master LIMIT 1;").fetchone()
+
+        def _progress(status: int, remaining: int, total: int) -> None:
+            if remaining and step_sleep > 0:
+                time.sleep(step_sleep)
+
+        src.backup(dst, pages=pages_per_step, progress=_progress)
+    finally:
+        dst.close()
+        if src.in_transaction:
+            src.rollback()
+        src.close()
+
+
+def _compress(raw: Path, target: Path) -> None:
+    tmp = target.with_suffix(target.suffix + ".tmp")
+    with open(raw, "rb") as fin, gzip.open(tmp, "wb", compresslevel=6) as fout:
+        shutil.copyfileobj(fin, fout, _CHUNK)
+    os.replace(tmp, target)
+
+
+def _manifest_path(file_name: str) -> Path:
+    return Path(config.BACKUP_DIR) / f"{file_name}.parts.json"
+
+
+def _data_files() -> List[Dict[str, Any]]:
+    """
+    Arquivos de dados além do banco principal: shards e anos arquivados (do principal e de
+    cada shard). `owner` é o nome do banco dono do arquivo ("" para o principal).
+    """
+    main = Path(config.SQLITE_DB_PATH)
+    shards = database.shard_paths()
+    files = [{"kind": "shard", "owner": "", "name": p.name, "path": p} for p in shards]
+    for owner in [main, *shards]:
+        for _, path in archive.archive_files(owner):
+            files.append(
+                {"kind": "archive", "owner": "" if owner == main else owner.name, "name": path.name, "path": path}
+            )
+    return files
+
+
+def _destination(part: Dict[str, Any], main_path: Path, live: bool) -> Path:
+    """
+    Onde restaurar uma parte: nos caminhos configurados (banco vivo) ou, com --target,
+    ao lado do banco novo (shards/ e archive/ na mesma pasta).
+    """
+    shard_dir = Path(config.SQLITE_SHARD_DIR) if live else main_path.parent / "shards"
+    if part["kind"] == "shard":
+        return shard_dir / part["name"]
+    owner = shard_dir / part["owner"] if part["owner"] else main_path
+    folder = archive.archive_dir(owner) if live else owner.parent / "archive"
+    return folder / part["name"]
+
+
+def create_backup(
+    pages_per_step: Optional[int] = None,
+    step_sleep: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Gera BACKUP_DIR/gestflow-AAAAMMDD-HHMMSS.db.gz, registra em backups (uma linha por empresa,
+    todas apontando para o mesmo arquivo) e aplica a retenção. Retorna os dados do arquivo.
+    Shards e anos arquivados viram partes (<nome>.<tipo>-<arquivo>.db.gz) listadas, com o
+    SHA-256 de cada uma, em <nome>.parts.json. Cada arquivo é um snapshot próprio.
+    """
+    pages_per_step = pages_per_step or config.BACKUP_PAGES_PER_STEP
+    step_sleep = config.BACKUP_STEP_SLEEP_MS / 1000.0 if step_sleep is None else step_sleep
+
+    database.init_db()
+    backup_dir = Path(config.BACKUP_DIR)
+    backup_dir.mkdir(parents=True, exist_ok=True)
+
+    now = datetime.now(timezone.utc)
+    stem = f"gestflow-{now.strftime('%Y%m%d-%H%M%S')}"
+    file_name = f"{stem}.db.gz"
+    target = backup_dir / file_name
+
+    parts: List[Dict[str, Any]] = []
+    copy_seconds = 0.0
+    with tempfile.TemporaryDirectory(dir=str(backup_dir), prefix=".backup-") as tmp:
+        raw = Path(tmp) / "snapshot.db"
+        started = time.perf_counter()
+        _online_copy(Path(config.SQLITE_DB_PATH), raw, pages_per_step, step_sleep)
+        copy_seconds += time.perf_counter() - started
+        _compress(raw, target)
+        raw.unlink()
+
+        for item in _data_files():
+            part_name = f"{stem}.{item['kind']}-{Path(item['name']).stem}.db.gz"
+            raw = Path(tmp) / item["name"]
+            started = time.perf_counter()
+            _online_copy(item["path"], raw, pages_per_step, step_sleep)
+            copy_seconds += time.perf_counter() - started
+            _compress(raw, backup_dir / part_name)
+            raw.unlink()
+            parts.append(
+                {
+                    "file": part_name,
+                    "kind": item["kind"],
+                    "owner": item["owner"],
+                    "name": item["name"],
+                    "sha256": _sha256(backup_dir / part_name),
+                }
+            )
+
+    if parts:
+        _manifest_path(file_name).write_text(json.dumps(parts, indent=1), encoding="utf-8")
+    checksum = _sha256(target)
+    size = target.stat().st_size + sum((backup_dir / p["file"]).stat().st_size for p in parts)
+    (backup_dir / f"{file_name}.sha256").write_text(f"{checksum}  {file_name}\n", encoding="utf-8")
+
+    companies = database.fetch_all("SELECT id FROM companies;")
+    database.execute_many(
+        "INSERT INTO backups (company_id, backup_date, file_name, created_at, size_bytes, sha256) VALUES (?, ?, ?, ?, ?, ?);",
+        [(c["id"], now.strftime("%Y-%m-%d"), file_name, database.utc_iso(), size, checksum) for c in companies],
+    )
+    prune_backups()
+    return {
+        "file_name": file_name,
+        "path": target,
+        "size_bytes": size,
+        "sha256": checksum,
+        "copy_seconds": copy_seconds,
+        "parts": len(parts),
+    }
+
+
+def list_backups() -> List[Dict[str, Any]]:
+    return database.fetch_all(
+        "SELECT file_name, backup_date, MAX(size_bytes) AS size_bytes, MAX(sha256) AS sha256, MIN(created_at) AS created_at "
+        "FROM backups GROUP BY file_name ORDER BY created_at DESC;"
+    )
+
+
+def prune_backups(retention_days: Optional[int] = None) -> List[str]:
+    """
+    Apaga arquivos e linhas de backups mais antigos que a retenção. Retorna os arquivos removidos.
+    """
+    retention_days = config.BACKUP_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    expired = [
+        r["file_name"]
+        for r in database.fetch_all("SELECT DISTINCT file_name FROM backups WHERE created_at < ?;", (cutoff,))
+    ]
+    backup_dir = Path(config.BACKUP_DIR)
+    for name in expired:
+        paths = [backup_dir / p["file"] for p in _read_manifest(name)]
+        paths += [backup_dir / name, backup_dir / f"{name}.sha256", _manifest_path(name)]
+        for path in paths:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+    if expired:
+        database.execute("DELETE FROM backups WHERE created_at < ?;", (cutoff,))
+    return expired
+
+
+def _read_manifest(file_name: str) -> List[Dict[str, Any]]:
+    path = _manifest_path(file_name)
+    if not path.exists():
+        return []
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _expected_checksum(file_name: str) -> Optional[str]:
+    row = database.fetch_one("SELECT sha256 FROM backups WHERE file_name=? AND sha256 IS NOT NULL LIMIT 1;", (file_name,))
+    if row:
+        return row["sha256"]
+    sidecar = Path(config.BACKUP_DIR) / f"{file_name}.sha256"
+    if sidecar.exists():
+        return sidecar.read_text(encoding="utf-8").split()[0]
+    return None
+
+
+def _unpack(file_name: str, expected: str, restored: Path) -> Path:
+    source = Path(config.BACKUP_DIR) / file_name
+    if not source.exists():
+        raise ValueError(f"Backup não encontrado: {source}")
+    actual = _sha256(source)
+    if actual != expected:
+        raise ValueError(f"Checksum não confere para {file_name}: esperado {expected}, obtido {actual}.")
+
+    with gzip.open(source, "rb") as fin, open(restored, "wb") as fout:
+        shutil.copyfileobj(fin, fout, _CHUNK)
+
+    conn = sqlite3.connect(str(restored))
+    try:
+        result = conn.execute("PRAGMA integrity_check;").fetchone()[0]
+    finally:
+        conn.close()
+    if result != "ok":
+        raise ValueError(f"integrity_check falhou para {file_name}: {result}")
+    return restored
+
+
+def _verify_all(file_name: str, workdir: Path) -> Tuple[Path, List[Tuple[Dict[str, Any], Path]]]:
+    if not (Path(config.BACKUP_DIR) / file_name).exists():
+        raise ValueError(f"Backup não encontrado: {Path(config.BACKUP_DIR) / file_name}")
+    expected = _expected_checksum(file_name)
+    if expected is None:
+        raise ValueError(f"Checksum de {file_name} não encontrado (nem em backups nem no .sha256).")
+    restored = _unpack(file_name, expected, workdir / "restore.db")
+
+    parts = []
+    for part in _read_manifest(file_name):
+        parts.append((part, _unpack(part["file"], part["sha256"], workdir / part["file"][: -len(".gz")])))
+    return restored, parts
+
+
+def verify_backup(file_name: str, workdir: Path) -> Path:
+    """
+    Confere o SHA-256 do .gz (e de cada parte do manifesto), descompacta em `workdir` e roda
+    integrity_check. Retorna o caminho do banco principal descompactado; levanta ValueError
+    se algo não bater.
+    """
+    return _verify_all(file_name, workdir)[0]
+
+
+@contextmanager
+def _exclusive(paths: Iterable[Path]) -> Iterator[Dict[Path, sqlite3.Connection]]:
+    """
+    Conexões com lock exclusivo em cada arquivo. Em WAL, qualquer outra conexão aberta (mesmo
+    ociosa, de outro processo) impede o lock: é a garantia de que o app está parado e de que
+    ninguém grava no arquivo enquanto ele é substituído.
+    """
+    held: Dict[Path, sqlite3.Connection] = {}
+    try:
+        for path in paths:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(path), timeout=0, isolation_level=None)
+            held[path] = conn
+            conn.execute("PRAGMA locking_mode = EXCLUSIVE;")
+            try:
+                conn.execute("BEGIN EXCLUSIVE;")
+                conn.execute("COMMIT;")
+            except sqlite3.OperationalError as exc:
+                raise RuntimeError(f"{path} está em uso; pare o app antes de restaurar.") from exc
+        yield held
+    finally:
+        for conn in held.values():
+            conn.close()
+
+
+def restore_backup(file_name: str, target: Optional[Path] = None) -> Path:
+    """
+    Restaura um backup verificado. Com `target`, grava um banco novo nesse caminho (partes em
+    shards/ e archive/ ao lado). Sem `target`, sobrescreve o banco vivo, os shards e os anos
+    arquivados pela API de backup; exige o app parado (lock exclusivo em todos os arquivos).
+    Shards/anos que existem hoje mas não estão no backup são renomeados para *.pre-restore,
+    para não duplicar histórico.
+    """
+    backup_dir = Path(config.BACKUP_DIR)
+    # O histórico de backups é posterior ao snapshot restaurado: preserva para reinserir.
+    history = database.fetch_all(
+        "SELECT company_id, backup_date, file_name, created_at, size_bytes, sha256 FROM backups;"
+    ) if target is None else []
+
+    with tempfile.TemporaryDirectory(dir=str(backup_dir), prefix=".restore-") as tmp:
+        restored, parts = _verify_all(file_name, Path(tmp))
+        live = target is None
+        main_path = Path(config.SQLITE_DB_PATH) if live else Path(target)
+        plan = [(restored, main_path)] + [(path, _destination(part, main_path, live)) for part, path in parts]
+
+        stale: List[Path] = []
+        if live:
+            database.close_pool()
+            wanted = {dst for _, dst in plan}
+            stale = [f["path"] for f in _data_files() if f["path"] not in wanted]
+
+        with _exclusive([dst for _, dst in plan] + stale) as held:
+            for src_path, dst_path in plan:
+                src = sqlite3.connect(str(src_path))
+                try:
+                    src.backup(held[dst_path])
+                finally:
+                    src.close()
+        for path in stale:
+            os.replace(path, path.with_name(path.name + ".pre-restore"))
+
+    if target is None:
+        database.close_pool()
+        database.init_db()
+        known = {(r["company_id"], r["file_name"]) for r in database.fetch_all("SELECT company_id, file_name FROM backups;")}
+        database.execute_many(
+            "INSERT INTO backups (company_id, backup_date, file_name, created_at, size_bytes, sha256) VALUES (?, ?, ?, ?, ?, ?);",
+            [
+                (r["company_id"], r["backup_date"], r["file_name"], r["created_at"], r["size_bytes"], r["sha256"])
+                for r in history
+                if (r["company_id"], r["file_name"]) not in known
+            ],
+        )
+        return Path(config.SQLITE_DB_PATH)
+    return target
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m modules.backup")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("create")
+    sub.add_parser("list")
+    sub.add_parser("prune")
+    p_restore = sub.add_parser("restore")
+    p_restore.add_argument("file_name")
+    p_restore.add_argument("--target", type=Path, default=None)
+    p_restore.add_argument("--verify-only", action="store_true")
+    args = parser.parse_args(argv)
+
+    database.init_db()
+    if args.command == "create":
+        info = create_backup()
+        extra = f", {info['parts']} parte(s) em {info['file_name']}.parts.json" if info["parts"] else ""
+        print(f"{info['file_name']} ({info['size_bytes']} bytes, sha256 {info['sha256']}{extra})")
+    elif args.command == "list":
+        for row in list_backups():
+            print(f"{row['created_at']}  {row['file_name']}  {row['size_bytes']} bytes")
+    elif args.command == "prune":
+        removed = prune_backups()
+        print(f"{len(removed)} backup(s) removido(s).")
+    elif args.verify_only:
+        with tempfile.TemporaryDirectory() as tmp:
+            verify_backup(args.file_name, Path(tmp))
+        print(f"{args.file_name}: checksum e integrity_check OK.")
+    else:
+        restored = restore_backup(args.file_name, args.target)
+        print(f"Backup {args.file_name} restaurado em {restored}.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,160 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\modules\catalog_search.py
+# Último recode: 2026-10-17 20:15 (America/Bahia)
+# Motivo: Busca de produtos/serviços por texto livre do WhatsApp ("cimento 50kg") sobre o
+#         índice FTS5 catalog_fts (sem acentos, ranqueado por bm25), e autocomplete por prefixo
+#         servido de um cache em memória por empresa.
+
+from __future__ import annotations
+
+import bisect
+import re
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import config
+import database
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Pesos do bm25 por coluna (name, code, scope): código exato pesa mais que nome.
+_SEARCH_SQL = """
+    SELECT f.item_type, f.item_id, f.name, f.code,
+           COALESCE(p.price_sale, s.price_sale) AS price_sale,
+           bm25(catalog_fts, 5.0, 10.0, 0.0) AS score
+    FROM catalog_fts f
+    LEFT JOIN products p ON f.item_type = 'product' AND p.id = f.item_id
+    LEFT JOIN services s ON f.item_type = 'service' AND s.id = f.item_id
+    WHERE catalog_fts MATCH ?
+    ORDER BY score
+    LIMIT ?;
+"""
+
+
+def fold(text: str) -> str:
+    """
+    Minúsculas e sem acentos ("Ação" -> "acao"), como o tokenizer do FTS5.
+    """
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(fold(text))
+
+
+def build_match(company_id: int, text: str) -> Optional[str]:
+    """
+    Expressão MATCH: todos os termos (como prefixo) em name/code, restrita à empresa.
+    Os termos vão entre aspas, então nenhum caractere do usuário vira operador FTS5.
+    """
+    tokens = tokenize(text)
+    if not tokens:
+        return None
+    terms = " AND ".join(f'"{t}"*' for t in tokens)
+    return f"scope : c{int(company_id)} AND {{name code}} : ({terms})"
+
+
+def search(company_id: int, text: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """
+    Itens ativos da empresa que casam com o texto, do mais relevante para o menos.
+    """
+    match = build_match(company_id, text)
+    if match is None:
+        return []
+    return database.fetch_all(_SEARCH_SQL, (match, limit))
+
+
+# ============================================================
+# AUTOCOMPLETE (CACHE EM MEMÓRIA POR EMPRESA)
+# ============================================================
+
+
+class _CompanyIndex:
+    """
+    Lista ordenada de (palavra, posição do item): um bisect acha todas as palavras
+    que começam com o prefixo digitado.
+    """
+
+    __slots__ = ("items", "words", "keys", "loaded_at")
+
+    def __init__(self, items: List[Dict[str, Any]]) -> None:
+        self.items = items
+        pairs: List[Tuple[str, int]] = []
+        for idx, item in enumerate(items):
+            for word in set(tokenize(f"{item['name']} {item['code']}")):
+                pairs.append((word, idx))
+        pairs.sort()
+        self.words = pairs
+        self.keys = [w for w, _ in pairs]
+        self.loaded_at = time.monotonic()
+
+    def _with_prefix(self, prefix: str) -> Set[int]:
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + "\uffff")
+        return {idx for _, idx in self.words[lo:hi]}
+
+    def complete(self, text: str, limit: int) -> List[Dict[str, Any]]:
+        tokens = tokenize(text)
+        if not tokens:
+            return []
+        # Começa pelo termo mais seletivo (mais longo) para encolher a interseção cedo.
+        tokens.sort(key=len, reverse=True)
+        matches = self._with_prefix(tokens[0])
+        for token in tokens[1:]:
+            if not matches:
+                break
+            matches &= self._with_prefix(token)
+        ordered = sorted(matches, key=lambda i: (len(self.items[i]["name"]), self.items[i]["name"]))
+        return [self.items[i] for i in ordered[:limit]]
+
+
+class CatalogAutocomplete:
+    def __init__(self, ttl_seconds: float = 60.0, max_companies: int = 50) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_companies = max_companies
+        self._indexes: Dict[int, _CompanyIndex] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, company_id: int) -> _CompanyIndex:
+        items = database.fetch_all(
+            "SELECT item_type, item_id, name, code FROM catalog_fts WHERE scope MATCH ?;",
+            (f"c{int(company_id)}",),
+        )
+        return _CompanyIndex(items)
+
+    def complete(self, company_id: int, text: str, limit: int = 8) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            index = self._indexes.get(company_id)
+        if index is None or now - index.loaded_at > self.ttl_seconds:
+            index = self._load(company_id)
+            with self._lock:
+                self._indexes[company_id] = index
+                if len(self._indexes) > self.max_companies:
+                    oldest = min(self._indexes, key=lambda k: self._indexes[k].loaded_at)
+                    self._indexes.pop(oldest, None)
+        return index.complete(text, limit)
+
+    def invalidate(self, company_id: Optional[int] = None) -> None:
+        """
+        Descarta o cache (de uma empresa ou de todas) após alterar o catálogo.
+        """
+        with self._lock:
+            if company_id is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(company_id, None)
+
+
+_autocomplete: Optional[CatalogAutocomplete] = None
+_autocomplete_lock = threading.Lock()
+
+
+def get_autocomplete() -> CatalogAutocomplete:
+    global _autocomplete
+    with _autocomplete_lock:
+        if _autocomplete is None:
+            _autocomplete = CatalogAutocomplete(ttl_seconds=config.CATALOG_CACHE_TTL_SECONDS)
+        return _autocomplete
@@ -0,0 +1,225 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\modules\commands.py
+# Último recode: 2026-10-18 02:30 (America/Bahia)
+# Motivo: Gramática dos comandos do WhatsApp compilada uma vez no import: trie de palavras-chave
+#         (sem acento/maiúsculas) + regex pré-compilada dos argumentos de cada comando.
+#         parse() não toca no banco; o roteamento por estado fica em modules/flows.py.
+
+from __future__ import annotations
+
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from modules.catalog_search import fold
+
+# Argumentos reaproveitados pela gramática.
+_QTY = r"(?P<qty>\d+(?:[.,]\d+)?)"
+_QTY_CODE = _QTY + r"\s*(?:x\s+|x(?=\D)|un\s+|und\s+)?(?P<code>.+)"
+_AMOUNT = r"(?:r\$\s*)?(?P<amount>\d[\d.,]*)"
+
+# Forma de pagamento dita no WhatsApp -> payments.method.
+PAYMENT_METHODS = {
+    "pix": "pix",
+    "dinheiro": "cash",
+    "especie": "cash",
+    "cartao": "card",
+    "credito": "card",
+    "debito": "card",
+    "transferencia": "transfer",
+    "ted": "transfer",
+    "doc": "transfer",
+}
+
+REPORT_PERIODS = {"hoje": "today", "ontem": "yesterday", "semana": "week", "mes": "month"}
+
+# (comando, palavras-chave, regex dos argumentos). As palavras-chave já vão na forma
+# normalizada; com várias palavras ("novo orcamento") vence a mais longa que casar.
+# Sem regex, o comando não aceita argumentos.
+GRAMMAR: List[Tuple[str, Tuple[str, ...], Optional[str]]] = [
+    ("menu", ("menu", "ajuda", "help", "oi", "ola", "inicio", "comandos", "?"), None),
+    ("cancel", ("cancelar", "cancela", "sair", "parar", "voltar"), None),
+    ("confirm", ("confirmar", "confirma", "sim", "ok", "fechar", "finalizar"), None),
+    ("deny", ("nao", "n"), None),
+    ("budget_new", ("orcamento", "orc", "novo orcamento", "fazer orcamento"), None),
+    ("sale_new", ("venda", "vender", "nova venda"), None),
+    ("customer", ("cliente", "para"), r"(?P<name>.+)"),
+    ("item_add", ("item", "add", "adicionar", "incluir", "+"), _QTY_CODE),
+    ("item_remove", ("remover", "tirar", "excluir", "-"), r"(?P<code>.+)"),
+    ("items", ("itens", "carrinho", "lista"), None),
+    ("stock_in", ("entrada", "entrou", "comprei", "repor"), _QTY_CODE),
+    ("stock_out", ("saida", "saiu", "baixa", "perda"), _QTY_CODE),
+    ("stock_query", ("estoque", "saldo"), r"(?P<code>.+)?"),
+    (
+        "payment",
+        ("recebi", "recebimento", "pagamento", "pago"),
+        _AMOUNT + r"(?:\s+(?:no\s+|em\s+|via\s+)?(?P<method>" + "|".join(PAYMENT_METHODS) + r"))?"
+        r"(?:\s+(?:da\s+|venda\s+|ref\s+)?(?P<ref>\S+))?",
+    ),
+    ("report", ("relatorio", "rel", "resumo", "vendas"), r"(?:de\s+|do\s+|da\s+)?(?P<period>" + "|".join(REPORT_PERIODS) + r")?"),
+    ("receivables", ("receber", "a receber", "vencidos", "devedores"), None),
+    ("search", ("buscar", "busca", "preco", "procurar", "produto"), r"(?P<query>.+)"),
+]
+
+# Mensagens sem palavra-chave: "2 cimento" (item implícito) ou só um número (opção do menu).
+_IMPLICIT_ITEM_RE = re.compile(_QTY_CODE + r"$")
+_NUMBER_RE = re.compile(r"(?P<value>\d{1,3})$")
+
+# "1.500", "12.345.678": milhar com ponto (sem vírgula decimal).
+_THOUSANDS_RE = re.compile(r"\d{1,3}(?:\.\d{3})+")
+
+_PUNCT_RE = re.compile(r"[!?¿¡;:\"'()\[\]{}*_~]+")
+_SPACE_RE = re.compile(r"\s+")
+_PREFIX_RE = re.compile(r"^[/#\s]+")
+
+
+class Command:
+    """
+    Resultado do parse: nome do comando, argumentos já convertidos e o texto normalizado.
+    name == "unknown" quando nada casou (args["text"] guarda o texto).
+    """
+
+    __slots__ = ("name", "args", "text")
+
+    def __init__(self, name: str, args: Dict[str, Any], text: str) -> None:
+        self.name = name
+        self.args = args
+        self.text = text
+
+    def __repr__(self) -> str:
+        return f"Command({self.name!r}, {self.args!r})"
+
+
+def _clean(text: str) -> str:
+    # Pontuação sai antes do prefixo: "(/menu" e "/ /menu" também viram "menu".
+    text = _PREFIX_RE.sub("", _PUNCT_RE.sub(" ", text))
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def normalize(text: str) -> str:
+    """
+    Sem acentos, minúsculas, sem pontuação solta e espaços colapsados ("Orçamento!" -> "orcamento").
+    "?" sozinho é mantido (atalho do menu).
+    """
+    folded = fold(text or "").strip()
+    if folded == "?":
+        return folded
+    return _clean(folded)
+
+
+def parse_number(raw: str) -> float:
+    """
+    "2" -> 2.0; "2,5" -> 2.5; "1.234,50" -> 1234.5; "1234.50" -> 1234.5; "1.500" -> 1500.0.
+    Sem vírgula, pontos seguidos de exatamente três dígitos são milhar (pt-BR).
+    """
+    text = raw.strip().rstrip(".,")
+    if "," in text:
+        text = text.replace(".", "").replace(",", ".")
+    elif _THOUSANDS_RE.fullmatch(text):
+        text = text.replace(".", "")
+    return float(text)
+
+
+# ============================================================
+# COMPILAÇÃO (UMA VEZ, NO IMPORT)
+# ============================================================
+
+_Node = Dict[str, Any]
+_END = "\x00"  # chave do comando no nó da trie (nunca aparece em um token)
+
+
+def _converters() -> Dict[str, Callable[[str], Any]]:
+    return {
+        "qty": parse_number,
+        "amount": parse_number,
+        "method": PAYMENT_METHODS.__getitem__,
+        "period": REPORT_PERIODS.__getitem__,
+        "code": lambda v: v.strip().upper(),
+        "name": str.strip,
+        "query": str.strip,
+        "ref": lambda v: v.strip().upper(),
+    }
+
+
+def _compile(grammar: List[Tuple[str, Tuple[str, ...], Optional[str]]]) -> _Node:
+    trie: _Node = {}
+    for name, keywords, pattern in grammar:
+        regex = re.compile(pattern + r"$") if pattern else None
+        for keyword in keywords:
+            node = trie
+            for token in keyword.split():
+                node = node.setdefault(token, {})
+            if _END in node:
+                raise ValueError(f"Palavra-chave duplicada na gramática: {keyword!r}")
+            node[_END] = (name, regex)
+    return trie
+
+
+# Argumentos que guardam o texto como foi digitado (acentos e maiúsculas do nome do cliente).
+_RAW_ARGS = ("name",)
+
+_TRIE = _compile(GRAMMAR)
+_CONVERT = _converters()
+COMMAND_NAMES = tuple(dict.fromkeys(name for name, _, _ in GRAMMAR)) + ("item_implicit", "number", "unknown")
+
+
+def _convert(groups: Dict[str, Optional[str]]) -> Dict[str, Any]:
+    args: Dict[str, Any] = {}
+    for key, value in groups.items():
+        if value is None:
+            continue
+        args[key] = _CONVERT[key](value)
+    return args
+
+
+def parse(text: str) -> Command:
+    """
+    Texto livre -> Command. Custo proporcional ao número de palavras da palavra-chave
+    (no máximo 3 consultas a dict) mais uma regex já compilada nos argumentos.
+    """
+    norm = normalize(text)
+    tokens = norm.split(" ") if norm else []
+
+    # Palavra-chave mais longa que casar com o começo da mensagem.
+    node = _TRIE
+    match: Optional[Tuple[str, Optional["re.Pattern[str]"]]] = None
+    consumed = 0
+    for idx, token in enumerate(tokens):
+        node = node.get(token)  # type: ignore[assignment]
+        if node is None:
+            break
+        if _END in node:
+            match, consumed = node[_END], idx + 1
+
+    if match is not None:
+        name, regex = match
+        rest = " ".join(tokens[consumed:])
+        if regex is None:
+            if not rest:
+                return Command(name, {}, norm)
+        else:
+            found = regex.match(rest)
+            if found is not None:
+                try:
+                    args = _convert(found.groupdict())
+                except (ValueError, KeyError):
+                    args = None
+                if args is not None:
+                    raw = [k for k in _RAW_ARGS if k in args]
+                    if raw:
+                        original = _clean(text or "").split(" ")
+                        # Mesma quantidade de palavras: dá para recortar o trecho original.
+                        if len(original) == len(tokens):
+                            for key in raw:
+                                args[key] = " ".join(original[consumed:])
+                    return Command(name, args, norm)
+        return Command("unknown", {"text": norm, "near": name}, norm)
+
+    found = _NUMBER_RE.match(norm)
+    if found is not None:
+        return Command("number", {"value": int(found.group("value"))}, norm)
+    found = _IMPLICIT_ITEM_RE.match(norm)
+    if found is not None:
+        try:
+            return Command("item_implicit", _convert(found.groupdict()), norm)
+        except ValueError:
+            pass
+    return Command("unknown", {"text": norm}, norm)
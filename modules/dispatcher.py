@@ -0,0 +1,197 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\modules\dispatcher.py
+# Último recode: 2026-10-18 04:30 (America/Bahia)
+# Motivo: Despacho por remetente: mensagens do mesmo número são processadas em ordem (uma por vez),
+#         remetentes diferentes em paralelo, com rodízio justo entre remetentes e limite de taxa
+#         (token bucket) por remetente.
+
+from __future__ import annotations
+
+import atexit
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import config
+
+# Motivos de recusa em DispatchRejected.reason
+QUEUE_FULL = "queue_full"
+SENDER_QUEUE_FULL = "sender_queue_full"
+RATE_LIMITED = "rate_limited"
+STOPPED = "stopped"
+
+# Recusas causadas pelo próprio remetente (as demais são falta de capacidade do servidor).
+SENDER_REJECTIONS = (SENDER_QUEUE_FULL, RATE_LIMITED)
+
+_Task = Tuple[Future, Callable[..., Any], Tuple[Any, ...], Dict[str, Any]]
+
+
+class DispatchRejected(Exception):
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+class KeyedDispatcher:
+    """
+    Uma fila por chave (remetente) e uma fila de chaves prontas compartilhada pelos workers.
+    Enquanto uma chave está sendo processada ela sai da fila de prontas, então nunca há
+    duas mensagens do mesmo remetente rodando ao mesmo tempo. Cada worker processa uma
+    mensagem e devolve a chave para o fim da fila (rodízio), de modo que um remetente
+    com muitas mensagens não monopoliza os workers.
+    """
+
+    def __init__(
+        self,
+        workers: int = 8,
+        max_pending: int = 200,
+        max_pending_per_key: int = 20,
+        rate_per_second: float = 0.5,
+        burst: int = 10,
+    ) -> None:
+        self.max_pending = max_pending
+        self.max_pending_per_key = max_pending_per_key
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+
+        self._cond = threading.Condition()
+        self._queues: Dict[str, Deque[_Task]] = {}
+        self._ready: Deque[str] = deque()
+        self._pending = 0
+        self._stopped = False
+        # chave -> (tokens, último instante de recarga)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._submits = 0
+
+        self._threads: List[threading.Thread] = []
+        for i in range(workers):
+            t = threading.Thread(target=self._run, name=f"gestflow-dispatch-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    @property
+    def depth(self) -> int:
+        return self._pending
+
+    def submit(self, key: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """
+        Enfileira fn(*args, **kwargs) para a chave. Levanta DispatchRejected se não couber.
+        """
+        future: Future = Future()
+        with self._cond:
+            if self._stopped:
+                raise DispatchRejected(STOPPED)
+            if self._pending >= self.max_pending:
+                raise DispatchRejected(QUEUE_FULL)
+            queue_ = self._queues.get(key)
+            if queue_ is not None and len(queue_) >= self.max_pending_per_key:
+                raise DispatchRejected(SENDER_QUEUE_FULL)
+            if not self._take_token(key):
+                raise DispatchRejected(RATE_LIMITED)
+
+            if queue_ is None:
+                # Chave ociosa: passa a ter trabalho e entra na fila de prontas.
+                queue_ = deque()
+                self._queues[key] = queue_
+                self._ready.append(key)
+            queue_.append((future, fn, args, kwargs))
+            self._pending += 1
+            self._cond.notify()
+        return future
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """
+        Para de aceitar mensagens, termina as pendentes e encerra os workers.
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=timeout)
+
+    def _take_token(self, key: str) -> bool:
+        if self.rate_per_second <= 0:
+            return True
+        now = time.monotonic()
+        tokens, last = self._buckets.get(key, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - last) * self.rate_per_second)
+        if tokens < 1.0:
+            self._buckets[key] = (tokens, now)
+            return False
+        self._buckets[key] = (tokens - 1.0, now)
+
+        self._submits += 1
+        if self._submits % 1000 == 0:
+            self._prune_buckets(now)
+        return True
+
+    def _prune_buckets(self, now: float) -> None:
+        # Buckets que já recarregaram por completo equivalem a um bucket novo.
+        full_after = self.burst / self.rate_per_second
+        for k in [k for k, (_, last) in self._buckets.items() if now - last >= full_after]:
+            del self._buckets[k]
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._ready and not (self._stopped and self._pending == 0):
+                    self._cond.wait()
+                if not self._ready:
+                    return
+                key = self._ready.popleft()
+                future, fn, args, kwargs = self._queues[key].popleft()
+
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as exc:
+                    future.set_exception(exc)
+
+            with self._cond:
+                self._pending -= 1
+                if self._queues[key]:
+                    self._ready.append(key)
+                    self._cond.notify()
+                else:
+                    del self._queues[key]
+                if self._stopped and self._pending == 0:
+                    self._cond.notify_all()
+
+
+_dispatcher: Optional[KeyedDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> KeyedDispatcher:
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = KeyedDispatcher(
+                workers=config.DISPATCH_WORKERS,
+                max_pending=config.DISPATCH_MAX_PENDING,
+                max_pending_per_key=config.DISPATCH_MAX_PENDING_PER_SENDER,
+                rate_per_second=config.SENDER_RATE_PER_MINUTE / 60.0,
+                burst=config.SENDER_BURST,
+            )
+        return _dispatcher
+
+
+def run_ordered(key: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Executa fn na vez da chave e espera o resultado (usado pelo webhook síncrono).
+    Qualquer recusa (fila global cheia, fila do remetente cheia, taxa) propaga
+    DispatchRejected: rodar fn fora da fila quebraria a ordem por remetente.
+    """
+    return get_dispatcher().submit(key, fn, *args, **kwargs).result()
+
+
+def shutdown_dispatcher() -> None:
+    global _dispatcher
+    with _dispatcher_lock:
+        dispatcher, _dispatcher = _dispatcher, None
+    if dispatcher is not None:
+        dispatcher.shutdown()
+
+
+atexit.register(shutdown_dispatcher)
@@ -0,0 +1,340 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\modules\exports.py
+# Último recode: 2026-10-18 03:20 (America/Bahia)
+# Motivo: Exportações para a contabilidade (vendas, itens de venda, pagamentos e movimentos
+#         de estoque) por empresa e período, em CSV ou NDJSON, lidas em lotes de um cursor
+#         e enviadas em streaming (gzip aplicado conforme os bytes saem). Memória constante
+#         e leitura de um snapshot único, com as escritas seguindo normalmente. Períodos que
+#         alcançam anos arquivados leem também os arquivos anuais (modules/archive.py).
+#
+# Uso (CLI):
+#   python -m modules.exports sales --company-id 1 --start 2026-10-01 --end 2026-10-31 > vendas.csv
+#   python -m modules.exports payments --company-id 1 --format ndjson --gzip -o pagamentos.ndjson.gz
+#   python -m modules.exports all --company-id 1 --start 2026-01-01 --end 2026-12-31 --output-dir export/
+
+from __future__ import annotations
+
+import argparse
+import csv
+import heapq
+import hmac
+import io
+import json
+import sqlite3
+import sys
+import zlib
+from datetime import date, datetime, timedelta
+from itertools import islice
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator, List, Optional, Tuple
+
+from flask import Response, request
+
+import config
+import database
+from modules import archive
+
+# Todas filtram por empresa e período ([início, fim) em UTC) e saem na ordem do índice
+# (empresa, data): nenhuma ordenação em memória.
+DATASETS = {
+    "sales": """
+        SELECT s.id, s.code, s.created_at, s.status, s.total, s.customer_id,
+               c.name AS customer_name, s.budget_id, s.created_by
+        FROM sales s
+        JOIN customers c ON c.id = s.customer_id
+        WHERE s.company_id = ? AND s.created_at >= ? AND s.created_at < ?
+        ORDER BY s.created_at, s.id;
+    """,
+    "sale_items": """
+        SELECT s.code AS sale_code, s.created_at AS sale_created_at, s.status AS sale_status,
+               i.id, i.item_type, i.item_id, i.description_snapshot AS description,
+               i.qty, i.unit_price, i.subtotal
+        FROM sales s
+        JOIN sale_items i ON i.sale_id = s.id
+        WHERE s.company_id = ? AND s.created_at >= ? AND s.created_at < ?
+        ORDER BY s.created_at, s.id;
+    """,
+    "payments": """
+        SELECT id, paid_at, direction, origin_type, origin_id, method, amount, note, created_by
+        FROM payments
+        WHERE company_id = ? AND paid_at >= ? AND paid_at < ?
+        ORDER BY paid_at, id;
+    """,
+    "stock_movements": """
+        SELECT m.id, m.created_at, m.product_id, p.code AS product_code, p.name AS product_name,
+               m.movement_type, m.qty, m.reason, m.ref_type, m.ref_id, m.created_by
+        FROM stock_movements m
+        JOIN products p ON p.id = m.product_id
+        WHERE m.company_id = ? AND m.created_at >= ? AND m.created_at < ?
+        ORDER BY m.created_at, m.id;
+    """,
+}
+
+# Coluna de data (na saída) que abre o ORDER BY de cada dataset: junta, na mesma ordem, as
+# linhas do banco quente e dos anos arquivados.
+ORDER_COLUMNS = {
+    "sales": "created_at",
+    "sale_items": "sale_created_at",
+    "payments": "paid_at",
+    "stock_movements": "created_at",
+}
+
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson; charset=utf-8", "ndjson"),
+}
+
+# Blocos de ~64 KB: poucas chamadas de write/compress sem segurar muito em memória.
+_FLUSH_BYTES = 64 * 1024
+
+
+def period_bounds(start_day: str, end_day: str) -> Tuple[str, str]:
+    """
+    Dias locais (YYYY-MM-DD, inclusivos) -> limites UTC [início, fim) no formato de utc_iso(),
+    com o mesmo deslocamento dos rollups (ROLLUP_DAY_OFFSET_HOURS).
+    """
+    try:
+        start = date.fromisoformat(start_day)
+        end = date.fromisoformat(end_day)
+    except ValueError:
+        raise ValueError("Datas devem estar no formato YYYY-MM-DD.") from None
+    if end < start:
+        raise ValueError("A data final é anterior à inicial.")
+    shift = timedelta(hours=-config.ROLLUP_DAY_OFFSET_HOURS)
+    fmt = "%Y-%m-%dT%H:%M:%SZ"
+    lower = datetime(start.year, start.month, start.day) + shift
+    upper = datetime(end.year, end.month, end.day) + timedelta(days=1) + shift
+    return lower.strftime(fmt), upper.strftime(fmt)
+
+
+def _years(start_day: str, end_day: str) -> range:
+    # Anos arquivados que o período pode alcançar (só os que existirem em disco são abertos).
+    return range(int(start_day[:4]), int(end_day[:4]) + 1)
+
+
+def _validate(dataset: str, fmt: str) -> None:
+    if dataset not in DATASETS:
+        raise ValueError(f"Exportação inválida: {dataset} (use {', '.join(DATASETS)}).")
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato inválido: {fmt} (use {', '.join(FORMATS)}).")
+
+
+def _batches(cur: sqlite3.Cursor, size: int) -> Iterator[List[Tuple[Any, ...]]]:
+    while True:
+        rows = cur.fetchmany(size)
+        if not rows:
+            return
+        yield rows
+
+
+def _merged(cursors: List[sqlite3.Cursor], key_index: int, size: int) -> Iterator[List[Tuple[Any, ...]]]:
+    """
+    Lotes de linhas na ordem do dataset. Com anos arquivados, um cursor por arquivo (cada um
+    já ordenado pelo índice) e merge pela data, sem ordenar nada em memória.
+    """
+    if len(cursors) == 1:
+        yield from _batches(cursors[0], size)
+        return
+    streams = [(row for rows in _batches(cur, size) for row in rows) for cur in cursors]
+    merged = heapq.merge(*streams, key=itemgetter(key_index))
+    while True:
+        rows = list(islice(merged, size))
+        if not rows:
+            return
+        yield rows
+
+
+def _encode(
+    conns: List[sqlite3.Connection],
+    dataset: str,
+    company_id: int,
+    bounds: Tuple[str, str],
+    fmt: str,
+    batch_size: int,
+) -> Iterator[bytes]:
+    """
+    Lê o dataset em lotes de batch_size (tuplas cruas) e devolve blocos já codificados.
+    """
+    cursors: List[sqlite3.Cursor] = []
+    try:
+        for conn in conns:
+            cur = conn.cursor()
+            cur.row_factory = None
+            cursors.append(cur)
+            cur.execute(DATASETS[dataset], (company_id, *bounds))
+        columns = [col[0] for col in cursors[0].description]
+        buffer = io.StringIO()
+        if fmt == "csv":
+            writer = csv.writer(buffer, lineterminator="\r\n")
+            # BOM: o Excel só reconhece UTF-8 (acentos) com ele.
+            buffer.write("\ufeff")
+            writer.writerow(columns)
+        for rows in _merged(cursors, columns.index(ORDER_COLUMNS[dataset]), batch_size):
+            if fmt == "csv":
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    buffer.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False, separators=(",", ":")))
+                    buffer.write("\n")
+            if buffer.tell() >= _FLUSH_BYTES:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+    finally:
+        for cur in cursors:
+            cur.close()
+
+
+def _gzip(chunks: Iterator[bytes], level: int) -> Iterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def stream_export(
+    dataset: str,
+    company_id: int,
+    start_day: str,
+    end_day: str,
+    fmt: str = "csv",
+    compress: bool = False,
+    batch_size: Optional[int] = None,
+) -> Iterator[bytes]:
+    """
+    Gerador de bytes da exportação. Valida os parâmetros na chamada (antes de qualquer byte
+    sair); as conexões e os snapshots são abertos no primeiro next() e fechados ao terminar
+    ou quando o gerador é fechado (cliente desconectou).
+    """
+    _validate(dataset, fmt)
+    bounds = period_bounds(start_day, end_day)
+    size = max(1, batch_size or config.EXPORT_BATCH_SIZE)
+
+    def generate() -> Iterator[bytes]:
+        with archive.history_sources(company_id, years=_years(start_day, end_day)) as conns:
+            chunks = _encode(conns, dataset, company_id, bounds, fmt, size)
+            yield from (_gzip(chunks, config.EXPORT_GZIP_LEVEL) if compress else chunks)
+
+    return generate()
+
+
+def export_to_files(
+    datasets: List[str],
+    company_id: int,
+    start_day: str,
+    end_day: str,
+    out_dir: Path,
+    fmt: str = "csv",
+    compress: bool = False,
+) -> List[Tuple[Path, int]]:
+    """
+    Grava vários datasets lidos do MESMO snapshot (vendas e itens batem entre si mesmo com
+    vendas novas entrando durante a exportação). Retorna (arquivo, bytes) de cada um.
+    """
+    for dataset in datasets:
+        _validate(dataset, fmt)
+    bounds = period_bounds(start_day, end_day)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    written: List[Tuple[Path, int]] = []
+    with archive.history_sources(company_id, years=_years(start_day, end_day)) as conns:
+        for dataset in datasets:
+            suffix = FORMATS[fmt][1] + (".gz" if compress else "")
+            path = out_dir / f"{dataset}_{company_id}_{start_day}_{end_day}.{suffix}"
+            chunks = _encode(conns, dataset, company_id, bounds, fmt, config.EXPORT_BATCH_SIZE)
+            with open(path, "wb") as fh:
+                size = _write_all(fh, _gzip(chunks, config.EXPORT_GZIP_LEVEL) if compress else chunks)
+            written.append((path, size))
+    return written
+
+
+def _write_all(fh: BinaryIO, chunks: Iterator[bytes]) -> int:
+    total = 0
+    for chunk in chunks:
+        fh.write(chunk)
+        total += len(chunk)
+    return total
+
+
+# ============================================================
+# INTEGRAÇÃO COM O FLASK
+# ============================================================
+
+
+def export_response(dataset: str) -> Response:
+    """
+    Resposta do GET /exports/<dataset>?company_id=&start=&end=&format=csv|ndjson.
+    Exige "Authorization: Bearer <EXPORT_TOKEN>"; gzip quando o cliente aceita.
+    """
+    expected = f"Bearer {config.EXPORT_TOKEN}"
+    if not hmac.compare_digest(request.headers.get("Authorization", "").encode(), expected.encode()):
+        return Response("unauthorized", status=401, mimetype="text/plain")
+
+    fmt = (request.args.get("format") or "csv").lower()
+    start_day = request.args.get("start") or "1970-01-01"
+    end_day = request.args.get("end") or "9998-12-31"
+    try:
+        company_id = int(request.args.get("company_id", ""))
+    except ValueError:
+        return Response("company_id obrigatório", status=400, mimetype="text/plain")
+
+    compress = "gzip" in request.headers.get("Accept-Encoding", "").lower()
+    try:
+        body = stream_export(dataset, company_id, start_day, end_day, fmt=fmt, compress=compress)
+    except ValueError as exc:
+        return Response(str(exc), status=400, mimetype="text/plain")
+
+    content_type, extension = FORMATS[fmt]
+    filename = f"{dataset}_{company_id}_{start_day}_{end_day}.{extension}"
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Cache-Control": "no-store",
+        "Vary": "Accept-Encoding",
+        # Proxies (nginx) não devem segurar a resposta inteira antes de repassar.
+        "X-Accel-Buffering": "no",
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, status=200, content_type=content_type, headers=headers, direct_passthrough=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m modules.exports")
+    parser.add_argument("dataset", choices=tuple(DATASETS) + ("all",))
+    parser.add_argument("--company-id", type=int, required=True)
+    parser.add_argument("--start", default="1970-01-01", help="dia local inicial (YYYY-MM-DD)")
+    parser.add_argument("--end", default="9998-12-31", help="dia local final, inclusive")
+    parser.add_argument("--format", choices=tuple(FORMATS), default="csv")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("-o", "--output", type=Path, help="arquivo de saída (padrão: stdout)")
+    parser.add_argument("--output-dir", type=Path, help="diretório de saída (obrigatório com 'all')")
+    args = parser.parse_args(argv)
+
+    database.init_db()
+    if args.dataset == "all" or args.output_dir is not None:
+        if args.output_dir is None:
+            parser.error("'all' exige --output-dir")
+        datasets = list(DATASETS) if args.dataset == "all" else [args.dataset]
+        for path, size in export_to_files(
+            datasets, args.company_id, args.start, args.end, args.output_dir, fmt=args.format, compress=args.gzip
+        ):
+            print(f"{path} ({size / 1024:.1f} KB)")
+        return 0
+
+    chunks = stream_export(
+        args.dataset, args.company_id, args.start, args.end, fmt=args.format, compress=args.gzip
+    )
+    if args.output is None:
+        _write_all(sys.stdout.buffer, chunks)
+        sys.stdout.buffer.flush()
+    else:
+        with open(args.output, "wb") as fh:
+            _write_all(fh, chunks)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
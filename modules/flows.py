@@ -0,0 +1,417 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\modules\flows.py
+# Último recode: 2026-10-18 01:40 (America/Bahia)
+# Motivo: Máquina de estados da conversa (wa_sessions.state) com tabela de transições
+#         explícita: (estado, comando) -> (handler, próximo estado). Uma consulta a dict por
+#         mensagem, no lugar de uma cadeia de ifs. Handlers de orçamento, venda, estoque,
+#         pagamento, relatórios, contas a receber e busca no catálogo.
+
+from __future__ import annotations
+
+import copy
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import config
+import database
+from modules import aging, reports, stock
+from modules.catalog_search import search
+from modules.commands import Command, parse
+from modules.sequences import next_budget_code, next_sale_code
+from modules.sessions import DEFAULT_STATE, Session, get_session_cache
+
+IDLE = DEFAULT_STATE
+BUDGET_DRAFT = "budget_draft"
+SALE_DRAFT = "sale_draft"
+STATES = (IDLE, BUDGET_DRAFT, SALE_DRAFT)
+
+# Linha curinga da tabela: vale para qualquer estado sem entrada própria.
+ANY = "*"
+
+# Opções numeradas do menu (estado idle) -> comando equivalente.
+MENU_OPTIONS = {1: "budget_new", 2: "sale_new", 3: "stock_query", 4: "report", 5: "receivables"}
+
+MENU_TEXT = (
+    "GESTFLOW - o que deseja fazer?\n"
+    "1. Orçamento\n"
+    "2. Venda\n"
+    "3. Estoque\n"
+    "4. Relatório do dia\n"
+    "5. Contas a receber\n\n"
+    "Também: entrada/saída <qtd> <código>, recebi <valor> <pix|dinheiro|cartão>, "
+    "buscar <texto>, cancelar."
+)
+
+EMPTY_MESSAGE_REPLY = "Mensagem vazia recebida. Digite menu para ver as opções."
+
+# Comandos liberados para números sem cadastro em users.
+PUBLIC_COMMANDS = frozenset({"menu", "search", "unknown", "cancel"})
+
+_DRAFT_KIND = {BUDGET_DRAFT: "budget", SALE_DRAFT: "sale"}
+
+# Consultas do fluxo (conferidas por benchmarks/check_query_plans.py). {table}: products/services.
+ITEM_BY_CODE_SQL = "SELECT id, code, name, price_sale FROM {table} WHERE company_id=? AND code=? AND active=1;"
+CUSTOMER_BY_NAME_SQL = "SELECT id, name FROM customers WHERE company_id=? AND name=? COLLATE NOCASE LIMIT 1;"
+SALE_BY_CODE_SQL = "SELECT id FROM sales WHERE company_id=? AND code=?;"
+
+
+class FlowError(Exception):
+    """
+    Erro de uso (item não encontrado, rascunho vazio...): vira a resposta e o estado não muda.
+    """
+
+
+class Turn:
+    """
+    Uma mensagem em processamento: sessão, contexto (cópia mutável) e empresa.
+    """
+
+    __slots__ = ("session", "company_id", "user", "context")
+
+    def __init__(self, session: Session) -> None:
+        self.session = session
+        self.company_id = session.company_id
+        self.user = session.user
+        # Cópia profunda: o handler mexe à vontade e a sessão só muda se ele terminar bem.
+        self.context: Dict[str, Any] = copy.deepcopy(session.context)
+
+    @property
+    def user_id(self) -> Optional[int]:
+        return int(self.user["id"]) if self.user else None
+
+
+Handler = Callable[[Turn, Command], str]
+
+
+def _money(value: float) -> str:
+    return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def _qty(value: float) -> str:
+    return f"{value:g}".replace(".", ",")
+
+
+# ============================================================
+# CONSULTAS DE APOIO
+# ============================================================
+
+
+def _find_item(company_id: int, code: str, products_only: bool = False) -> Dict[str, Any]:
+    """
+    Produto/serviço pelo código exato (índice company+code); senão, o melhor resultado da
+    busca por texto do catálogo.
+    """
+    tables = (("product", "products"),) if products_only else (("product", "products"), ("service", "services"))
+    for item_type, table in tables:
+        row = database.fetch_one(ITEM_BY_CODE_SQL.format(table=table), (company_id, code))
+        if row:
+            return {"type": item_type, "id": row["id"], "code": row["code"], "name": row["name"], "price": row["price_sale"]}
+    for hit in search(company_id, code, limit=5):
+        if products_only and hit["item_type"] != "product":
+            continue
+        return {"type": hit["item_type"], "id": hit["item_id"], "code": hit["code"], "name": hit["name"],
+                "price": hit["price_sale"]}
+    raise FlowError(f"Não encontrei {'produto' if products_only else 'item'} para \"{code}\". Tente: buscar {code.lower()}")
+
+
+def _draft_summary(context: Dict[str, Any]) -> str:
+    items = context.get("items") or []
+    label = "Orçamento" if context.get("kind") == "budget" else "Venda"
+    lines = [f"{label} em aberto" + (f" - cliente: {context['customer_name']}" if context.get("customer_name") else "")]
+    for item in items:
+        lines.append(f"{_qty(item['qty'])} x {item['name']} ({item['code']}) = {_money(item['qty'] * item['price'])}")
+    if items:
+        lines.append(f"Total: {_money(sum(i['qty'] * i['price'] for i in items))}")
+    else:
+        lines.append("Sem itens. Envie <qtd> <código>, ex.: 2 P001")
+    lines.append("Envie confirmar para fechar ou cancelar para descartar.")
+    return "\n".join(lines)
+
+
+# ============================================================
+# HANDLERS
+# ============================================================
+
+
+def _menu(turn: Turn, cmd: Command) -> str:
+    if turn.session.state in _DRAFT_KIND:
+        return MENU_TEXT + "\n\n" + _draft_summary(turn.context)
+    return MENU_TEXT
+
+
+def _unknown(turn: Turn, cmd: Command) -> str:
+    if not cmd.text:
+        return EMPTY_MESSAGE_REPLY
+    near = cmd.args.get("near")
+    hints = {
+        "stock_in": "entrada <qtd> <código>",
+        "stock_out": "saída <qtd> <código>",
+        "payment": "recebi <valor> <pix|dinheiro|cartão> [código da venda]",
+        "report": "relatório [hoje|ontem|semana|mês]",
+        "customer": "cliente <nome>",
+        "item_add": "item <qtd> <código>",
+    }
+    if near in hints:
+        return f"Formato: {hints[near]}"
+    return "Não entendi. Digite menu para ver as opções."
+
+
+def _cancel(turn: Turn, cmd: Command) -> str:
+    turn.context = {}
+    if turn.session.state in _DRAFT_KIND:
+        return "Rascunho descartado."
+    return "Nada em andamento. Digite menu para ver as opções."
+
+
+def _draft_start(turn: Turn, cmd: Command) -> str:
+    kind = "budget" if cmd.name == "budget_new" else "sale"
+    turn.context = {"kind": kind, "items": []}
+    label = "Novo orçamento" if kind == "budget" else "Nova venda"
+    return f"{label}. Informe o cliente (cliente <nome>) e os itens (<qtd> <código>, ex.: 2 P001)."
+
+
+def _draft_busy(turn: Turn, cmd: Command) -> str:
+    return "Já existe um rascunho em aberto.\n" + _draft_summary(turn.context)
+
+
+def _draft_customer(turn: Turn, cmd: Command) -> str:
+    name = cmd.args["name"]
+    row = database.fetch_one(CUSTOMER_BY_NAME_SQL, (turn.company_id, name))
+    if row:
+        customer_id, customer_name, note = row["id"], row["name"], ""
+    else:
+        customer_id = database.execute(
+            "INSERT INTO customers (company_id, name, created_at) VALUES (?, ?, ?);",
+            (turn.company_id, name, database.utc_iso()),
+        )
+        customer_name, note = name, " (novo cadastro)"
+    turn.context["customer_id"] = customer_id
+    turn.context["customer_name"] = customer_name
+    return f"Cliente: {customer_name}{note}."
+
+
+def _draft_item_add(turn: Turn, cmd: Command) -> str:
+    qty = cmd.args["qty"]
+    if qty <= 0:
+        raise FlowError("A quantidade deve ser maior que zero.")
+    items: List[Dict[str, Any]] = turn.context.setdefault("items", [])
+    item = _find_item(turn.company_id, cmd.args["code"])
+    for existing in items:
+        if existing["type"] == item["type"] and existing["id"] == item["id"]:
+            existing["qty"] += qty
+            break
+    else:
+        if len(items) >= config.DRAFT_MAX_ITEMS:
+            raise FlowError(f"Limite de {config.DRAFT_MAX_ITEMS} itens por rascunho.")
+        items.append({**item, "qty": qty})
+    return f"Adicionado: {_qty(qty)} x {item['name']}.\n" + _draft_summary(turn.context)
+
+
+def _draft_item_remove(turn: Turn, cmd: Command) -> str:
+    code = cmd.args["code"]
+    items = turn.context.get("items") or []
+    kept = [i for i in items if i["code"].upper() != code]
+    if len(kept) == len(items):
+        raise FlowError(f"O item {code} não está no rascunho.")
+    turn.context["items"] = kept
+    return f"Removido: {code}.\n" + _draft_summary(turn.context)
+
+
+def _draft_items(turn: Turn, cmd: Command) -> str:
+    return _draft_summary(turn.context)
+
+
+def _draft_confirm(turn: Turn, cmd: Command) -> str:
+    context = turn.context
+    items = context.get("items") or []
+    if not items:
+        raise FlowError("O rascunho está sem itens. Envie <qtd> <código>, ex.: 2 P001")
+    if not context.get("customer_id"):
+        raise FlowError("Informe o cliente antes de confirmar: cliente <nome>")
+
+    now = database.utc_iso()
+    total = round(sum(i["qty"] * i["price"] for i in items), 2)
+    rows = [(i["type"], i["id"], i["name"], i["price"], i["qty"], round(i["qty"] * i["price"], 2)) for i in items]
+    with database.transaction() as tx:
+        if context.get("kind") == "budget":
+            code = next_budget_code(turn.company_id, tx=tx)
+            doc_id = tx.execute(
+                "INSERT INTO budgets (company_id, code, customer_id, status, total, created_by, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'confirmed', ?, ?, ?, ?);",
+                (turn.company_id, code, context["customer_id"], total, turn.user_id, now, now),
+            )
+            tx.execute_many(
+                "INSERT INTO budget_items (company_id, budget_id, item_type, item_id, description_snapshot, "
+                "unit_price, qty, subtotal) VALUES (?, ?, ?, ?, ?, ?, ?, ?);",
+                [(turn.company_id, doc_id, *row) for row in rows],
+            )
+        else:
+            code = next_sale_code(turn.company_id, tx=tx)
+            doc_id = tx.execute(
+                "INSERT INTO sales (company_id, code, customer_id, status, total, created_by, created_at) "
+                "VALUES (?, ?, ?, 'open', ?, ?, ?);",
+                (turn.company_id, code, context["customer_id"], total, turn.user_id, now),
+            )
+            tx.execute_many(
+                "INSERT INTO sale_items (company_id, sale_id, item_type, item_id, description_snapshot, "
+                "unit_price, qty, subtotal) VALUES (?, ?, ?, ?, ?, ?, ?, ?);",
+                [(turn.company_id, doc_id, *row) for row in rows],
+            )
+            for item in items:
+                if item["type"] == "product":
+                    stock.record_movement(
+                        turn.company_id, item["id"], "sale", item["qty"],
+                        ref_type="sale", ref_id=doc_id, created_by=turn.user_id, tx=tx,
+                    )
+    label = "Orçamento {} registrado" if context.get("kind") == "budget" else "Venda {} registrada"
+    turn.context = {}
+    return f"{label.format(code)}: {len(items)} item(ns), total {_money(total)}."
+
+
+def _stock_move(turn: Turn, cmd: Command) -> str:
+    qty = cmd.args["qty"]
+    if qty <= 0:
+        raise FlowError("A quantidade deve ser maior que zero.")
+    item = _find_item(turn.company_id, cmd.args["code"], products_only=True)
+    movement = "in" if cmd.name == "stock_in" else "out"
+    stock.record_movement(turn.company_id, item["id"], movement, qty, reason="whatsapp", ref_type="manual",
+                          created_by=turn.user_id)
+    balance = stock.get_balance(turn.company_id, item["id"])
+    verb = "Entrada" if movement == "in" else "Saída"
+    return f"{verb} de {_qty(qty)} x {item['name']} registrada. Saldo: {_qty(balance)}."
+
+
+def _stock_query(turn: Turn, cmd: Command) -> str:
+    code = cmd.args.get("code")
+    if not code:
+        return "Envie: estoque <código>, ex.: estoque P001"
+    item = _find_item(turn.company_id, code, products_only=True)
+    return f"{item['name']} ({item['code']}): saldo {_qty(stock.get_balance(turn.company_id, item['id']))}."
+
+
+def _payment(turn: Turn, cmd: Command) -> str:
+    amount = round(cmd.args["amount"], 2)
+    method = cmd.args.get("method")
+    if amount <= 0:
+        raise FlowError("O valor deve ser maior que zero.")
+    if method is None:
+        raise FlowError("Informe a forma: recebi <valor> <pix|dinheiro|cartão|transferência>")
+    ref = cmd.args.get("ref")
+    origin_type, origin_id, note = "manual", None, ref
+    if ref:
+        sale = database.fetch_one(SALE_BY_CODE_SQL, (turn.company_id, ref))
+        if sale:
+            origin_type, origin_id, note = "sale_direct", sale["id"], None
+    database.execute(
+        "INSERT INTO payments (company_id, direction, origin_type, origin_id, method, amount, paid_at, created_by, note) "
+        "VALUES (?, 'in', ?, ?, ?, ?, ?, ?, ?);",
+        (turn.company_id, origin_type, origin_id, method, amount, database.utc_iso(), turn.user_id, note),
+    )
+    suffix = f" (venda {ref})" if origin_type == "sale_direct" else ""
+    return f"Recebimento de {_money(amount)} via {method} registrado{suffix}."
+
+
+def _report(turn: Turn, cmd: Command) -> str:
+    period = cmd.args.get("period", "today")
+    start, end = reports.period_range(period)
+    sales = reports.sales_totals(turn.company_id, start, end)
+    received = sum(r["amount"] for r in reports.payments_totals(turn.company_id, start, end) if r["direction"] == "in")
+    label = {"today": "hoje", "yesterday": "ontem", "week": "na semana", "month": "no mês"}[period]
+    return f"Vendas {label}: {sales['sales_count']} ({_money(sales['total'])}). Recebido: {_money(received)}."
+
+
+def _receivables(turn: Turn, cmd: Command) -> str:
+    rows = aging.overdue("receivable", turn.company_id)
+    if not rows:
+        return "Nenhuma conta a receber vencida."
+    lines = [f"{len(rows)} conta(s) vencida(s), total {_money(sum(r['balance'] for r in rows))}:"]
+    for row in rows[:5]:
+        lines.append(f"{row['customer_name']} - {row['sale_code']} - {_money(row['balance'])} (venc. {row['due_date']})")
+    return "\n".join(lines)
+
+
+def _search(turn: Turn, cmd: Command) -> str:
+    hits = search(turn.company_id, cmd.args["query"], limit=5)
+    if not hits:
+        return f"Nada encontrado para \"{cmd.args['query']}\"."
+    return "\n".join(f"{h['code']} - {h['name']} - {_money(h['price_sale'] or 0)}" for h in hits)
+
+
+# ============================================================
+# TABELA DE TRANSIÇÕES
+# (estado, comando) -> (handler, próximo estado); None mantém o estado atual.
+# Procura (estado, comando), depois (ANY, comando), depois (ANY, "unknown").
+# ============================================================
+
+TRANSITIONS: Dict[Tuple[str, str], Tuple[Handler, Optional[str]]] = {
+    (ANY, "menu"): (_menu, None),
+    (ANY, "cancel"): (_cancel, IDLE),
+    (ANY, "unknown"): (_unknown, None),
+    (ANY, "stock_in"): (_stock_move, None),
+    (ANY, "stock_out"): (_stock_move, None),
+    (ANY, "stock_query"): (_stock_query, None),
+    (ANY, "payment"): (_payment, None),
+    (ANY, "report"): (_report, None),
+    (ANY, "receivables"): (_receivables, None),
+    (ANY, "search"): (_search, None),
+    (IDLE, "budget_new"): (_draft_start, BUDGET_DRAFT),
+    (IDLE, "sale_new"): (_draft_start, SALE_DRAFT),
+}
+
+for _state in (BUDGET_DRAFT, SALE_DRAFT):
+    TRANSITIONS.update(
+        {
+            (_state, "budget_new"): (_draft_busy, None),
+            (_state, "sale_new"): (_draft_busy, None),
+            (_state, "customer"): (_draft_customer, None),
+            (_state, "item_add"): (_draft_item_add, None),
+            (_state, "item_implicit"): (_draft_item_add, None),
+            (_state, "item_remove"): (_draft_item_remove, None),
+            (_state, "items"): (_draft_items, None),
+            (_state, "confirm"): (_draft_confirm, IDLE),
+            (_state, "deny"): (_cancel, IDLE),
+        }
+    )
+
+_FALLBACK = TRANSITIONS[(ANY, "unknown")]
+
+
+def resolve(state: str, cmd: Command) -> Tuple[Command, Handler, Optional[str]]:
+    """
+    Handler e próximo estado para o comando no estado atual (três consultas a dict, no máximo).
+    Estados desconhecidos (valores antigos em wa_sessions) contam como idle.
+    """
+    if state not in STATES:
+        state = IDLE
+    if cmd.name == "number" and state == IDLE:
+        option = MENU_OPTIONS.get(cmd.args["value"])
+        if option is not None:
+            cmd = Command(option, {}, cmd.text)
+    entry = TRANSITIONS.get((state, cmd.name)) or TRANSITIONS.get((ANY, cmd.name)) or _FALLBACK
+    return cmd, entry[0], entry[1]
+
+
+def handle(session: Session, body: str) -> str:
+    """
+    Processa uma mensagem na sessão: parse -> tabela de transições -> handler. Estado e
+    contexto só mudam se o handler terminar sem FlowError (gravação write-behind).
+    """
+    cmd, handler, next_state = resolve(session.state, parse(body))
+    if session.user is None and cmd.name not in PUBLIC_COMMANDS:
+        return "Seu número não está cadastrado nesta empresa. Peça ao responsável para cadastrá-lo."
+
+    turn = Turn(session)
+    try:
+        reply = handler(turn, cmd)
+    except FlowError as exc:
+        return str(exc)
+
+    new_state = next_state or (session.state if session.state in STATES else IDLE)
+    if new_state != session.state or turn.context != session.context:
+        get_session_cache().set_state(session.company_id, session.whatsapp, new_state, turn.context)
+    return reply
+
+
+def handle_message(from_number: str, body: str, company_id: Optional[int] = None) -> str:
+    company_id = company_id or config.WHATSAPP_COMPANY_ID
+    with database.tenant(company_id):
+        session = get_session_cache().get(company_id, from_number)
+        return handle(session, body)
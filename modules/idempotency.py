@@ -0,0 +1,155 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\modules\idempotency.py
+# Último recode: 2026-10-18 07:10 (America/Bahia)
+# Motivo: Deduplicação por MessageSid: conjunto limitado em memória (com expiração por tempo)
+#         apoiado na tabela webhook_messages, para que retries do Twilio recebam a resposta
+#         já calculada sem reprocessar a mensagem (inclusive após restart).
+#         Escritas via database.run_write() (fila da thread escritora no modo queue).
+#         A limpeza periódica roda no dispatcher, fora da requisição do webhook.
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+import config
+import database
+from modules.dispatcher import DispatchRejected, get_dispatcher
+
+logger = logging.getLogger(__name__)
+
+# Sentinela para "SID novo: pode processar".
+NEW = object()
+
+REPLY_SQL = "SELECT reply FROM webhook_messages WHERE message_sid=?;"
+FORGET_SQL = "DELETE FROM webhook_messages WHERE message_sid=?;"
+PURGE_SQL = "DELETE FROM webhook_messages WHERE created_at < ?;"
+
+# Chave própria no dispatcher: a limpeza nunca divide a vez com um remetente.
+_PURGE_KEY = "maintenance:webhook_messages"
+
+
+class IdempotencyStore:
+    """
+    claim(sid) é O(1): consulta a memória e, se não estiver lá, faz um INSERT OR IGNORE pela PK.
+    Retorna NEW quando a mensagem ainda não foi vista; caso contrário, a resposta gravada
+    (None se a primeira tentativa ainda está processando ou respondeu de forma assíncrona).
+    """
+
+    def __init__(self, ttl_seconds: float = 86400.0, max_memory: int = 10000, purge_every: float = 600.0) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_memory = max_memory
+        self.purge_every = purge_every
+        # sid -> (resposta, instante monotônico em que foi visto)
+        self._seen: "OrderedDict[str, Tuple[Optional[str], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_purge = time.monotonic()
+
+    def claim(self, message_sid: str, from_number: str = "") -> object:
+        now = time.monotonic()
+        with self._lock:
+            hit = self._seen.get(message_sid)
+            if hit is not None and now - hit[1] < self.ttl_seconds:
+                return hit[0]
+
+        def _claim(tx: database.Transaction) -> Tuple[bool, Optional[dict]]:
+            tx.execute(
+                "INSERT OR IGNORE INTO webhook_messages (message_sid, from_number, reply, created_at) VALUES (?, ?, NULL, ?);",
+                (message_sid, from_number, database.utc_iso()),
+            )
+            if tx.cur.rowcount == 1:
+                return True, None
+            return False, tx.fetch_one(REPLY_SQL, (message_sid,))
+
+        inserted, row = database.run_write(_claim)
+
+        reply = row["reply"] if row else None
+        if inserted or reply is not None:
+            # Duplicata ainda sem resposta: não guarda o None (um complete() concorrente
+            # pode ter acabado de colocar a resposta na memória).
+            self._remember(message_sid, reply, now)
+        self._maybe_purge(now)
+        return NEW if inserted else reply
+
+    def complete(self, message_sid: str, reply: str) -> None:
+        """
+        Guarda a resposta TwiML para devolver em eventuais retries.
+        """
+        database.execute("UPDATE webhook_messages SET reply=? WHERE message_sid=?;", (reply, message_sid))
+        self._remember(message_sid, reply, time.monotonic())
+
+    def forget(self, message_sid: str) -> None:
+        """
+        Libera o SID após falha no processamento, para que o retry do Twilio processe de novo.
+        """
+        with self._lock:
+            self._seen.pop(message_sid, None)
+        database.execute(FORGET_SQL, (message_sid,))
+
+    def purge(self) -> int:
+        """
+        Apaga do banco os SIDs mais antigos que o TTL. Retorna quantos foram removidos.
+        """
+        cutoff = (datetime.now(timezone.utc) - timedelta(seconds=self.ttl_seconds)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+        def _purge(tx: database.Transaction) -> int:
+            tx.execute(PURGE_SQL, (cutoff,))
+            return tx.cur.rowcount
+
+        return database.run_write(_purge)
+
+    def _remember(self, message_sid: str, reply: Optional[str], now: float) -> None:
+        with self._lock:
+            known = self._seen.get(message_sid)
+            if reply is None and known is not None and known[0] is not None:
+                # Nunca troca uma resposta já conhecida por "em andamento".
+                reply = known[0]
+            self._seen[message_sid] = (reply, now)
+            self._seen.move_to_end(message_sid)
+            while len(self._seen) > self.max_memory:
+                self._seen.popitem(last=False)
+            # Expiração por tempo: os mais antigos ficam no início.
+            while self._seen:
+                _, (_, seen_at) = next(iter(self._seen.items()))
+                if now - seen_at < self.ttl_seconds:
+                    break
+                self._seen.popitem(last=False)
+
+    def _maybe_purge(self, now: float) -> None:
+        with self._lock:
+            if now - self._last_purge < self.purge_every:
+                return
+            self._last_purge = now
+        # Em background: o webhook que cruzou o intervalo não espera o DELETE.
+        try:
+            future = get_dispatcher().submit(_PURGE_KEY, self.purge)
+        except DispatchRejected as exc:
+            # Sem capacidade agora; o próximo intervalo tenta de novo.
+            logger.warning("Limpeza de webhook_messages adiada (%s)", exc.reason)
+            return
+        future.add_done_callback(_log_purge_failure)
+
+
+def _log_purge_failure(future: "Future[int]") -> None:
+    exc = future.exception()
+    if exc is not None:
+        logger.error("Falha ao limpar webhook_messages", exc_info=exc)
+
+
+_store: Optional[IdempotencyStore] = None
+_store_lock = threading.Lock()
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = IdempotencyStore(
+                ttl_seconds=config.IDEMPOTENCY_TTL_SECONDS,
+                max_memory=config.IDEMPOTENCY_MEMORY_MAX,
+            )
+        return _store
@@ -0,0 +1,487 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\modules\importer.py
+# Último recode: 2026-10-18 00:10 (America/Bahia)
+# Motivo: Importação em massa (onboarding) de produtos, serviços e clientes a partir de CSV
+#         (inclusive o CSV exportado pelo Excel: ";" e cp1252). Leitura em streaming, validação
+#         e normalização por linha, upsert em lotes com executemany + ON CONFLICT, erros por
+#         linha e checkpoint em import_jobs para retomar de onde parou.
+#
+# Uso (CLI):
+#   python -m modules.importer products ARQUIVO.csv --company-id 1
+#   python -m modules.importer customers ARQUIVO.csv --company-id 1 --errors-out erros.csv
+#   (--chunk-size N, --restart para ignorar o checkpoint)
+
+from __future__ import annotations
+
+import argparse
+import codecs
+import csv
+import hashlib
+import re
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+import config
+import database
+from modules.catalog_search import fold, get_autocomplete
+
+# Cabeçalhos aceitos (já sem acento/minúsculos) -> campo interno.
+_HEADER_ALIASES = {
+    "code": "code",
+    "codigo": "code",
+    "cod": "code",
+    "sku": "code",
+    "referencia": "code",
+    "name": "name",
+    "nome": "name",
+    "descricao": "name",
+    "price": "price",
+    "price_sale": "price",
+    "preco": "price",
+    "preco_venda": "price",
+    "preco de venda": "price",
+    "valor": "price",
+    "phone": "phone",
+    "telefone": "phone",
+    "celular": "phone",
+    "whatsapp": "phone",
+    "active": "active",
+    "ativo": "active",
+}
+
+_TRUE = {"1", "s", "sim", "y", "yes", "true", "ativo", "x"}
+_FALSE = {"0", "n", "nao", "no", "false", "inativo"}
+
+_CODE_MAX = 40
+_NAME_MAX = 200
+_NOT_DIGIT_RE = re.compile(r"\D+")
+_SPACE_RE = re.compile(r"\s+")
+
+# Só atualiza quando algo mudou: reimportar o mesmo arquivo não reescreve linhas (nem
+# dispara os triggers do FTS) e o rowcount do executemany conta apenas as gravadas.
+_CATALOG_UPSERT = """
+    INSERT INTO {table} (company_id, code, name, price_sale, active, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(company_id, code) DO UPDATE SET
+        name = excluded.name,
+        price_sale = excluded.price_sale,
+        active = excluded.active
+    WHERE {table}.name IS NOT excluded.name
+       OR {table}.price_sale IS NOT excluded.price_sale
+       OR {table}.active IS NOT excluded.active;
+"""
+
+_CUSTOMER_UPSERT = """
+    INSERT INTO customers (company_id, code, name, phone, active, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(company_id, code) WHERE code IS NOT NULL DO UPDATE SET
+        name = excluded.name,
+        phone = COALESCE(excluded.phone, customers.phone),
+        active = excluded.active
+    WHERE customers.name IS NOT excluded.name
+       OR customers.phone IS NOT COALESCE(excluded.phone, customers.phone)
+       OR customers.active IS NOT excluded.active;
+"""
+
+
+class RowError(ValueError):
+    def __init__(self, field: str, message: str) -> None:
+        super().__init__(message)
+        self.field = field
+
+
+# ============================================================
+# NORMALIZAÇÃO
+# ============================================================
+
+
+def parse_price(raw: str) -> float:
+    """
+    "R$ 1.234,56" -> 1234.56; "1234.56" -> 1234.56; "12,5" -> 12.5.
+    Com "." e "," no mesmo valor, o último separador é o decimal; só "," é decimal;
+    só "." é decimal, exceto quando aparece mais de uma vez (milhar: "1.234.567").
+    """
+    text = (raw or "").strip().replace("R$", "").replace(" ", "").replace("\u00a0", "")
+    if not text:
+        raise RowError("price", "preço vazio")
+    if "," in text and "." in text:
+        if text.rfind(",") > text.rfind("."):
+            text = text.replace(".", "").replace(",", ".")
+        else:
+            text = text.replace(",", "")
+    elif "," in text:
+        if text.count(",") > 1:
+            raise RowError("price", f"preço inválido: {raw!r}")
+        text = text.replace(",", ".")
+    elif text.count(".") > 1:
+        text = text.replace(".", "")
+    try:
+        value = float(text)
+    except ValueError:
+        raise RowError("price", f"preço inválido: {raw!r}") from None
+    if value < 0 or value != value or value in (float("inf"), float("-inf")):
+        raise RowError("price", f"preço inválido: {raw!r}")
+    return round(value, 2)
+
+
+def normalize_code(raw: str) -> str:
+    code = _SPACE_RE.sub(" ", (raw or "").strip()).upper()
+    if len(code) > _CODE_MAX:
+        raise RowError("code", f"código com mais de {_CODE_MAX} caracteres")
+    return code
+
+
+def normalize_name(raw: str) -> str:
+    name = _SPACE_RE.sub(" ", (raw or "").strip())
+    if not name:
+        raise RowError("name", "nome vazio")
+    if len(name) > _NAME_MAX:
+        raise RowError("name", f"nome com mais de {_NAME_MAX} caracteres")
+    return name
+
+
+def normalize_phone(raw: str) -> Optional[str]:
+    """
+    Só dígitos, com DDI 55 quando vier apenas DDD + número (10/11 dígitos).
+    """
+    digits = _NOT_DIGIT_RE.sub("", raw or "")
+    if not digits:
+        return None
+    if len(digits) in (10, 11):
+        digits = "55" + digits
+    if not 12 <= len(digits) <= 15:
+        raise RowError("phone", f"telefone inválido: {raw!r}")
+    return digits
+
+
+def parse_active(raw: Optional[str]) -> int:
+    value = fold((raw or "").strip())
+    if not value or value in _TRUE:
+        return 1
+    if value in _FALSE:
+        return 0
+    raise RowError("active", f"valor de ativo inválido: {raw!r}")
+
+
+def _catalog_params(company_id: int, now: str, row: Dict[str, str]) -> Tuple[Any, ...]:
+    code = normalize_code(row.get("code", ""))
+    if not code:
+        raise RowError("code", "código vazio")
+    return (company_id, code, normalize_name(row.get("name", "")), parse_price(row.get("price", "")),
+            parse_active(row.get("active")), now)
+
+
+def _customer_params(company_id: int, now: str, row: Dict[str, str]) -> Tuple[Any, ...]:
+    # Sem código, a chave do upsert é o telefone; sem os dois, a linha é só inserida.
+    phone = normalize_phone(row.get("phone", ""))
+    code = normalize_code(row.get("code", "")) or (f"TEL:{phone}" if phone else None)
+    return (company_id, code, normalize_name(row.get("name", "")), phone, parse_active(row.get("active")), now)
+
+
+# kind -> (SQL do upsert, montagem dos parâmetros, campos obrigatórios no cabeçalho)
+KINDS: Dict[str, Tuple[str, Callable[[int, str, Dict[str, str]], Tuple[Any, ...]], Tuple[str, ...]]] = {
+    "products": (_CATALOG_UPSERT.format(table="products"), _catalog_params, ("code", "name", "price")),
+    "services": (_CATALOG_UPSERT.format(table="services"), _catalog_params, ("code", "name", "price")),
+    "customers": (_CUSTOMER_UPSERT, _customer_params, ("name",)),
+}
+
+
+# ============================================================
+# LEITURA EM STREAMING
+# ============================================================
+
+
+def _detect_encoding(sample: bytes) -> str:
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        sample.decode("utf-8")
+    except UnicodeDecodeError as exc:
+        # Amostra cortada no meio de um caractere multibyte não conta como erro.
+        if exc.start < len(sample) - 3:
+            return "cp1252"
+    return "utf-8"
+
+
+class _LineSource:
+    """
+    Entrega ao csv.reader uma linha decodificada por vez e guarda o byte offset do que já foi
+    consumido: depois de cada registro lido, `offset` aponta exatamente para o próximo.
+    """
+
+    def __init__(self, fh: BinaryIO, encoding: str, offset: int) -> None:
+        self._fh = fh
+        self._decode = codecs.getincrementaldecoder(encoding)(errors="strict")
+        self.offset = offset
+
+    def __iter__(self) -> "_LineSource":
+        return self
+
+    def __next__(self) -> str:
+        raw = self._fh.readline()
+        if not raw:
+            raise StopIteration
+        self.offset += len(raw)
+        try:
+            return self._decode.decode(raw)
+        except UnicodeDecodeError:
+            raise RowError("", "linha com caracteres inválidos para a codificação do arquivo") from None
+
+
+def file_fingerprint(path: Path) -> str:
+    """
+    Tamanho + SHA-256 do primeiro MB: identifica o arquivo para o checkpoint sem ler tudo.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        digest.update(fh.read(1024 * 1024))
+    return f"{path.stat().st_size}:{digest.hexdigest()}"
+
+
+def _read_header(fh: BinaryIO) -> Tuple[str, str, List[str], int]:
+    sample = fh.read(64 * 1024)
+    encoding = _detect_encoding(sample)
+    fh.seek(0)
+    first = fh.readline()
+    header_end = len(first)
+    text = first.decode(encoding).lstrip("\ufeff").rstrip("\r\n")
+    try:
+        delimiter = csv.Sniffer().sniff(text, delimiters=",;\t|").delimiter
+    except csv.Error:
+        delimiter = ","
+    header = next(csv.reader([text], delimiter=delimiter), [])
+    return encoding, delimiter, header, header_end
+
+
+def _map_header(header: List[str], required: Tuple[str, ...]) -> List[Optional[str]]:
+    fields = [_HEADER_ALIASES.get(fold(h).strip().replace("-", "_")) for h in header]
+    missing = [f for f in required if f not in fields]
+    if missing:
+        raise ValueError(f"Cabeçalho sem coluna(s) obrigatória(s): {', '.join(missing)} (lido: {header})")
+    return fields
+
+
+def _iter_records(
+    fh: BinaryIO, encoding: str, delimiter: str, fields: List[Optional[str]], offset: int, line_no: int
+) -> Iterator[Tuple[int, int, Optional[Dict[str, str]], Optional[RowError]]]:
+    """
+    (última linha física do registro, offset após o registro, campos, erro de leitura).
+    line_no é a última linha já consumida antes de `offset`. Linhas em branco são puladas.
+    """
+    fh.seek(offset)
+    source = _LineSource(fh, encoding, offset)
+    reader = csv.reader(source, delimiter=delimiter)
+    while True:
+        try:
+            values = next(reader)
+        except StopIteration:
+            return
+        except (RowError, csv.Error) as exc:
+            error = exc if isinstance(exc, RowError) else RowError("", str(exc))
+            yield line_no + reader.line_num, source.offset, None, error
+            continue
+        if not any(v.strip() for v in values):
+            continue
+        row = {f: v for f, v in zip(fields, values) if f}
+        yield line_no + reader.line_num, source.offset, row, None
+
+
+# ============================================================
+# IMPORTAÇÃO
+# ============================================================
+
+
+def _load_job(company_id: int, kind: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    return database.fetch_one(
+        "SELECT * FROM import_jobs WHERE company_id=? AND kind=? AND fingerprint=? ORDER BY id DESC LIMIT 1;",
+        (company_id, kind, fingerprint),
+    )
+
+
+def _write_chunk(
+    tx: database.Transaction,
+    sql: str,
+    chunk: List[Tuple[int, Tuple[Any, ...]]],
+) -> Tuple[int, List[Tuple[int, str, str]]]:
+    """
+    Um executemany para o lote inteiro; se o banco recusar alguma linha, refaz o lote linha a
+    linha (SAVEPOINT por linha) para isolar só as recusadas.
+    """
+    tx.cur.execute("SAVEPOINT import_chunk;")
+    try:
+        written = tx.execute_many(sql, [params for _, params in chunk])
+        tx.cur.execute("RELEASE import_chunk;")
+        return written, []
+    except sqlite3.IntegrityError:
+        tx.cur.execute("ROLLBACK TO import_chunk;")
+        tx.cur.execute("RELEASE import_chunk;")
+
+    written = 0
+    failed: List[Tuple[int, str, str]] = []
+    for line_no, params in chunk:
+        tx.cur.execute("SAVEPOINT import_row;")
+        try:
+            tx.execute(sql, params)
+            written += tx.cur.rowcount
+            tx.cur.execute("RELEASE import_row;")
+        except sqlite3.IntegrityError as exc:
+            tx.cur.execute("ROLLBACK TO import_row;")
+            tx.cur.execute("RELEASE import_row;")
+            failed.append((line_no, "", f"recusada pelo banco: {exc}"))
+    return written, failed
+
+
+def import_file(
+    kind: str,
+    path: Path,
+    company_id: int,
+    chunk_size: Optional[int] = None,
+    restart: bool = False,
+    errors_out: Optional[Path] = None,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Importa o CSV em lotes de chunk_size linhas (um executemany + COMMIT por lote, com o
+    checkpoint na mesma transação). Um import_jobs em andamento para o mesmo arquivo é
+    retomado do byte em que parou; restart=True começa do zero.
+    Retorna o resumo (linhas lidas/gravadas/inalteradas/com erro e os primeiros erros).
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Tipo inválido: {kind} (use {', '.join(KINDS)}).")
+    sql, build_params, required = KINDS[kind]
+    chunk_size = max(1, chunk_size or config.IMPORT_CHUNK_SIZE)
+    path = Path(path)
+    fingerprint = file_fingerprint(path)
+
+    with database.tenant(company_id):
+        if not database.fetch_one("SELECT id FROM companies WHERE id=?;", (company_id,)):
+            raise ValueError(f"Empresa {company_id} não existe.")
+
+        job = None if restart else _load_job(company_id, kind, fingerprint)
+        if job and job["status"] == "done":
+            return {**job, "skipped": True, "errors": []}
+
+        errors: List[Tuple[int, str, str]] = []
+        err_fh = None
+        err_writer = None
+        if errors_out is not None:
+            resuming = job is not None and Path(errors_out).exists()
+            err_fh = open(errors_out, "a" if resuming else "w", newline="", encoding="utf-8")
+            err_writer = csv.writer(err_fh)
+            if not resuming:
+                err_writer.writerow(["linha", "campo", "erro"])
+
+        def report(failures: List[Tuple[int, str, str]]) -> None:
+            room = config.IMPORT_MAX_REPORTED_ERRORS - len(errors)
+            if room > 0:
+                errors.extend(failures[:room])
+            if err_writer is not None:
+                err_writer.writerows(failures)
+
+        try:
+            with open(path, "rb") as fh:
+                encoding, delimiter, header, header_end = _read_header(fh)
+                fields = _map_header(header, required)
+
+                if job is None:
+                    now = database.utc_iso()
+                    job_id = database.execute(
+                        "INSERT INTO import_jobs (company_id, kind, source, fingerprint, byte_offset, line_no, "
+                        "started_at, updated_at) VALUES (?, ?, ?, ?, ?, 1, ?, ?);",
+                        (company_id, kind, str(path), fingerprint, header_end, now, now),
+                    )
+                    job = database.fetch_one("SELECT * FROM import_jobs WHERE id=?;", (job_id,))
+                totals = {k: int(job[k]) for k in ("rows_read", "rows_written", "rows_unchanged", "rows_failed")}
+
+                chunk: List[Tuple[int, Tuple[Any, ...]]] = []
+                pending_failures: List[Tuple[int, str, str]] = []
+                offset, line_no = int(job["byte_offset"]), int(job["line_no"])
+                now = database.utc_iso()
+
+                def flush() -> None:
+                    nonlocal chunk, pending_failures
+                    with database.transaction() as tx:
+                        written, rejected = _write_chunk(tx, sql, chunk) if chunk else (0, [])
+                        failures = pending_failures + rejected
+                        totals["rows_read"] += len(chunk) + len(pending_failures)
+                        totals["rows_written"] += written
+                        totals["rows_failed"] += len(failures)
+                        totals["rows_unchanged"] += len(chunk) - len(rejected) - written
+                        tx.execute(
+                            "UPDATE import_jobs SET byte_offset=?, line_no=?, rows_read=?, rows_written=?, "
+                            "rows_unchanged=?, rows_failed=?, updated_at=? WHERE id=?;",
+                            (offset, line_no, totals["rows_read"], totals["rows_written"], totals["rows_unchanged"],
+                             totals["rows_failed"], database.utc_iso(), job["id"]),
+                        )
+                    report(sorted(failures))
+                    chunk, pending_failures = [], []
+                    if progress is not None:
+                        progress({"job_id": job["id"], "line_no": line_no, **totals})
+
+                for line_no, offset, row, read_error in _iter_records(
+                    fh, encoding, delimiter, fields, offset, line_no
+                ):
+                    if read_error is not None:
+                        pending_failures.append((line_no, read_error.field, str(read_error)))
+                    else:
+                        try:
+                            chunk.append((line_no, build_params(company_id, now, row)))
+                        except RowError as exc:
+                            pending_failures.append((line_no, exc.field, str(exc)))
+                    if len(chunk) + len(pending_failures) >= chunk_size:
+                        flush()
+                if chunk or pending_failures:
+                    flush()
+        finally:
+            if err_fh is not None:
+                err_fh.close()
+
+        database.execute(
+            "UPDATE import_jobs SET status='done', finished_at=?, updated_at=? WHERE id=?;",
+            (database.utc_iso(), database.utc_iso(), job["id"]),
+        )
+
+    if kind != "customers":
+        get_autocomplete().invalidate(company_id)
+    return {"id": job["id"], "kind": kind, "status": "done", "skipped": False, **totals, "errors": errors}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m modules.importer")
+    parser.add_argument("kind", choices=tuple(KINDS))
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--company-id", type=int, required=True)
+    parser.add_argument("--chunk-size", type=int, default=config.IMPORT_CHUNK_SIZE)
+    parser.add_argument("--restart", action="store_true", help="ignora o checkpoint e reimporta do início")
+    parser.add_argument("--errors-out", type=Path, help="CSV com todos os erros (linha, campo, erro)")
+    args = parser.parse_args(argv)
+
+    database.init_db()
+
+    def progress(p: Dict[str, Any]) -> None:
+        print(f"\r  linha {p['line_no']:>10,}  gravadas={p['rows_written']:,}  erros={p['rows_failed']:,}",
+              end="", file=sys.stderr, flush=True)
+
+    result = import_file(
+        args.kind, args.path, args.company_id,
+        chunk_size=args.chunk_size, restart=args.restart, errors_out=args.errors_out, progress=progress,
+    )
+    print(file=sys.stderr)
+    if result["skipped"]:
+        print(f"Arquivo já importado (job {result['id']}); use --restart para importar de novo.")
+        return 0
+    print(
+        f"{args.kind}: lidas={result['rows_read']:,} gravadas={result['rows_written']:,} "
+        f"inalteradas={result['rows_unchanged']:,} com erro={result['rows_failed']:,}"
+    )
+    for line_no, field, message in result["errors"]:
+        print(f"  linha {line_no}: {field + ': ' if field else ''}{message}")
+    if result["rows_failed"] > len(result["errors"]):
+        print(f"  ... e mais {result['rows_failed'] - len(result['errors'])} erro(s)"
+              + (f" em {args.errors_out}" if args.errors_out else " (use --errors-out)"))
+    return 1 if result["rows_failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,302 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\modules\metrics.py
+# Último recode: 2026-10-18 06:50 (America/Bahia)
+# Motivo: Visibilidade em produção: tempo das requisições Flask (por rota/método/status),
+#         tempo de SQL por fingerprint do comando, log de consultas lentas e exportação
+#         no formato texto do Prometheus em /metrics. Inclui jobs/lotes das threads
+#         escritoras já criadas quando SQLITE_WRITE_MODE=queue. O scrape só lê pools e
+#         escritoras que já existem (todos os bancos, com sharding) e exige METRICS_TOKEN.
+#         Gravações write-behind de sessão (linhas e falhas) do cache já criado.
+
+from __future__ import annotations
+
+import bisect
+import hmac
+import logging
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from flask import Flask, Response, g, request
+
+import config
+import database
+from modules import sessions
+
+logger = logging.getLogger(__name__)
+
+# Limites (segundos) dos buckets. SQL em SQLite local costuma ficar abaixo de 1 ms.
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+
+OTHER_FINGERPRINT = "<outros>"
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql: str) -> str:
+    """
+    Forma canônica do comando: literais viram ?, listas IN (?, ?, ...) viram (?+),
+    espaços colapsados. Cacheado: os mesmos textos de SQL se repetem o tempo todo.
+    """
+    text = _STRING_RE.sub("?", sql)
+    text = _NUMBER_RE.sub("?", text)
+    text = _SPACE_RE.sub(" ", text).strip().rstrip(";").strip()
+    text = _PARAM_LIST_RE.sub("(?+)", text)
+    return text[:300]
+
+
+class Histogram:
+    """
+    Histograma com buckets fixos; observe() é O(log buckets) sob um lock curto.
+    """
+
+    __slots__ = ("bounds", "counts", "total", "count", "_lock")
+
+    def __init__(self, bounds: Sequence[float]) -> None:
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        idx = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.total += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        """
+        Contagens cumulativas por bucket (+Inf no fim), soma e total.
+        """
+        with self._lock:
+            counts, total, count = list(self.counts), self.total, self.count
+        running = 0
+        cumulative = []
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return cumulative, total, count
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+
+
+def _fmt(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class MetricsRegistry:
+    def __init__(self, max_fingerprints: int, slow_query_ms: float) -> None:
+        self.max_fingerprints = max_fingerprints
+        self.slow_query_ms = slow_query_ms
+        self.started_at = time.time()
+        self._http: Dict[Tuple[str, str, str], Histogram] = {}
+        self._sql: Dict[str, Histogram] = {}
+        self._slow: Dict[str, int] = {}
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    # --------------------------------------------------------
+    # Coleta
+    # --------------------------------------------------------
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float) -> None:
+        key = (method, route, str(status))
+        hist = self._http.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self._http.setdefault(key, Histogram(HTTP_BUCKETS))
+        hist.observe(seconds)
+
+    def request_started(self) -> None:
+        with self._lock:
+            self._in_flight += 1
+
+    def request_finished(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def observe_sql(self, sql: str, seconds: float) -> None:
+        fp = fingerprint(sql)
+        hist = self._sql.get(fp)
+        if hist is None:
+            with self._lock:
+                hist = self._sql.get(fp)
+                if hist is None:
+                    if len(self._sql) >= self.max_fingerprints:
+                        fp = OTHER_FINGERPRINT
+                    hist = self._sql.setdefault(fp, Histogram(SQL_BUCKETS))
+        hist.observe(seconds)
+
+        elapsed_ms = seconds * 1000.0
+        if self.slow_query_ms > 0 and elapsed_ms >= self.slow_query_ms:
+            with self._lock:
+                self._slow[fp] = self._slow.get(fp, 0) + 1
+            logger.warning("Consulta lenta (%.1f ms): %s", elapsed_ms, fp)
+
+    # --------------------------------------------------------
+    # Exportação (formato texto do Prometheus 0.0.4)
+    # --------------------------------------------------------
+
+    def render(self) -> str:
+        out: List[str] = []
+        with self._lock:
+            http_items = sorted(self._http.items())
+            sql_items = sorted(self._sql.items())
+            slow_items = sorted(self._slow.items())
+            in_flight = self._in_flight
+
+        out.append("# HELP gestflow_process_start_time_seconds Início do processo (epoch).")
+        out.append("# TYPE gestflow_process_start_time_seconds gauge")
+        out.append(f"gestflow_process_start_time_seconds {self.started_at:.3f}")
+
+        out.append("# HELP gestflow_http_requests_in_flight Requisições em andamento.")
+        out.append("# TYPE gestflow_http_requests_in_flight gauge")
+        out.append(f"gestflow_http_requests_in_flight {in_flight}")
+
+        self._render_histograms(
+            out,
+            "gestflow_http_request_duration_seconds",
+            "Tempo das requisições HTTP.",
+            [((("method", m), ("route", r), ("status", s)), h) for (m, r, s), h in http_items],
+        )
+        self._render_histograms(
+            out,
+            "gestflow_sql_duration_seconds",
+            "Tempo de execução de SQL por fingerprint do comando.",
+            [((("fingerprint", fp),), h) for fp, h in sql_items],
+        )
+
+        out.append("# HELP gestflow_sql_slow_queries_total Consultas acima de SLOW_QUERY_MS.")
+        out.append("# TYPE gestflow_sql_slow_queries_total counter")
+        for fp, count in slow_items:
+            out.append(f"gestflow_sql_slow_queries_total{{{_labels((('fingerprint', fp),))}}} {count}")
+
+        # Pools já abertos (principal e shards), somados; get_pool() criaria um só para o scrape.
+        pools = database.existing_pools()
+        if pools:
+            stats = {key: sum(p.stats()[key] for p in pools) for key in ("open", "idle")}
+            out.append("# HELP gestflow_sqlite_pool_connections Conexões dos pools (abertas / ociosas).")
+            out.append("# TYPE gestflow_sqlite_pool_connections gauge")
+            out.append(f'gestflow_sqlite_pool_connections{{state="open"}} {stats["open"]}')
+            out.append(f'gestflow_sqlite_pool_connections{{state="idle"}} {stats["idle"]}')
+
+        # Só lê escritoras que já existem: get_writer() criaria uma thread só para o scrape.
+        writers = database.existing_writers()
+        if writers:
+            stats = {key: sum(w.stats()[key] for w in writers) for key in ("jobs", "batches", "queued")}
+            out.append("# HELP gestflow_sqlite_writer_jobs_total Escritas confirmadas pela thread escritora.")
+            out.append("# TYPE gestflow_sqlite_writer_jobs_total counter")
+            out.append(f"gestflow_sqlite_writer_jobs_total {stats['jobs']}")
+            out.append("# HELP gestflow_sqlite_writer_batches_total Group commits (COMMITs) da thread escritora.")
+            out.append("# TYPE gestflow_sqlite_writer_batches_total counter")
+            out.append(f"gestflow_sqlite_writer_batches_total {stats['batches']}")
+            out.append("# HELP gestflow_sqlite_writer_queue_depth Escritas aguardando na fila.")
+            out.append("# TYPE gestflow_sqlite_writer_queue_depth gauge")
+            out.append(f"gestflow_sqlite_writer_queue_depth {stats['queued']}")
+
+        cache = sessions.existing_session_cache()
+        if cache is not None:
+            stats = cache.stats()
+            out.append("# HELP gestflow_session_flushed_rows_total Sessões gravadas pelo write-behind.")
+            out.append("# TYPE gestflow_session_flushed_rows_total counter")
+            out.append(f"gestflow_session_flushed_rows_total {stats['flushed_rows']}")
+            out.append("# HELP gestflow_session_flush_failures_total Gravações write-behind de sessão que falharam.")
+            out.append("# TYPE gestflow_session_flush_failures_total counter")
+            out.append(f"gestflow_session_flush_failures_total {stats['flush_failures']}")
+        return "\n".join(out) + "\n"
+
+    @staticmethod
+    def _render_histograms(
+        out: List[str],
+        name: str,
+        help_text: str,
+        series: List[Tuple[Tuple[Tuple[str, str], ...], Histogram]],
+    ) -> None:
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} histogram")
+        for labels, hist in series:
+            cumulative, total, count = hist.snapshot()
+            base = _labels(labels)
+            for bound, c in zip(hist.bounds, cumulative):
+                out.append(f'{name}_bucket{{{base},le="{_fmt(bound)}"}} {c}')
+            out.append(f'{name}_bucket{{{base},le="+Inf"}} {cumulative[-1]}')
+            out.append(f"{name}_sum{{{base}}} {total:.6f}")
+            out.append(f"{name}_count{{{base}}} {count}")
+
+
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> MetricsRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry(
+                max_fingerprints=config.METRICS_MAX_FINGERPRINTS,
+                slow_query_ms=config.SLOW_QUERY_MS,
+            )
+        return _registry
+
+
+# ============================================================
+# INTEGRAÇÃO COM O FLASK
+# ============================================================
+
+
+def install_metrics(app: Flask) -> MetricsRegistry:
+    """
+    Liga o tempo de requisições (before/after/teardown_request) e o observador de SQL
+    do database.py.
+    """
+    registry = get_registry()
+    database.set_sql_observer(registry.observe_sql)
+
+    @app.before_request
+    def _metrics_start() -> None:
+        g._metrics_started = time.perf_counter()
+        registry.request_started()
+
+    @app.after_request
+    def _metrics_record(response: Response) -> Response:
+        started = g.get("_metrics_started")
+        if started is not None:
+            # Rota do url_rule (ex.: "/bot"), nunca o path bruto: cardinalidade fixa.
+            route = request.url_rule.rule if request.url_rule is not None else "<sem rota>"
+            registry.observe_request(request.method, route, response.status_code, time.perf_counter() - started)
+        return response
+
+    @app.teardown_request
+    def _metrics_finish(_exc: Optional[BaseException]) -> None:
+        if g.pop("_metrics_started", None) is not None:
+            registry.request_finished()
+
+    return registry
+
+
+def metrics_response() -> Response:
+    """
+    Resposta do GET /metrics. Exige "Authorization: Bearer <METRICS_TOKEN>"; sem token
+    configurado a rota nem responde (app.py devolve 404).
+    """
+    expected = f"Bearer {config.METRICS_TOKEN}"
+    if not config.METRICS_TOKEN or not hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(), expected.encode()
+    ):
+        return Response("unauthorized", status=401, mimetype="text/plain")
+    body = get_registry().render()
+    return Response(body, status=200, content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,244 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\modules\outbound.py
+# Último recode: 2026-10-17 21:50 (America/Bahia)
+# Motivo: DeliveryPool para envio ativo em lote: workers com sender (conexão HTTP) próprio,
+#         token bucket global, retentativas com backoff para falhas transitórias.
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import config
+
+
+class TransientSendError(Exception):
+    """
+    Falha que vale a pena tentar de novo (429, 5xx, erro de rede).
+    """
+
+
+# Espaço reservado para o sufixo " (k/n)" das mensagens quebradas em partes.
+_PART_SUFFIX_RESERVE = 8
+
+
+def split_message(text: str, limit: Optional[int] = None) -> List[str]:
+    """
+    Quebra o texto em partes de até `limit` caracteres (padrão MAX_MESSAGE_LENGTH),
+    preferindo fim de linha, depois espaço; numera as partes quando há mais de uma.
+    """
+    limit = limit or config.MAX_MESSAGE_LENGTH
+    text = (text or "").strip()
+    if len(text) <= limit:
+        return [text]
+
+    budget = max(1, limit - _PART_SUFFIX_RESERVE)
+    parts: List[str] = []
+    rest = text
+    while rest:
+        if len(rest) <= budget:
+            parts.append(rest)
+            break
+        cut = rest.rfind("\n", 0, budget + 1)
+        if cut < budget // 2:
+            cut = rest.rfind(" ", 0, budget + 1)
+        if cut < budget // 2:
+            cut = budget
+        parts.append(rest[:cut].rstrip())
+        rest = rest[cut:].lstrip()
+    total = len(parts)
+    return [f"{part} ({i}/{total})" for i, part in enumerate(parts, 1)]
+
+
+class OutboundSender:
+    """
+    Contrato mínimo: send(to, body) envia uma mensagem e retorna um id do provedor.
+    """
+
+    def send(self, to: str, body: str) -> str:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class TwilioSender(OutboundSender):
+    def __init__(self) -> None:
+        config.require_twilio()
+        # Import lazy: o SDK do Twilio só é carregado quando o envio ativo é usado.
+        from twilio.rest import Client
+
+        self._client = Client(config.TWILIO_ACCOUNT_SID, config.TWILIO_AUTH_TOKEN)
+        self._from = config.TWILIO_WHATSAPP_FROM
+
+    def send(self, to: str, body: str) -> str:
+        try:
+            msg = self._client.messages.create(from_=self._from, to=to, body=body)
+        except Exception as exc:
+            status = getattr(exc, "status", None)
+            # requests.ConnectionError/Timeout herdam de OSError.
+            if isinstance(exc, OSError) or status == 429 or (isinstance(status, int) and status >= 500):
+                raise TransientSendError(str(exc)) from exc
+            raise
+        return str(msg.sid)
+
+
+class StubSender(OutboundSender):
+    """
+    Guarda as mensagens em memória; `delay` simula a latência do provedor e
+    `fail_rate` a fração de envios que falham de forma transitória.
+    """
+
+    def __init__(self, delay: float = 0.0, fail_rate: float = 0.0, seed: Optional[int] = None) -> None:
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.sent: List[Tuple[str, str]] = []
+        self.failures = 0
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def send(self, to: str, body: str) -> str:
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            if self.fail_rate and self._rnd.random() < self.fail_rate:
+                self.failures += 1
+                raise TransientSendError("falha simulada")
+            self.sent.append((to, body))
+            return f"STUB{len(self.sent):08d}"
+
+
+_sender: Optional[OutboundSender] = None
+_sender_lock = threading.Lock()
+
+
+def get_sender() -> OutboundSender:
+    """
+    Sender global conforme config.OUTBOUND_SENDER ("twilio" | "stub").
+    """
+    global _sender
+    with _sender_lock:
+        if _sender is None:
+            _sender = StubSender() if config.OUTBOUND_SENDER == "stub" else TwilioSender()
+        return _sender
+
+
+def set_sender(sender: Optional[OutboundSender]) -> None:
+    """
+    Troca o sender global (None volta a criar conforme config).
+    """
+    global _sender
+    with _sender_lock:
+        _sender = sender
+
+
+# ============================================================
+# ENVIO EM LOTE
+# ============================================================
+
+
+class TokenBucket:
+    """
+    Limite global de envios: `rate` por segundo com rajada de até `burst`.
+    acquire() bloqueia até haver token (rate <= 0 desliga o limite).
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(float(self.burst), self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def default_sender_factory() -> OutboundSender:
+    """
+    Um TwilioSender por worker (cada um com a própria sessão HTTP/keep-alive);
+    no modo stub todos compartilham o sender global, para inspeção.
+    """
+    if config.OUTBOUND_SENDER == "stub":
+        return get_sender()
+    return TwilioSender()
+
+
+class DeliveryPool:
+    """
+    Envia mensagens em paralelo respeitando o token bucket. Cada tarefa manda as
+    partes de uma mensagem em ordem, com retentativa por parte; o resultado do
+    Future é (partes enviadas, ids do provedor, tentativas, último erro).
+    """
+
+    def __init__(
+        self,
+        sender_factory: Callable[[], OutboundSender] = default_sender_factory,
+        workers: int = config.OUTBOUND_WORKERS,
+        rate_per_second: float = config.OUTBOUND_RATE_PER_SECOND,
+        burst: int = config.OUTBOUND_BURST,
+        max_attempts: int = config.OUTBOUND_MAX_ATTEMPTS,
+        backoff_seconds: float = config.OUTBOUND_BACKOFF_SECONDS,
+    ) -> None:
+        self.sender_factory = sender_factory
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_seconds = backoff_seconds
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self._local = threading.local()
+        self._senders: List[OutboundSender] = []
+        self._senders_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="outbound")
+
+    def submit(self, to: str, parts: Sequence[str], start_part: int = 0) -> "Future[Tuple[int, List[str], int, Optional[str]]]":
+        return self._executor.submit(self._deliver, to, list(parts), start_part)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        with self._senders_lock:
+            senders, self._senders = self._senders, []
+        for sender in senders:
+            sender.close()
+
+    def _sender(self) -> OutboundSender:
+        sender = getattr(self._local, "sender", None)
+        if sender is None:
+            sender = self.sender_factory()
+            self._local.sender = sender
+            with self._senders_lock:
+                self._senders.append(sender)
+        return sender
+
+    def _deliver(self, to: str, parts: List[str], start_part: int) -> Tuple[int, List[str], int, Optional[str]]:
+        sender = self._sender()
+        sent = start_part
+        provider_ids: List[str] = []
+        attempts = 0
+        for body in parts[start_part:]:
+            for attempt in range(self.max_attempts):
+                self.bucket.acquire()
+                attempts += 1
+                try:
+                    provider_ids.append(sender.send(to, body))
+                    break
+                except TransientSendError as exc:
+                    if attempt + 1 >= self.max_attempts:
+                        return sent, provider_ids, attempts, str(exc)
+                    # Backoff exponencial com jitter (evita rajadas sincronizadas).
+                    time.sleep(self.backoff_seconds * (2 ** attempt) * (0.5 + random.random()))
+                except Exception as exc:
+                    return sent, provider_ids, attempts, f"{type(exc).__name__}: {exc}"
+            sent += 1
+        return sent, provider_ids, attempts, None
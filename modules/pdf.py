@@ -0,0 +1,302 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\modules\pdf.py
+# Último recode: 2026-10-18 07:30 (America/Bahia)
+# Motivo: PDF de orçamentos fora da thread da requisição: weasyprint importado só nos workers
+#         (pool de processos com CSS/fontes já carregados), cache em PDF_TEMP_DIR por hash do
+#         conteúdo e limpeza do cache por idade e tamanho (sob o mesmo lock dos acertos de
+#         cache, para nunca apagar um PDF que acabou de ser devolvido).
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import html
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import config
+import database
+
+BUDGET_SQL = (
+    "SELECT b.id, b.code, b.total, b.created_at, c.name AS customer_name, co.name AS company_name "
+    "FROM budgets b "
+    "JOIN customers c ON c.id = b.customer_id "
+    "JOIN companies co ON co.id = b.company_id "
+    "WHERE b.company_id=? AND b.id=?;"
+)
+BUDGET_ITEMS_SQL = "SELECT description_snapshot, unit_price, qty, subtotal FROM budget_items WHERE budget_id=? ORDER BY id;"
+
+# Muda quando o layout muda, para invalidar PDFs antigos do cache.
+TEMPLATE_VERSION = "1"
+
+BUDGET_CSS = """
+@page { size: A4; margin: 18mm 15mm; @bottom-center { content: element(footer); } }
+body { font-family: "DejaVu Sans", Arial, sans-serif; font-size: 10pt; color: #222; }
+h1 { font-size: 16pt; margin: 0 0 4mm 0; }
+.meta { margin-bottom: 6mm; }
+.meta td { padding: 1mm 4mm 1mm 0; }
+table.items { width: 100%; border-collapse: collapse; }
+table.items th { background: #eee; text-align: left; padding: 2mm; border-bottom: 1px solid #999; }
+table.items td { padding: 2mm; border-bottom: 1px solid #ddd; }
+td.num, th.num { text-align: right; }
+.total { margin-top: 5mm; text-align: right; font-size: 12pt; font-weight: bold; }
+footer { position: running(footer); font-size: 8pt; color: #666; text-align: center; }
+"""
+
+# ============================================================
+# WORKER (processo separado)
+# ============================================================
+
+_worker_css: Any = None
+_worker_fonts: Any = None
+
+
+def _worker_init() -> None:
+    """
+    Roda uma vez em cada processo do pool: paga o import do weasyprint e o parse do CSS/fontes.
+    """
+    global _worker_css, _worker_fonts
+    from weasyprint import CSS
+    from weasyprint.text.fonts import FontConfiguration
+
+    _worker_fonts = FontConfiguration()
+    _worker_css = CSS(string=BUDGET_CSS, font_config=_worker_fonts)
+
+
+def _worker_render(document_html: str, target: str) -> str:
+    from weasyprint import HTML
+
+    tmp = f"{target}.{os.getpid()}.tmp"
+    HTML(string=document_html).write_pdf(tmp, stylesheets=[_worker_css], font_config=_worker_fonts)
+    # Troca atômica: quem lê o cache nunca vê um PDF pela metade.
+    os.replace(tmp, target)
+    return target
+
+
+# ============================================================
+# RENDERER (processo principal)
+# ============================================================
+
+
+class PdfRenderer:
+    def __init__(
+        self,
+        cache_dir: Path,
+        workers: int = 2,
+        max_age_seconds: float = 7 * 86400,
+        max_bytes: int = 200 * 1024 * 1024,
+    ) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.workers = workers
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        # hash -> render em andamento (pedidos iguais simultâneos esperam o mesmo Future)
+        self._in_flight: Dict[str, Future] = {}
+        self.hits = 0
+        self.renders = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # forkserver (spawn no Windows): fork() dentro do processo multithread do waitress
+                # herdaria locks presos por outras threads e as conexões SQLite abertas.
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(method),
+                    initializer=_worker_init,
+                )
+            return self._executor
+
+    def cache_path(self, document_html: str, prefix: str = "doc") -> Path:
+        digest = hashlib.sha256(f"{TEMPLATE_VERSION}\0{document_html}".encode("utf-8")).hexdigest()[:32]
+        return self.cache_dir / f"{prefix}-{digest}.pdf"
+
+    def render_async(self, document_html: str, prefix: str = "doc") -> Future:
+        """
+        Devolve um Future com o caminho do PDF. Conteúdo já renderizado sai do cache na hora.
+        """
+        target = self.cache_path(document_html, prefix)
+        key = target.name
+        with self._lock:
+            try:
+                # mtime marca o último uso; a limpeza remove primeiro os menos usados.
+                os.utime(target, None)
+            except FileNotFoundError:
+                pass
+            else:
+                self.hits += 1
+                done: Future = Future()
+                done.set_result(target)
+                return done
+            pending = self._in_flight.get(key)
+            if pending is not None:
+                return pending
+            outer: Future = Future()
+            self._in_flight[key] = outer
+            self.renders += 1
+
+        def _done(f: Future) -> None:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            if f.cancelled():
+                # f.exception() levantaria CancelledError dentro do callback.
+                outer.cancel()
+                return
+            exc = f.exception()
+            if exc is not None:
+                outer.set_exception(exc)
+                return
+            path = Path(f.result())
+            self.evict(keep=path)
+            outer.set_result(path)
+
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            inner = self._get_executor().submit(_worker_render, document_html, str(target))
+        except BaseException as exc:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            outer.set_exception(exc)
+            return outer
+        inner.add_done_callback(_done)
+        return outer
+
+    def render(self, document_html: str, prefix: str = "doc", timeout: Optional[float] = 60.0) -> Path:
+        return self.render_async(document_html, prefix).result(timeout=timeout)
+
+    def evict(self, keep: Optional[Path] = None) -> int:
+        """
+        Remove PDFs mais velhos que max_age e, se ainda passar de max_bytes, os de uso mais antigo.
+        Varre e apaga sob o lock dos acertos de cache (um acerto concorrente não recebe um
+        caminho apagado); keep é o PDF recém-renderizado, que nunca sai. Retorna quantos
+        arquivos foram apagados.
+        """
+        if not self.cache_dir.exists():
+            return 0
+        removed = 0
+        with self._lock:
+            now = time.time()
+            files = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file() and entry.name.endswith(".pdf"):
+                    st = entry.stat()
+                    files.append((st.st_mtime, st.st_size, entry.path))
+
+            total = sum(size for _, size, _ in files)
+            for mtime, size, path in sorted(files):
+                if now - mtime <= self.max_age_seconds and total <= self.max_bytes:
+                    break
+                if keep is not None and os.path.basename(path) == keep.name:
+                    continue
+                try:
+                    os.remove(path)
+                    removed += 1
+                    total -= size
+                except OSError:
+                    pass
+        return removed
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+_renderer: Optional[PdfRenderer] = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer() -> PdfRenderer:
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = PdfRenderer(
+                cache_dir=config.PDF_TEMP_DIR,
+                workers=config.PDF_RENDER_WORKERS,
+                max_age_seconds=config.PDF_CACHE_MAX_AGE_DAYS * 86400,
+                max_bytes=config.PDF_CACHE_MAX_MB * 1024 * 1024,
+            )
+        return _renderer
+
+
+def shutdown_renderer() -> None:
+    global _renderer
+    with _renderer_lock:
+        renderer, _renderer = _renderer, None
+    if renderer is not None:
+        renderer.shutdown()
+
+
+atexit.register(shutdown_renderer)
+
+
+# ============================================================
+# ORÇAMENTO
+# ============================================================
+
+
+def _money(value: float) -> str:
+    text = f"{float(value):,.2f}"
+    return "R$ " + text.replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def _qty(value: float) -> str:
+    return f"{float(value):g}".replace(".", ",")
+
+
+def budget_html(budget: Dict[str, Any], items: List[Dict[str, Any]], company_name: str, customer_name: str) -> str:
+    esc = html.escape
+    created = str(budget["created_at"])[:10]
+    try:
+        valid_until = (datetime.strptime(created, "%Y-%m-%d") + timedelta(days=config.ORCAMENTO_VALIDADE_DIAS)).strftime("%d/%m/%Y")
+        created_br = datetime.strptime(created, "%Y-%m-%d").strftime("%d/%m/%Y")
+    except ValueError:
+        valid_until = ""
+        created_br = created
+
+    rows = "".join(
+        "<tr>"
+        f"<td>{esc(str(it['description_snapshot']))}</td>"
+        f"<td class='num'>{_qty(it['qty'])}</td>"
+        f"<td class='num'>{_money(it['unit_price'])}</td>"
+        f"<td class='num'>{_money(it['subtotal'])}</td>"
+        "</tr>"
+        for it in items
+    )
+    return (
+        "<!DOCTYPE html><html lang='pt-BR'><head><meta charset='utf-8'>"
+        f"<title>{esc(str(budget['code']))}</title></head><body>"
+        f"<footer>{esc(config.PDF_RODAPE_PADRAO)}</footer>"
+        f"<h1>{esc(company_name)} — Orçamento {esc(str(budget['code']))}</h1>"
+        "<table class='meta'>"
+        f"<tr><td>Cliente:</td><td>{esc(customer_name)}</td></tr>"
+        f"<tr><td>Data:</td><td>{created_br}</td></tr>"
+        f"<tr><td>Válido até:</td><td>{valid_until}</td></tr>"
+        "</table>"
+        "<table class='items'><thead><tr><th>Descrição</th><th class='num'>Qtd</th>"
+        "<th class='num'>Unitário</th><th class='num'>Subtotal</th></tr></thead>"
+        f"<tbody>{rows}</tbody></table>"
+        f"<div class='total'>Total: {_money(budget['total'])}</div>"
+        "</body></html>"
+    )
+
+
+def render_budget_pdf(company_id: int, budget_id: int, timeout: Optional[float] = 60.0) -> Optional[Path]:
+    """
+    Gera (ou reaproveita do cache) o PDF do orçamento. None se o orçamento não existir.
+    """
+    budget = database.fetch_one(BUDGET_SQL, (company_id, budget_id))
+    if not budget:
+        return None
+    items = database.fetch_all(BUDGET_ITEMS_SQL, (budget_id,))
+    document = budget_html(budget, items, budget["company_name"], budget["customer_name"])
+    return get_renderer().render(document, prefix=f"orc-{company_id}", timeout=timeout)
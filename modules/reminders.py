@@ -0,0 +1,314 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\modules\reminders.py
+# Último recode: 2026-10-17 22:40 (America/Bahia)
+# Motivo: Envio ativo agendado: lembretes de contas a receber (a vencer / vencidas) para
+#         clientes e resumo diário para os donos. Alvos lidos em lotes, gravados em
+#         message_deliveries (deduplicados por dia) e entregues pelo DeliveryPool.
+#         Cada empresa roda dentro de database.tenant() (shard da empresa, se houver).
+#
+# Uso (CLI):
+#   python -m modules.reminders run [--company-id 1] [--date 2026-10-17] [--dry-run]
+#   python -m modules.reminders run --loop          (roda todo dia às REMINDER_HOUR)
+#   python -m modules.reminders requeue-failed [--company-id 1]
+
+from __future__ import annotations
+
+import argparse
+import re
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import config
+import database
+from modules import aging, reports
+from modules.outbound import DeliveryPool, split_message
+
+KIND_DUE = "due_reminder"
+KIND_OVERDUE = "overdue_reminder"
+KIND_SUMMARY = "daily_summary"
+
+_INSERT_SQL = (
+    "INSERT INTO message_deliveries "
+    "(company_id, kind, ref_type, ref_id, to_number, body, parts, dedupe_key, created_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(dedupe_key) DO NOTHING;"
+)
+
+PENDING_SQL = (
+    "SELECT id, to_number, body, parts, parts_sent, provider_ids FROM message_deliveries "
+    "WHERE status = 'pending' AND id > ? {company_filter}ORDER BY id LIMIT ?;"
+)
+
+_NON_DIGITS_RE = re.compile(r"\D")
+
+
+def whatsapp_address(phone: Optional[str]) -> Optional[str]:
+    """
+    Normaliza o telefone do cadastro para "whatsapp:+55...". None se não der para enviar.
+    """
+    phone = (phone or "").strip()
+    if phone.startswith("whatsapp:"):
+        return phone
+    digits = _NON_DIGITS_RE.sub("", phone)
+    if len(digits) < 10:
+        return None
+    if not phone.startswith("+") and len(digits) <= 11:
+        digits = "55" + digits  # DDD + número, sem código do país
+    return f"whatsapp:+{digits}"
+
+
+def _br_date(iso_day: str) -> str:
+    return datetime.strptime(iso_day, "%Y-%m-%d").strftime("%d/%m/%Y")
+
+
+def _money(value: float) -> str:
+    return ("R$ " + f"{value:,.2f}").replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+# ============================================================
+# SELEÇÃO DE ALVOS / ENFILEIRAMENTO
+# ============================================================
+
+
+def _receivable_message(kind: str, row: Dict[str, Any], company_name: str) -> str:
+    name = (row["customer_name"] or "").split(" ")[0] or "cliente"
+    if kind == KIND_DUE:
+        return (
+            f"Olá, {name}! Lembrete de {company_name}: a parcela da compra {row['sale_code']} "
+            f"no valor de {_money(row['balance'])} vence em {_br_date(row['due_date'])}."
+        )
+    return (
+        f"Olá, {name}! {company_name} informa: a parcela da compra {row['sale_code']} "
+        f"no valor de {_money(row['balance'])} venceu em {_br_date(row['due_date'])}. "
+        "Se já pagou, desconsidere esta mensagem."
+    )
+
+
+def _receivable_targets(
+    tx: database.Transaction, kind: str, company_id: int, today: date, days_ahead: int
+) -> Iterable[List[Dict[str, Any]]]:
+    # Mesmas consultas do aging (índices parciais de títulos em aberto), lidas em lotes.
+    if kind == KIND_DUE:
+        sql = aging.DUE_BETWEEN_SQL["receivable"]
+        params: Tuple[Any, ...] = (company_id, today.isoformat(), (today + timedelta(days=days_ahead)).isoformat())
+    else:
+        sql = aging.OVERDUE_SQL["receivable"]
+        params = (company_id, today.isoformat())
+    return tx.fetch_batches(sql, params, size=config.REMINDER_BATCH_SIZE)
+
+
+def enqueue_receivable_reminders(
+    company_id: int,
+    today: Optional[date] = None,
+    days_ahead: Optional[int] = None,
+) -> int:
+    """
+    Grava (pending) os lembretes do dia para títulos a vencer e vencidos da empresa.
+    Vencidos são lembrados no máximo uma vez por semana. Retorna quantos foram criados.
+    Leitura e gravação na mesma transação: uma conexão só (pool de 1 não trava) e o
+    enfileiramento do dia entra inteiro ou não entra.
+    """
+    today = today or reports.local_today()
+    days_ahead = config.REMINDER_DAYS_AHEAD if days_ahead is None else days_ahead
+    company = database.fetch_one("SELECT name FROM companies WHERE id = ?;", (company_id,))
+    company_name = company["name"] if company else "GESTFLOW"
+    now = database.utc_iso()
+    iso_year, iso_week, _ = today.isocalendar()
+
+    created = 0
+    with database.transaction() as tx:
+        for kind in (KIND_DUE, KIND_OVERDUE):
+            period = today.isoformat() if kind == KIND_DUE else f"{iso_year}-W{iso_week:02d}"
+            for batch in _receivable_targets(tx, kind, company_id, today, days_ahead):
+                rows = []
+                for row in batch:
+                    to_number = whatsapp_address(row["phone"])
+                    if to_number is None:
+                        continue
+                    body = _receivable_message(kind, row, company_name)
+                    rows.append((
+                        company_id, kind, "receivable", row["id"], to_number, body,
+                        len(split_message(body)), f"{kind}:{row['id']}:{period}", now,
+                    ))
+                if rows:
+                    created += tx.execute_many(_INSERT_SQL, rows)
+    return created
+
+
+def _summary_message(company_id: int, day: date) -> str:
+    iso_day = day.isoformat()
+    sales = reports.sales_totals(company_id, iso_day, iso_day)
+    received = sum(
+        row["amount"] or 0.0 for row in reports.payments_totals(company_id, iso_day, iso_day) if row["direction"] == "in"
+    )
+    receivable = aging.aging("receivable", company_id, today=day + timedelta(days=1))
+    payable = aging.aging("payable", company_id, today=day + timedelta(days=1))
+    overdue_in = sum(v["balance"] for b, v in receivable.items() if b != "a_vencer")
+    overdue_out = sum(v["balance"] for b, v in payable.items() if b != "a_vencer")
+    return (
+        f"Resumo de {day.strftime('%d/%m/%Y')}\n"
+        f"Vendas: {sales['sales_count']} ({_money(sales['total'])})\n"
+        f"Recebido: {_money(received)}\n"
+        f"A receber em atraso: {_money(overdue_in)}\n"
+        f"A receber em dia: {_money(receivable['a_vencer']['balance'])}\n"
+        f"A pagar em atraso: {_money(overdue_out)}"
+    )
+
+
+def enqueue_daily_summary(company_id: int, today: Optional[date] = None) -> int:
+    """
+    Grava o resumo do dia anterior para cada dono (role = 'owner') da empresa.
+    """
+    today = today or reports.local_today()
+    owners = database.fetch_all(
+        "SELECT id, whatsapp FROM users WHERE company_id = ? AND role = 'owner';", (company_id,)
+    )
+    if not owners:
+        return 0
+    body = _summary_message(company_id, today - timedelta(days=1))
+    parts = len(split_message(body))
+    now = database.utc_iso()
+    rows = []
+    for owner in owners:
+        to_number = whatsapp_address(owner["whatsapp"])
+        if to_number is not None:
+            rows.append((
+                company_id, KIND_SUMMARY, "user", owner["id"], to_number, body, parts,
+                f"{KIND_SUMMARY}:{owner['id']}:{today.isoformat()}", now,
+            ))
+    return database.execute_many(_INSERT_SQL, rows) if rows else 0
+
+
+# ============================================================
+# ENTREGA
+# ============================================================
+
+
+def deliver_pending(
+    pool: DeliveryPool,
+    company_id: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Entrega as mensagens pendentes em lotes (paginação por id) e grava o resultado de
+    cada lote em uma transação. Falha definitiva vira status 'failed' (ver requeue_failed).
+    """
+    batch_size = batch_size or config.REMINDER_BATCH_SIZE
+    sql = PENDING_SQL.format(company_filter="AND company_id = ? " if company_id is not None else "")
+    stats = {"sent": 0, "failed": 0}
+    last_id = 0
+    while True:
+        params: Tuple[Any, ...] = (last_id, company_id, batch_size) if company_id is not None else (last_id, batch_size)
+        rows = database.fetch_all(sql, params)
+        if not rows:
+            return stats
+        last_id = rows[-1]["id"]
+
+        futures = [(row, pool.submit(row["to_number"], split_message(row["body"]), row["parts_sent"])) for row in rows]
+        updates = []
+        now = database.utc_iso()
+        for row, future in futures:
+            parts_sent, provider_ids, attempts, error = future.result()
+            ids = ",".join(filter(None, [row["provider_ids"], *provider_ids])) or None
+            status = "sent" if error is None else "failed"
+            stats[status] += 1
+            updates.append((status, parts_sent, attempts, ids, error, now if error is None else None, row["id"]))
+
+        with database.transaction() as tx:
+            tx.execute_many(
+                "UPDATE message_deliveries SET status = ?, parts_sent = ?, attempts = attempts + ?, "
+                "provider_ids = ?, last_error = ?, sent_at = ? WHERE id = ?;",
+                updates,
+            )
+
+
+def requeue_failed(company_id: Optional[int] = None) -> int:
+    """
+    Devolve para 'pending' as mensagens que falharam (retoma da parte que parou).
+    """
+    sql = "UPDATE message_deliveries SET status = 'pending' WHERE status = 'failed'"
+    params: Tuple[Any, ...] = ()
+    if company_id is not None:
+        sql += " AND company_id = ?"
+        params = (company_id,)
+    with database.transaction() as tx:
+        tx.execute(sql + ";", params)
+        return int(tx.cur.rowcount or 0)
+
+
+def run_once(
+    today: Optional[date] = None,
+    company_id: Optional[int] = None,
+    pool: Optional[DeliveryPool] = None,
+    deliver: bool = True,
+) -> Dict[str, int]:
+    """
+    Uma rodada completa: enfileira lembretes e resumos e entrega tudo que está pendente.
+    """
+    database.init_db()
+    today = today or reports.local_today()
+    if company_id is not None:
+        company_ids = [company_id]
+    else:
+        company_ids = [row["id"] for row in database.fetch_all("SELECT id FROM companies ORDER BY id;")]
+
+    stats = {"queued": 0, "sent": 0, "failed": 0}
+    own_pool = deliver and pool is None
+    if own_pool:
+        pool = DeliveryPool()
+    try:
+        for cid in company_ids:
+            with database.tenant(cid):
+                stats["queued"] += enqueue_receivable_reminders(cid, today)
+                stats["queued"] += enqueue_daily_summary(cid, today)
+                if deliver:
+                    result = deliver_pending(pool, cid)
+                    stats["sent"] += result["sent"]
+                    stats["failed"] += result["failed"]
+    finally:
+        if own_pool:
+            pool.close()
+    return stats
+
+
+def _seconds_until(hour: int) -> float:
+    now = datetime.now(timezone(timedelta(hours=config.ROLLUP_DAY_OFFSET_HOURS)))
+    target = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m modules.reminders")
+    parser.add_argument("command", choices=("run", "requeue-failed"))
+    parser.add_argument("--company-id", type=int)
+    parser.add_argument("--date", help="dia de referência (YYYY-MM-DD); padrão: hoje")
+    parser.add_argument("--dry-run", action="store_true", help="só enfileira, não envia")
+    parser.add_argument("--loop", action="store_true", help="repete todo dia às REMINDER_HOUR")
+    args = parser.parse_args(argv)
+
+    if args.command == "requeue-failed":
+        database.init_db()
+        if args.company_id is not None:
+            company_ids = [args.company_id]
+        else:
+            company_ids = [row["id"] for row in database.fetch_all("SELECT id FROM companies ORDER BY id;")]
+        total = 0
+        for cid in company_ids:
+            with database.tenant(cid):
+                total += requeue_failed(cid)
+        print(f"{total} mensagem(ns) devolvida(s) para a fila.")
+        return 0
+
+    today = date.fromisoformat(args.date) if args.date else None
+    while True:
+        stats = run_once(today=today, company_id=args.company_id, deliver=not args.dry_run)
+        print(f"enfileiradas={stats['queued']} enviadas={stats['sent']} falhas={stats['failed']}")
+        if not args.loop:
+            return 1 if stats["failed"] else 0
+        time.sleep(_seconds_until(config.REMINDER_HOUR))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
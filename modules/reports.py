@@ -0,0 +1,140 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\modules\reports.py
+# Último recode: 2026-10-18 03:20 (America/Bahia)
+# Motivo: Relatórios de vendas, recebimentos e fluxo de caixa por período lendo os rollups
+#         diários (sales_daily / payments_daily), com comando de rebuild/backfill que também
+#         lê os anos arquivados (modules/archive.py).
+#
+# Uso (CLI): python -m modules.reports summary --company-id 1 [--period today|month]
+#            python -m modules.reports rebuild [--company-id N]
+
+from __future__ import annotations
+
+import argparse
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+import database
+from modules import archive
+
+SALES_TOTALS_SQL = (
+    "SELECT COALESCE(SUM(sales_count), 0) AS sales_count, COALESCE(SUM(total), 0) AS total "
+    "FROM sales_daily "
+    "WHERE company_id = ? AND day BETWEEN ? AND ? AND (? OR status <> 'cancelled');"
+)
+SALES_BY_DAY_SQL = (
+    "SELECT day, SUM(sales_count) AS sales_count, SUM(total) AS total "
+    "FROM sales_daily "
+    "WHERE company_id = ? AND day BETWEEN ? AND ? AND status <> 'cancelled' "
+    "GROUP BY day ORDER BY day;"
+)
+PAYMENTS_TOTALS_SQL = (
+    "SELECT direction, method, SUM(payments_count) AS payments_count, SUM(amount) AS amount "
+    "FROM payments_daily "
+    "WHERE company_id = ? AND day BETWEEN ? AND ? "
+    "GROUP BY direction, method ORDER BY direction, method;"
+)
+CASH_FLOW_SQL = (
+    "SELECT day, "
+    "SUM(CASE WHEN direction = 'in' THEN amount ELSE 0 END) AS amount_in, "
+    "SUM(CASE WHEN direction = 'out' THEN amount ELSE 0 END) AS amount_out, "
+    "SUM(CASE WHEN direction = 'in' THEN amount ELSE -amount END) AS net "
+    "FROM payments_daily "
+    "WHERE company_id = ? AND day BETWEEN ? AND ? "
+    "GROUP BY day ORDER BY day;"
+)
+
+
+def local_today() -> date:
+    offset = timezone(timedelta(hours=config.ROLLUP_DAY_OFFSET_HOURS))
+    return datetime.now(offset).date()
+
+
+def period_range(period: str, today: Optional[date] = None) -> Tuple[str, str]:
+    """
+    Intervalo fechado (YYYY-MM-DD, YYYY-MM-DD) para "today", "yesterday", "week" ou "month".
+    """
+    today = today or local_today()
+    if period == "today":
+        start = end = today
+    elif period == "yesterday":
+        start = end = today - timedelta(days=1)
+    elif period == "week":
+        start, end = today - timedelta(days=today.weekday()), today
+    elif period == "month":
+        start, end = today.replace(day=1), today
+    else:
+        raise ValueError(f"Período desconhecido: {period!r}")
+    return start.isoformat(), end.isoformat()
+
+
+def sales_totals(company_id: int, start_day: str, end_day: str, include_cancelled: bool = False) -> Dict[str, Any]:
+    """
+    Quantidade e total vendido no intervalo (dias locais, inclusive).
+    """
+    row = database.fetch_one(SALES_TOTALS_SQL, (company_id, start_day, end_day, 1 if include_cancelled else 0))
+    return {"sales_count": int(row["sales_count"]), "total": float(row["total"])}
+
+
+def sales_by_day(company_id: int, start_day: str, end_day: str) -> List[Dict[str, Any]]:
+    return database.fetch_all(SALES_BY_DAY_SQL, (company_id, start_day, end_day))
+
+
+def payments_totals(company_id: int, start_day: str, end_day: str) -> List[Dict[str, Any]]:
+    """
+    Pagamentos por direção (in/out) e método no intervalo.
+    """
+    return database.fetch_all(PAYMENTS_TOTALS_SQL, (company_id, start_day, end_day))
+
+
+def cash_flow(company_id: int, start_day: str, end_day: str) -> List[Dict[str, Any]]:
+    """
+    Entradas, saídas e saldo por dia.
+    """
+    return database.fetch_all(CASH_FLOW_SQL, (company_id, start_day, end_day))
+
+
+def rebuild(company_id: Optional[int] = None) -> None:
+    """
+    Recria triggers (com o fuso atual) e recalcula os rollups a partir de sales/payments,
+    incluindo os anos arquivados. Os triggers vão numa transação à parte: na conexão com o
+    histórico anexado, "sales" e "payments" são views.
+    """
+    database.init_db()
+    with database.transaction() as tx:
+        database.create_rollup_triggers(tx.cur)
+    with archive.history_transaction() as tx:
+        database.rebuild_rollups(tx.cur, company_id)
+
+
+def _money(value: float) -> str:
+    return ("R$ " + f"{value:,.2f}").replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m modules.reports")
+    parser.add_argument("command", choices=("summary", "rebuild"))
+    parser.add_argument("--company-id", type=int, default=None)
+    parser.add_argument("--period", default="today", choices=("today", "yesterday", "week", "month"))
+    args = parser.parse_args(argv)
+
+    database.init_db()
+    if args.command == "rebuild":
+        rebuild(args.company_id)
+        print("Rollups diários recalculados.")
+        return 0
+
+    if args.company_id is None:
+        parser.error("summary exige --company-id")
+    start, end = period_range(args.period)
+    sales = sales_totals(args.company_id, start, end)
+    print(f"Período {start} a {end}")
+    print(f"Vendas: {sales['sales_count']} ({_money(sales['total'])})")
+    for row in payments_totals(args.company_id, start, end):
+        label = "Entradas" if row["direction"] == "in" else "Saídas"
+        print(f"{label} {row['method']}: {row['payments_count']} ({_money(row['amount'])})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
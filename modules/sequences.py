@@ -0,0 +1,128 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\modules\sequences.py
+# Último recode: 2026-10-17 12:30 (America/Bahia)
+# Motivo: Alocador de códigos ORC/VEN sobre a tabela sequences: número tomado de forma atômica
+#         com um único UPSERT ... RETURNING, reserva opcional de blocos em memória e virada de ano.
+
+from __future__ import annotations
+
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import config
+import database
+
+KEY_BUDGET = "BUDGET"
+KEY_SALE = "SALE"
+
+_PREFIXES = {
+    KEY_BUDGET: config.ORCAMENTO_PREFIX,
+    KEY_SALE: config.VENDA_PREFIX,
+}
+
+# next_number é o próximo inteiro a emitir. Reservar `block` números significa
+# avançar next_number em `block`; o RETURNING devolve o fim (exclusivo) do bloco.
+UPSERT_SQL = """
+    INSERT INTO sequences (company_id, key, year, next_number)
+    VALUES (:company_id, :key, :year, 1 + :block)
+    ON CONFLICT(company_id, key, year) DO UPDATE SET next_number = next_number + :block
+    RETURNING next_number;
+"""
+
+
+def current_year() -> int:
+    return datetime.now(ZoneInfo(config.TIMEZONE)).year
+
+
+def format_code(key: str, year: int, number: int) -> str:
+    """
+    Ex.: ORC-2026-0001 / VEN-2026-0042.
+    """
+    return f"{_PREFIXES[key]}-{year}-{number:04d}"
+
+
+def _reserve(company_id: int, key: str, year: int, block: int, tx: Optional[database.Transaction]) -> int:
+    params = {"company_id": company_id, "key": key, "year": year, "block": block}
+    if tx is not None:
+        row = tx.insert_returning(UPSERT_SQL, params)
+    else:
+        row = database.insert_returning(UPSERT_SQL, params)
+    # Primeiro número do bloco reservado.
+    return int(row["next_number"]) - block
+
+
+class SequenceAllocator:
+    """
+    Emite números sequenciais por (company_id, key, ano).
+
+    block_size=1: cada número é um UPSERT atômico (sem buracos enquanto as transações confirmarem).
+    block_size>1: reserva blocos no banco e serve o restante da memória do processo,
+    cortando escritas; números não usados de um bloco se perdem ao reiniciar (buracos, nunca duplicatas).
+    """
+
+    def __init__(self, block_size: int = 1) -> None:
+        if block_size < 1:
+            raise ValueError("block_size deve ser >= 1")
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        # (company_id, key, year) -> (próximo número, fim exclusivo do bloco)
+        self._blocks: Dict[Tuple[int, str, int], Tuple[int, int]] = {}
+
+    def next_number(
+        self,
+        company_id: int,
+        key: str,
+        year: Optional[int] = None,
+        tx: Optional[database.Transaction] = None,
+    ) -> Tuple[int, int]:
+        """
+        Retorna (ano, número). Com `tx`, o número é tomado dentro da transação do chamador
+        (sem bloco em memória), de modo que um rollback devolve o número.
+        """
+        if key not in _PREFIXES:
+            raise ValueError(f"Sequência desconhecida: {key!r}")
+        year = year or current_year()
+
+        if tx is not None or self.block_size == 1:
+            return year, _reserve(company_id, key, year, 1, tx)
+
+        slot = (company_id, key, year)
+        with self._lock:
+            current, end = self._blocks.get(slot, (0, 0))
+            if current >= end:
+                current = _reserve(company_id, key, year, self.block_size, None)
+                end = current + self.block_size
+                # Virada de ano: blocos de anos anteriores não servem mais.
+                for stale in [s for s in self._blocks if s[:2] == slot[:2] and s[2] < year]:
+                    del self._blocks[stale]
+            self._blocks[slot] = (current + 1, end)
+        return year, current
+
+    def next_code(
+        self,
+        company_id: int,
+        key: str,
+        year: Optional[int] = None,
+        tx: Optional[database.Transaction] = None,
+    ) -> str:
+        year, number = self.next_number(company_id, key, year=year, tx=tx)
+        return format_code(key, year, number)
+
+    def reset(self) -> None:
+        """
+        Descarta blocos em memória (ex.: após trocar de banco).
+        """
+        with self._lock:
+            self._blocks.clear()
+
+
+_default_allocator = SequenceAllocator(block_size=config.SEQUENCE_BLOCK_SIZE)
+
+
+def next_budget_code(company_id: int, tx: Optional[database.Transaction] = None) -> str:
+    return _default_allocator.next_code(company_id, KEY_BUDGET, tx=tx)
+
+
+def next_sale_code(company_id: int, tx: Optional[database.Transaction] = None) -> str:
+    return _default_allocator.next_code(company_id, KEY_SALE, tx=tx)
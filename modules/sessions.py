@@ -0,0 +1,376 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\modules\sessions.py
+# Último recode: 2026-10-18 06:50 (America/Bahia)
+# Motivo: Cache em memória (TTL + LRU, com teto de memória) de usuário e sessão WhatsApp por
+#         (company_id, whatsapp), com contexto já decodificado e gravação write-behind em wa_sessions.
+#         Gravações serializadas (snapshot sob o lock) para que um estado antigo nunca sobrescreva
+#         um mais novo. Falhas de gravação vão para o log e para stats()["flush_failures"].
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+import database
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[int, str]
+
+DEFAULT_STATE = "idle"
+
+# Custo fixo estimado de uma entrada (objeto, chave, dicts vazios) para o teto de memória.
+_ENTRY_OVERHEAD_BYTES = 512
+
+# Consultas do cache (conferidas por benchmarks/check_query_plans.py).
+USER_SQL = "SELECT id, company_id, whatsapp, name, role FROM users WHERE company_id=? AND whatsapp=?;"
+SESSION_SQL = "SELECT state, context_json FROM wa_sessions WHERE company_id=? AND whatsapp=?;"
+
+_UPSERT_SESSION_SQL = """
+    INSERT INTO wa_sessions (company_id, whatsapp, state, context_json, updated_at)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(company_id, whatsapp) DO UPDATE SET
+        state = excluded.state,
+        context_json = excluded.context_json,
+        updated_at = excluded.updated_at;
+"""
+
+
+class Session:
+    """
+    Estado da conversa de um remetente. `user` é a linha de users (ou None se não cadastrado).
+    """
+
+    __slots__ = ("company_id", "whatsapp", "user", "state", "context", "dirty", "expires_at", "size")
+
+    def __init__(
+        self,
+        company_id: int,
+        whatsapp: str,
+        user: Optional[Dict[str, Any]],
+        state: str,
+        context: Dict[str, Any],
+        size: int,
+    ) -> None:
+        self.company_id = company_id
+        self.whatsapp = whatsapp
+        self.user = user
+        self.state = state
+        self.context = context
+        self.dirty = False
+        self.expires_at = 0.0
+        self.size = size
+
+
+def _estimate_size(context_json: Optional[str], user: Optional[Dict[str, Any]]) -> int:
+    size = _ENTRY_OVERHEAD_BYTES + len(context_json or "")
+    if user:
+        size += sum(sys.getsizeof(v) for v in user.values())
+    return size
+
+
+class SessionCache:
+    def __init__(
+        self,
+        ttl_seconds: float = 300.0,
+        max_entries: int = 10000,
+        max_bytes: int = 32 * 1024 * 1024,
+        flush_interval: float = 2.0,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+
+        self._entries: "OrderedDict[Key, Session]" = OrderedDict()
+        self._bytes = 0
+        # Entradas sujas removidas do cache cuja gravação ainda não terminou.
+        self._pending: Dict[Key, Session] = {}
+        self._lock = threading.Lock()
+        # Serializa snapshot + gravação: quem tira o snapshot primeiro grava primeiro.
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flushed_rows = 0
+        self.flush_failures = 0
+
+    # ------------------------------------------------------------
+    # LEITURA
+    # ------------------------------------------------------------
+
+    def get(self, company_id: int, whatsapp: str) -> Session:
+        key = (company_id, whatsapp)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                entry.expires_at = now + self.ttl_seconds
+                self.hits += 1
+                return entry
+            self.misses += 1
+            if self._reinstate_locked(key, now):
+                return self._entries[key]
+
+        # Fora do lock: I/O de banco não segura as outras threads.
+        loaded = self._load(company_id, whatsapp)
+
+        evicted: List[Session] = []
+        with self._lock:
+            if self._reinstate_locked(key, now):
+                # Evicção com gravação pendente enquanto carregávamos: o da memória é mais novo.
+                return self._entries[key]
+            entry = self._entries.get(key)
+            if entry is not None and entry.dirty:
+                # Outra thread gravou estado enquanto carregávamos: o da memória é mais novo.
+                entry.expires_at = now + self.ttl_seconds
+                return entry
+            if entry is not None:
+                self._bytes -= entry.size
+            loaded.expires_at = now + self.ttl_seconds
+            self._entries[key] = loaded
+            self._entries.move_to_end(key)
+            self._bytes += loaded.size
+            evicted = self._evict_locked(now)
+        self._write(evicted)
+        return loaded
+
+    def _reinstate_locked(self, key: Key, now: float) -> bool:
+        """
+        Devolve ao cache uma entrada evictada cuja gravação ainda não terminou, em vez de
+        recarregar do banco um estado que pode estar desatualizado.
+        """
+        entry = self._pending.pop(key, None)
+        if entry is None:
+            return False
+        current = self._entries.pop(key, None)
+        if current is not None:
+            self._bytes -= current.size
+        entry.expires_at = now + self.ttl_seconds
+        self._entries[key] = entry
+        self._bytes += entry.size
+        return True
+
+    def _load(self, company_id: int, whatsapp: str) -> Session:
+        # tenant(): com sharding, lê do shard da empresa mesmo fora de handle_message.
+        with database.tenant(company_id):
+            user = database.fetch_one(USER_SQL, (company_id, whatsapp))
+            row = database.fetch_one(SESSION_SQL, (company_id, whatsapp))
+        context_json = row["context_json"] if row else None
+        context = json.loads(context_json) if context_json else {}
+        state = row["state"] if row else DEFAULT_STATE
+        return Session(company_id, whatsapp, user, state, context, _estimate_size(context_json, user))
+
+    # ------------------------------------------------------------
+    # ESCRITA (WRITE-BEHIND)
+    # ------------------------------------------------------------
+
+    def set_state(
+        self,
+        company_id: int,
+        whatsapp: str,
+        state: str,
+        context: Optional[Dict[str, Any]] = None,
+    ) -> Session:
+        """
+        Atualiza estado/contexto em memória. A gravação em wa_sessions acontece no próximo flush,
+        então várias mudanças seguidas viram um único UPSERT.
+        """
+        key = (company_id, whatsapp)
+        entry = self.get(company_id, whatsapp)
+        with self._lock:
+            entry.state = state
+            if context is not None:
+                entry.context = context
+            entry.dirty = True
+            if self._entries.get(key) is not entry:
+                # Evictada entre o get() e aqui: volta ao cache com o estado novo.
+                self._pending[key] = entry
+                self._reinstate_locked(key, time.monotonic())
+        self._ensure_flusher()
+        return entry
+
+    def flush(self) -> int:
+        """
+        Grava todas as sessões alteradas em uma única transação. Retorna quantas foram gravadas.
+        """
+        with self._lock:
+            dirty = [e for e in self._entries.values() if e.dirty]
+            dirty.extend(e for e in self._pending.values() if e.dirty)
+        return self._write(dirty)
+
+    def _write(self, entries: List[Session]) -> int:
+        """
+        Snapshot (estado + JSON do contexto) tirado sob o lock e gravado sob _write_lock:
+        flusher, evicção e invalidate() nunca gravam fora de ordem. Entradas que já foram
+        limpas por uma gravação anterior são ignoradas. Um execute_many por empresa, dentro
+        de tenant(): o flusher roda sem empresa no contexto e, com sharding, gravaria no
+        banco principal o que _load() lê do shard.
+        """
+        if not entries:
+            return 0
+        with self._write_lock:
+            now = database.utc_iso()
+            rows: Dict[int, List[Tuple[Any, ...]]] = {}
+            written: List[Tuple[Session, int]] = []
+            with self._lock:
+                for e in entries:
+                    if not e.dirty:
+                        continue
+                    context_json = (
+                        json.dumps(e.context, ensure_ascii=False, separators=(",", ":")) if e.context else None
+                    )
+                    rows.setdefault(e.company_id, []).append((e.company_id, e.whatsapp, e.state, context_json, now))
+                    written.append((e, _estimate_size(context_json, e.user)))
+                    e.dirty = False
+            if not rows:
+                return 0
+            try:
+                for company_id, company_rows in rows.items():
+                    with database.tenant(company_id):
+                        database.execute_many(_UPSERT_SESSION_SQL, company_rows)
+            except Exception:
+                with self._lock:
+                    self.flush_failures += 1
+                    for e, _ in written:
+                        e.dirty = True
+                raise
+            with self._lock:
+                self.flushed_rows += len(written)
+                for e, size in written:
+                    key = (e.company_id, e.whatsapp)
+                    if self._entries.get(key) is e:
+                        self._bytes += size - e.size
+                    if self._pending.get(key) is e and not e.dirty:
+                        del self._pending[key]
+                    e.size = size
+        return len(written)
+
+    # ------------------------------------------------------------
+    # EVICÇÃO / INVALIDAÇÃO
+    # ------------------------------------------------------------
+
+    def _evict_locked(self, now: float) -> List[Session]:
+        """
+        Remove expirados e, depois, os menos usados até caber nos limites.
+        Retorna as entradas sujas removidas (precisam ser gravadas antes de sumir).
+        """
+        evicted: List[Session] = []
+        # O TTL é renovado a cada acesso, então a ordem LRU também é a ordem de expiração.
+        while self._entries:
+            entry = next(iter(self._entries.values()))
+            over_limit = len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            if entry.expires_at > now and not over_limit:
+                break
+            self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            evicted.append(entry)
+        self.evictions += len(evicted)
+        dirty = [e for e in evicted if e.dirty]
+        for e in dirty:
+            self._pending[(e.company_id, e.whatsapp)] = e
+        return dirty
+
+    def invalidate(self, company_id: int, whatsapp: str) -> None:
+        """
+        Remove a entrada (gravando antes se estiver suja); o próximo get() recarrega
+        users/wa_sessions. Use após cadastrar ou alterar o usuário.
+        """
+        with self._lock:
+            key = (company_id, whatsapp)
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry.size
+                if entry.dirty:
+                    self._pending[key] = entry
+            else:
+                entry = self._pending.get(key)
+        if entry is not None:
+            self._write([entry])
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "pending": len(self._pending),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "flushed_rows": self.flushed_rows,
+                "flush_failures": self.flush_failures,
+            }
+
+    # ------------------------------------------------------------
+    # FLUSHER EM BACKGROUND
+    # ------------------------------------------------------------
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None or self._stop.is_set():
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="gestflow-session-flush", daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                # Próximo ciclo tenta de novo; as entradas continuam marcadas como sujas.
+                logger.exception("Falha ao gravar sessões em wa_sessions; nova tentativa em %.1f s", self.flush_interval)
+
+    def close(self) -> None:
+        """
+        Para o flusher e grava o que estiver pendente (chamado também no atexit).
+        """
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+
+_cache: Optional[SessionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_session_cache() -> SessionCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SessionCache(
+                ttl_seconds=config.SESSION_CACHE_TTL_SECONDS,
+                max_entries=config.SESSION_CACHE_MAX_ENTRIES,
+                max_bytes=config.SESSION_CACHE_MAX_BYTES,
+                flush_interval=config.SESSION_FLUSH_INTERVAL_SECONDS,
+            )
+        return _cache
+
+
+def existing_session_cache() -> Optional[SessionCache]:
+    """
+    Cache já criado, sem criar um (usado pelo /metrics).
+    """
+    return _cache
+
+
+def close_session_cache() -> None:
+    global _cache
+    with _cache_lock:
+        cache, _cache = _cache, None
+    if cache is not None:
+        cache.close()
+
+
+atexit.register(close_session_cache)
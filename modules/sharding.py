@@ -0,0 +1,259 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\modules\sharding.py
+# Último recode: 2026-10-18 05:40 (America/Bahia)
+# Motivo: Ferramentas do sharding por empresa: dividir o banco principal em shards
+#         (cópia via ATTACH, tabela a tabela, com os anos arquivados da empresa e conferência
+#         de contagens pelo histórico), status dos shards e consultas administrativas entre empresas via database.fan_out().
+#
+# Uso (CLI, com SQLITE_SHARDING=company ou fixed no .env):
+#   python -m modules.sharding split [--company-id 1] [--force]
+#   python -m modules.sharding status
+#   python -m modules.sharding totals [--start 2026-10-01 --end 2026-10-31]
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import config
+import database
+from modules import archive
+
+# Ordem de cópia respeita as FKs. Ficam de fora:
+# - derivadas (stock_balances, sales_daily, payments_daily, catalog_fts): os triggers do
+#   shard recalculam durante a cópia (e o rebuild pelo histórico, se houver anos arquivados);
+# - globais (webhook_messages, backups): continuam só no banco principal.
+COPY_TABLES = (
+    "users",
+    "customers",
+    "products",
+    "services",
+    "budgets",
+    "budget_items",
+    "sales",
+    "sale_items",
+    "stock_movements",
+    "accounts_receivable",
+    "accounts_payable",
+    "payments",
+    "wa_sessions",
+    "sequences",
+    "message_deliveries",
+)
+
+DERIVED_TABLES = ("stock_balances", "sales_daily", "payments_daily")
+
+
+def _columns(conn: sqlite3.Connection, schema: str, table: str) -> List[str]:
+    return [row["name"] for row in conn.execute(f"PRAGMA {schema}.table_info({table});").fetchall()]
+
+
+def _count(conn: sqlite3.Connection, schema: str, table: str, company_id: int) -> int:
+    row = conn.execute(f"SELECT COUNT(*) AS n FROM {schema}.{table} WHERE company_id = ?;", (company_id,)).fetchone()
+    return int(row["n"])
+
+
+def _history_counts(conn: sqlite3.Connection, company_id: int) -> Dict[str, int]:
+    """
+    Contagens da empresa numa conexão de archive.history_reader(): sem schema, as tabelas
+    arquivadas resolvem nas views (banco quente + anos).
+    """
+    return {
+        t: int(conn.execute(f"SELECT COUNT(*) AS n FROM {t} WHERE company_id = ?;", (company_id,)).fetchone()["n"])
+        for t in COPY_TABLES + DERIVED_TABLES
+    }
+
+
+def _copy_archived(conn: sqlite3.Connection, company_id: int, shard: Path) -> int:
+    """
+    Copia as linhas da empresa de cada ano arquivado do banco principal para o arquivo do
+    mesmo ano do shard (o frio continua frio). Um ano por transação: ATTACH não roda dentro
+    de transação. Linhas da empresa já presentes no arquivo do shard são substituídas.
+    """
+    total = 0
+    for year, source in archive.archive_files(Path(config.SQLITE_DB_PATH)):
+        target = archive.archive_path(shard, year)
+        conn.execute("ATTACH DATABASE ? AS arch_src;", (str(source),))
+        try:
+            have = {
+                t
+                for t in archive.ARCHIVED_TABLES
+                if conn.execute("SELECT 1 FROM arch_src.sqlite_master WHERE type = 'table' AND name = ?;", (t,)).fetchone()
+            }
+            found = any(
+                conn.execute(f"SELECT 1 FROM arch_src.{t} WHERE company_id = ? LIMIT 1;", (company_id,)).fetchone()
+                for t in have
+            )
+            if not found and not target.exists():
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            conn.execute("ATTACH DATABASE ? AS arch_dst;", (str(target),))
+            try:
+                archive.ensure_schema(conn, "arch_dst")
+                cur = conn.cursor()
+                cur.execute("BEGIN IMMEDIATE;")
+                try:
+                    for table in archive.ARCHIVED_TABLES:
+                        cur.execute(f"DELETE FROM arch_dst.{table} WHERE company_id = ?;", (company_id,))
+                        if table not in have:
+                            continue
+                        src_cols = set(_columns(conn, "arch_src", table))
+                        cols = ", ".join(c for c in _columns(conn, "arch_dst", table) if c in src_cols)
+                        cur.execute(
+                            f"INSERT OR REPLACE INTO arch_dst.{table} ({cols}) "
+                            f"SELECT {cols} FROM arch_src.{table} WHERE company_id = ?;",
+                            (company_id,),
+                        )
+                        total += cur.rowcount
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
+                finally:
+                    cur.close()
+            finally:
+                conn.execute("DETACH DATABASE arch_dst;")
+        finally:
+            conn.execute("DETACH DATABASE arch_src;")
+    return total
+
+
+def split_company(company_id: int, force: bool = False) -> Dict[str, int]:
+    """
+    Copia os dados da empresa do banco principal para o shard dela (ids preservados).
+    O banco principal não é alterado. Com dados já presentes no shard, exige force=True
+    (que apaga só as linhas dessa empresa no shard antes de copiar). Os anos arquivados vão
+    para os arquivos anuais do shard e a conferência compara o histórico completo dos dois
+    lados (archive.history_reader): no principal, os rollups e saldos guardam o histórico
+    arquivado, que não está mais nas tabelas quentes.
+    """
+    if not database.sharding_enabled():
+        raise RuntimeError("Defina SQLITE_SHARDING=company ou fixed para dividir o banco.")
+
+    path = database.prepare_shard(company_id)
+    conn = database.get_connection(path)
+    try:
+        conn.execute("ATTACH DATABASE ? AS src;", (str(Path(config.SQLITE_DB_PATH)),))
+        existing = sum(_count(conn, "main", t, company_id) for t in COPY_TABLES if t != "users")
+        if existing and not force:
+            raise RuntimeError(f"Shard {path.name} já tem dados da empresa {company_id} (use --force).")
+
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE;")
+        try:
+            if existing:
+                # Derivadas primeiro (triggers não cobrem DELETE), depois ordem inversa das FKs.
+                for table in DERIVED_TABLES + tuple(reversed(COPY_TABLES[1:])):
+                    cur.execute(f"DELETE FROM main.{table} WHERE company_id = ?;", (company_id,))
+            for table in COPY_TABLES:
+                cols = ", ".join(c for c in _columns(conn, "main", table) if c in set(_columns(conn, "src", table)))
+                cur.execute(
+                    f"INSERT OR REPLACE INTO main.{table} ({cols}) "
+                    f"SELECT {cols} FROM src.{table} WHERE company_id = ?;",
+                    (company_id,),
+                )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+        if _copy_archived(conn, company_id, path) or archive.archive_files(path):
+            # Os triggers só viram as linhas quentes: rollups e saldos saem do histórico.
+            with archive.history_transaction(company_id) as tx:
+                database.rebuild_rollups(tx.cur, company_id)
+                tx.execute("DELETE FROM stock_balances WHERE company_id = :company_id;", {"company_id": company_id})
+                tx.execute(database.STOCK_BALANCES_REBUILD_SQL, {"company_id": company_id})
+
+        with archive.history_reader(db_path=Path(config.SQLITE_DB_PATH)) as src_conn:
+            expected = _history_counts(src_conn, company_id)
+        with archive.history_reader(company_id) as shard_conn:
+            copied = _history_counts(shard_conn, company_id)
+        mismatches = [
+            f"{t}: principal={expected[t]} shard={copied[t]}" for t in COPY_TABLES if expected[t] != copied[t]
+        ]
+        for table in DERIVED_TABLES:
+            if expected[table] != copied.pop(table):
+                mismatches.append(f"{table} (derivada) diverge após a cópia")
+        if mismatches:
+            raise RuntimeError("Conferência da cópia falhou: " + "; ".join(mismatches))
+    finally:
+        try:
+            conn.execute("DETACH DATABASE src;")
+        except sqlite3.Error:
+            pass
+        conn.close()
+    return copied
+
+
+def split_all(force: bool = False) -> Dict[int, Dict[str, int]]:
+    database.init_db()
+    with database.db_connection() as conn:
+        company_ids = [row["id"] for row in conn.execute("SELECT id FROM companies ORDER BY id;").fetchall()]
+    return {cid: split_company(cid, force=force) for cid in company_ids}
+
+
+# ============================================================
+# CONSULTAS ENTRE EMPRESAS (FAN-OUT)
+# ============================================================
+
+
+def shard_status() -> List[Dict[str, Any]]:
+    """
+    Um item por shard: arquivo, tamanho e empresas presentes.
+    """
+    result = []
+    for path in database.shard_paths():
+        conn = database.get_connection(path)
+        try:
+            companies = [row["id"] for row in conn.execute("SELECT id FROM companies ORDER BY id;").fetchall()]
+        finally:
+            conn.close()
+        result.append({"shard": path.name, "size_bytes": path.stat().st_size, "companies": companies})
+    return result
+
+
+def tenant_totals(start_day: str, end_day: str) -> List[Dict[str, Any]]:
+    """
+    Vendas por empresa no período (dias locais), a partir dos rollups de cada shard.
+    """
+    rows = database.fan_out(
+        "SELECT company_id, SUM(sales_count) AS sales_count, SUM(total) AS total FROM sales_daily "
+        "WHERE day BETWEEN ? AND ? AND status <> 'cancelled' GROUP BY company_id;",
+        (start_day, end_day),
+    )
+    return sorted(rows, key=lambda r: r["company_id"])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m modules.sharding")
+    parser.add_argument("command", choices=("split", "status", "totals"))
+    parser.add_argument("--company-id", type=int)
+    parser.add_argument("--force", action="store_true", help="recopia empresas que já estão no shard")
+    parser.add_argument("--start", default="0000-01-01")
+    parser.add_argument("--end", default="9999-12-31")
+    args = parser.parse_args(argv)
+
+    if args.command == "split":
+        if args.company_id is not None:
+            database.init_db()
+            results = {args.company_id: split_company(args.company_id, force=args.force)}
+        else:
+            results = split_all(force=args.force)
+        for cid, copied in results.items():
+            rows = sum(copied.values())
+            print(f"empresa {cid}: {rows} linha(s) -> {database.shard_path(cid).name}")
+        print("Banco principal preservado; remova os dados antigos só depois de validar os shards.")
+    elif args.command == "status":
+        for item in shard_status():
+            print(f"{item['shard']:<24} {item['size_bytes'] / 1024:10.1f} KB  empresas={item['companies']}")
+    else:
+        for row in tenant_totals(args.start, args.end):
+            print(f"empresa {row['company_id']:>5}: {row['sales_count']:>8} vendas  total={row['total']:.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,155 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\modules\stock.py
+# Último recode: 2026-10-18 03:20 (America/Bahia)
+# Motivo: Estoque por movimentação: gravação no ledger (stock_movements), consulta O(1) de saldo
+#         via stock_balances, snapshot de inventário e rebuild/verify que reprocessa o ledger
+#         inteiro, incluindo os anos arquivados (modules/archive.py).
+#
+# Uso (CLI): python -m modules.stock verify [--company-id N]
+#            python -m modules.stock rebuild [--company-id N]
+
+from __future__ import annotations
+
+import argparse
+from typing import Any, Dict, List, Optional
+
+import database
+from modules import archive
+
+MOVEMENT_TYPES = ("in", "out", "sale")
+
+BALANCE_SQL = "SELECT qty FROM stock_balances WHERE company_id=? AND product_id=?;"
+
+INVENTORY_SQL = (
+    "SELECT p.id AS product_id, p.code, p.name, COALESCE(b.qty, 0) AS qty, b.updated_at "
+    "FROM products p "
+    "LEFT JOIN stock_balances b ON b.company_id = p.company_id AND b.product_id = p.id "
+    "WHERE p.company_id = ?{active_filter} ORDER BY p.code;"
+)
+
+# Tolerância para comparar somas de REAL.
+_DRIFT_EPSILON = 1e-6
+
+
+def record_movement(
+    company_id: int,
+    product_id: int,
+    movement_type: str,
+    qty: float,
+    reason: Optional[str] = None,
+    ref_type: Optional[str] = None,
+    ref_id: Optional[int] = None,
+    created_by: Optional[int] = None,
+    tx: Optional[database.Transaction] = None,
+) -> int:
+    """
+    Registra uma movimentação (qty sempre positivo) e retorna o id.
+    O saldo em stock_balances é atualizado pelo trigger na mesma transação;
+    passe `tx` para gravar junto com a venda/entrada que originou a movimentação.
+    """
+    if movement_type not in MOVEMENT_TYPES:
+        raise ValueError(f"movement_type inválido: {movement_type!r}")
+    if qty <= 0:
+        raise ValueError("qty deve ser positivo; a direção vem do movement_type.")
+
+    sql = (
+        "INSERT INTO stock_movements "
+        "(company_id, product_id, movement_type, qty, reason, ref_type, ref_id, created_by, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);"
+    )
+    params = (company_id, product_id, movement_type, float(qty), reason, ref_type, ref_id, created_by, database.utc_iso())
+
+    if tx is not None:
+        return tx.execute(sql, params)
+    with database.transaction() as own_tx:
+        return own_tx.execute(sql, params)
+
+
+def get_balance(company_id: int, product_id: int) -> float:
+    """
+    Saldo atual do produto (lookup pela PK de stock_balances).
+    """
+    row = database.fetch_one(BALANCE_SQL, (company_id, product_id))
+    return float(row["qty"]) if row else 0.0
+
+
+def inventory_snapshot(company_id: int, only_active: bool = True) -> List[Dict[str, Any]]:
+    """
+    Inventário completo da empresa: um registro por produto com o saldo atual.
+    """
+    sql = INVENTORY_SQL.format(active_filter=" AND p.active = 1" if only_active else "")
+    return database.fetch_all(sql, (company_id,))
+
+
+def verify_balances(company_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Reprocessa o ledger (banco quente + anos arquivados) e compara com stock_balances.
+    Retorna a lista de divergências (vazia quando está tudo consistente).
+    """
+    with archive.history_reader() as conn:
+        rows = conn.execute(
+            """
+            WITH ledger AS (
+                SELECT company_id, product_id,
+                       SUM(CASE WHEN movement_type = 'in' THEN qty ELSE -qty END) AS qty
+                FROM stock_movements
+                WHERE (:company_id IS NULL OR company_id = :company_id)
+                GROUP BY company_id, product_id
+            ),
+            keys AS (
+                SELECT company_id, product_id FROM ledger
+                UNION
+                SELECT company_id, product_id FROM stock_balances
+                WHERE (:company_id IS NULL OR company_id = :company_id)
+            )
+            SELECT k.company_id, k.product_id,
+                   COALESCE(l.qty, 0) AS ledger_qty,
+                   COALESCE(b.qty, 0) AS balance_qty
+            FROM keys k
+            LEFT JOIN ledger l ON l.company_id = k.company_id AND l.product_id = k.product_id
+            LEFT JOIN stock_balances b ON b.company_id = k.company_id AND b.product_id = k.product_id
+            ORDER BY k.company_id, k.product_id;
+            """,
+            {"company_id": company_id},
+        ).fetchall()
+    return [r for r in rows if abs(float(r["ledger_qty"]) - float(r["balance_qty"])) > _DRIFT_EPSILON]
+
+
+def rebuild_balances(company_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Recria stock_balances a partir do ledger. Retorna as divergências encontradas antes do rebuild.
+    """
+    drift = verify_balances(company_id)
+    with archive.history_transaction() as tx:
+        tx.execute(
+            "DELETE FROM stock_balances WHERE (:company_id IS NULL OR company_id = :company_id);",
+            {"company_id": company_id},
+        )
+        tx.execute(database.STOCK_BALANCES_REBUILD_SQL, {"company_id": company_id})
+    return drift
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m modules.stock")
+    parser.add_argument("command", choices=("verify", "rebuild"))
+    parser.add_argument("--company-id", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    database.init_db()
+    if args.command == "verify":
+        drift = verify_balances(args.company_id)
+    else:
+        drift = rebuild_balances(args.company_id)
+
+    for d in drift:
+        print(
+            f"company={d['company_id']} product={d['product_id']} "
+            f"ledger={d['ledger_qty']:g} saldo={d['balance_qty']:g}"
+        )
+    print(f"{len(drift)} divergência(s) encontrada(s).")
+    if args.command == "rebuild" and drift:
+        print("Saldos recriados a partir do ledger.")
+    return 1 if drift and args.command == "verify" else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
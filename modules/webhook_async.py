@@ -0,0 +1,100 @@
+# Caminho: C:\Users\vlula\OneDrive\Área de Trabalho\Projetos Backup\GESTFLOW\modules\webhook_async.py
+# Último recode: 2026-10-17 21:50 (America/Bahia)
+# Motivo: Respostas longas são enviadas em partes de até MAX_MESSAGE_LENGTH.
+
+from __future__ import annotations
+
+import atexit
+import logging
+import threading
+from typing import Callable, Optional
+
+import config
+from modules.dispatcher import SENDER_REJECTIONS, DispatchRejected, KeyedDispatcher
+from modules.outbound import OutboundSender, get_sender, split_message
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[str, str], str]
+
+
+class WebhookWorkerPool:
+    """
+    Pool limitado de workers sobre o KeyedDispatcher: mensagens do mesmo remetente
+    continuam em ordem. submit() nunca bloqueia: com a fila cheia retorna False e o
+    chamador recusa a mensagem (backpressure); nunca processa fora da fila. Remetente acima do limite de taxa
+    levanta DispatchRejected.
+    """
+
+    def __init__(
+        self,
+        handler: Handler,
+        sender: Optional[OutboundSender] = None,
+        workers: int = 4,
+        queue_size: int = 100,
+    ) -> None:
+        self.handler = handler
+        self.sender = sender
+        self._dispatcher = KeyedDispatcher(
+            workers=workers,
+            max_pending=queue_size,
+            max_pending_per_key=config.DISPATCH_MAX_PENDING_PER_SENDER,
+            rate_per_second=config.SENDER_RATE_PER_MINUTE / 60.0,
+            burst=config.SENDER_BURST,
+        )
+
+    @property
+    def depth(self) -> int:
+        return self._dispatcher.depth
+
+    def submit(self, from_number: str, body: str) -> bool:
+        try:
+            self._dispatcher.submit(from_number, self._process, from_number, body)
+            return True
+        except DispatchRejected as exc:
+            if exc.reason in SENDER_REJECTIONS:
+                raise
+            return False
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """
+        Para de aceitar mensagens, processa o que já está na fila e encerra os workers.
+        """
+        self._dispatcher.shutdown(timeout=timeout)
+
+    def _process(self, from_number: str, body: str) -> None:
+        try:
+            reply = self.handler(from_number, body)
+            if reply:
+                sender = self.sender or get_sender()
+                for part in split_message(reply):
+                    sender.send(from_number, part)
+        except Exception:
+            logger.exception("Falha ao processar mensagem assíncrona de %s", from_number)
+
+
+_pool: Optional[WebhookWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool(handler: Handler) -> WebhookWorkerPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WebhookWorkerPool(
+                handler=handler,
+                workers=config.WEBHOOK_WORKERS,
+                queue_size=config.WEBHOOK_QUEUE_SIZE,
+            )
+        return _pool
+
+
+def shutdown_worker_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+atexit.register(shutdown_worker_pool)